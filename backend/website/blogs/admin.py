@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.apps import apps
 from .models import Category, Tag, Post, Comment, Reaction, MediaAsset
+from .moderation import moderate_comments
+from .transitions import bulk_transition
 
 # Register your models here.
 @admin.register(Category)
@@ -19,26 +21,34 @@ class TagAdmin(admin.ModelAdmin):
 class PostAdmin(admin.ModelAdmin):
     list_display = [
         'title', 'slug', 'status', 'author', 'category', 'published_at',
-        'views_count', 'likes_count'
+        'views_count', 'comments_count', 'likes_count'
     ]
     list_filter = ['status', 'category', 'tags', 'published_at', 'author']
     prepopulated_fields = {'slug': ('title',)}
     search_fields = ['title', 'summary', 'content', 'author__username']
     raw_id_fields = ['author']
     filter_horizontal = ['tags']
-    readonly_fields = ['views_count', 'likes_count', 'created_at', 'updated_at']
+    readonly_fields = ['views_count', 'comments_count', 'likes_count', 'created_at', 'updated_at']
     actions = ['make_published', 'make_draft', 'make_archived']
 
+    def _transition(self, request, queryset, status):
+        result = bulk_transition(queryset.values_list('pk', flat=True), status)
+        message = f"{result['changed']} post(s) updated."
+        if result['scheduled']:
+            # a future published_at is honoured
+            message += f" {result['scheduled']} scheduled for later."
+        self.message_user(request, message)
+
     def make_published(self, request, queryset):
-        queryset.update(status='published')
+        self._transition(request, queryset, 'published')
     make_published.short_description = "Mark selected posts as published"
 
     def make_draft(self, request, queryset):
-        queryset.update(status='draft')
+        self._transition(request, queryset, 'draft')
     make_draft.short_description = "Mark selected posts as draft"
 
     def make_archived(self, request, queryset):
-        queryset.update(status='archived')
+        self._transition(request, queryset, 'archived')
     make_archived.short_description = "Mark selected posts as archived"
 
 @admin.register(Comment)
@@ -46,12 +56,18 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ['post', 'author', 'is_approved', 'created_at']
     list_filter = ['is_approved', 'created_at']
     search_fields = ['post__title', 'author__username', 'content']
-    actions = ['approve_comments']
+    actions = ['approve_comments', 'reject_comments']
 
     def approve_comments(self, request, queryset):
-        queryset.update(is_approved=True)
+        changed = moderate_comments(queryset.values_list('pk', flat=True), approve=True)
+        self.message_user(request, f"{changed} comment(s) approved.")
     approve_comments.short_description = "Approve selected comments"
 
+    def reject_comments(self, request, queryset):
+        changed = moderate_comments(queryset.values_list('pk', flat=True), approve=False)
+        self.message_user(request, f"{changed} comment(s) rejected.")
+    reject_comments.short_description = "Reject selected comments"
+
 @admin.register(Reaction)
 class ReactionAdmin(admin.ModelAdmin):
     list_display = ['post', 'user', 'type', 'created_at']
@@ -1,7 +1,66 @@
-def list_cache_key(params: dict):
+from django.core.cache import cache
+
+
+def list_cache_key(params: dict, version: int = 1):
     # build a stable cache key for list views
     parts = [f"{k}={v}" for k, v in sorted(params.items())]
-    return "blogs:list:" + "&".join(parts)
+    return f"blogs:list:v{version}:" + "&".join(parts)
+
+def list_version_key(scope: str):
+    # scope as in blogs.feeds: "all", "category:<slug>" or "tag:<slug>"
+    return f"blogs:list:ver:{scope}"
+
+def list_version(scope: str) -> int:
+    return cache.get(list_version_key(scope)) or 1
 
 def detail_cache_key(slug: str):
     return f"blogs:detail:{slug}"
+
+def comments_version_key(slug: str):
+    return f"blogs:comments:ver:{slug}"
+
+def comments_page_key(slug: str, version: int, cursor: str, page_size: int):
+    return f"blogs:comments:{slug}:v{version}:{cursor or 'first'}:{page_size}"
+
+def comments_version(slug: str) -> int:
+    return cache.get(comments_version_key(slug)) or 1
+
+def _bump(key):
+    # old entries become unreachable and expire on their own TTL
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+def bump_comments_version(slug: str):
+    _bump(comments_version_key(slug))
+
+def invalidate_post_caches(slugs=(), scopes=()):
+    """
+    Drop detail payloads for `slugs` and retire every cached list page in
+    `scopes`; list pages of untouched categories and tags stay warm.
+    """
+    cache.delete_many([detail_cache_key(slug) for slug in set(slugs)])
+    for scope in set(scopes):
+        _bump(list_version_key(scope))
+
+# Homepage fragments are versioned by two generations: published posts and taxonomy.
+HOME_POSTS = "posts"
+HOME_TAXONOMY = "taxonomy"
+
+def home_version_key(name: str):
+    return f"blogs:home:ver:{name}"
+
+def home_versions_tag(versions: dict) -> str:
+    # composite of both generations, as read with one get_many
+    return "p{}t{}".format(versions.get(home_version_key(HOME_POSTS)) or 1,
+                           versions.get(home_version_key(HOME_TAXONOMY)) or 1)
+
+def home_payload_key(tag: str):
+    return f"blogs:home:{tag}"
+
+def home_fragment_key(name: str, tag: str):
+    return f"blogs:home:frag:{name}:{tag}"
+
+def bump_home_version(name: str):
+    _bump(home_version_key(name))
@@ -0,0 +1,93 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from rest_framework.exceptions import ValidationError
+
+from .models import ChangeLog, Post, Category, Tag
+from .serializers import PostListSerializer, CategoryMiniSerializer, TagMiniSerializer
+
+MAX_CHANGES = 500
+SEQUENCE_BATCH = 1000
+UPSERT, DELETE = "upsert", "delete"
+
+
+def record(kind, op, rows):
+    """
+    Append one log entry per (object_id, slug) row. Runs inside the caller's
+    transaction, so a rolled back change leaves no trace.
+    """
+    ChangeLog.objects.bulk_create([ChangeLog(kind=kind, op=op, object_id=pk, slug=slug) for pk, slug in rows])
+
+def record_posts(qs, op=UPSERT):
+    record("post", op, qs.filter(status="published").values_list("pk", "slug"))
+
+def sequence_pending(limit=SEQUENCE_BATCH):
+    """
+    Give committed entries without a seq the next numbers after the highest
+    one. Uncommitted entries aren't visible here, so however long their
+    transaction runs they are numbered after everything already handed out
+    and a client's cursor can't pass them. Two callers racing both start at
+    the same number; the unique constraint turns the loser away, and its
+    entries are numbered by the next call. Returns how many were numbered.
+    """
+    try:
+        with transaction.atomic():
+            entries = list(ChangeLog.objects.select_for_update(skip_locked=True)
+                           .filter(seq=None).order_by("pk")[:limit])
+            if not entries:
+                return 0
+            top = ChangeLog.objects.aggregate(top=Max("seq"))["top"] or 0
+            for n, entry in enumerate(entries, start=top + 1):
+                entry.seq = n
+            ChangeLog.objects.filter(seq=None).bulk_update(entries, ["seq"])
+    except IntegrityError:
+        return 0
+    return len(entries)
+
+def parse_since(value) -> int:
+    try:
+        since = int(value or 0)
+    except ValueError:
+        since = -1
+    if since < 0:
+        raise ValidationError({"since": ["Invalid cursor"]})
+    return since
+
+
+def _live(kind, ids):
+    if kind == "post":
+        qs = (Post.objects.filter(status="published")
+              .select_related("category").prefetch_related("tags"))
+        return {p.pk: p for p in qs.filter(pk__in=ids)}, PostListSerializer
+    model, serializer = {"category": (Category, CategoryMiniSerializer), "tag": (Tag, TagMiniSerializer)}[kind]
+    return model.objects.in_bulk(ids), serializer
+
+def changes_since(since: int, limit=MAX_CHANGES):
+    """
+    Everything that changed after cursor `since`, collapsed to the latest state
+    per object: current payloads for objects that are publicly visible now,
+    {id, slug} tombstones for the rest.
+
+    The cursor is ChangeLog.seq, not the id: ids are allocated at insert and
+    become visible at commit, so a long transaction's entry could show up
+    below a cursor already handed out.
+    """
+    while sequence_pending() == SEQUENCE_BATCH:
+        pass
+    entries = list(ChangeLog.objects.filter(seq__gt=since).order_by("seq")[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for entry in entries:
+        latest[(entry.kind, entry.object_id)] = entry
+
+    payload = {"cursor": entries[-1].seq if entries else since, "has_more": has_more}
+    for kind, name in (("post", "posts"), ("category", "categories"), ("tag", "tags")):
+        mine = [e for e in latest.values() if e.kind == kind]
+        live, serializer = _live(kind, [e.object_id for e in mine if e.op == UPSERT])
+        updated = [live[e.object_id] for e in mine if e.object_id in live]
+        payload[name] = {
+            "updated": serializer(updated, many=True).data,
+            "deleted": [{"id": e.object_id, "slug": e.slug} for e in mine if e.object_id not in live],
+        }
+    return payload
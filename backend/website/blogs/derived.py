@@ -0,0 +1,71 @@
+from html.parser import HTMLParser
+
+from django.utils.text import slugify
+
+HEADING_TAGS = {"h2", "h3", "h4", "h5", "h6"}
+# tags that separate words when rendered, so "</p><p>" must not glue text together
+BREAK_TAGS = HEADING_TAGS | {
+    "p", "br", "li", "ul", "ol", "blockquote", "pre", "figure", "figcaption", "div", "h1",
+}
+EXCERPT_WORDS = 50
+THIN_SUMMARY_WORDS = 20
+
+
+class _ContentParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.toc = []
+        self._heading = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BREAK_TAGS:
+            self.text.append(" ")
+        if tag in HEADING_TAGS:
+            self._heading = {"level": int(tag[1]), "id": dict(attrs).get("id") or "", "text": []}
+
+    def handle_endtag(self, tag):
+        if tag in BREAK_TAGS:
+            self.text.append(" ")
+        if tag in HEADING_TAGS and self._heading is not None:
+            self.toc.append(self._heading)
+            self._heading = None
+
+    def handle_data(self, data):
+        self.text.append(data)
+        if self._heading is not None:
+            self._heading["text"].append(data)
+
+
+def derive_content(html: str) -> dict:
+    """
+    Parses sanitized post HTML once and returns the fields stored on
+    PostDerivedContent: plain_text, excerpt, toc and word_count.
+    """
+    parser = _ContentParser()
+    parser.feed(html or "")
+    parser.close()
+
+    words = "".join(parser.text).split()
+    plain_text = " ".join(words)
+    excerpt = " ".join(words[:EXCERPT_WORDS])
+    if len(words) > EXCERPT_WORDS:
+        excerpt += "…"
+
+    toc, seen = [], set()
+    for heading in parser.toc:
+        text = " ".join("".join(heading["text"]).split())
+        if not text:
+            continue
+        # prefer the editor's id; otherwise a stable slug the frontend can reproduce
+        anchor = heading["id"] or slugify(text) or "section"
+        base, n = anchor, 2
+        while anchor in seen:
+            anchor, n = f"{base}-{n}", n + 1
+        seen.add(anchor)
+        toc.append({"level": heading["level"], "text": text, "anchor": anchor})
+
+    return {"plain_text": plain_text, "excerpt": excerpt, "toc": toc, "word_count": len(words)}
+
+def is_thin(summary: str) -> bool:
+    return len((summary or "").split()) < THIN_SUMMARY_WORDS
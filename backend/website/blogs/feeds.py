@@ -0,0 +1,109 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+
+from .models import Post, Category, Tag
+from .sitemaps import post_url
+
+FEED_ITEMS = 50
+FORMATS = {"rss": Rss201rev2Feed, "atom": Atom1Feed}
+ALL = "all"
+
+
+def feed_key(scope: str, fmt: str):
+    return f"blogs:feed:{scope}:{fmt}"
+
+def category_scope(slug):
+    return f"category:{slug}"
+
+def tag_scope(slug):
+    return f"tag:{slug}"
+
+
+def _scope_posts(scope):
+    """
+    (title, link, queryset) for a scope, or None if the category/tag is gone.
+    """
+    qs = (Post.objects.filter(status='published')
+          .select_related('author', 'category').prefetch_related('tags')
+          .order_by('-published_at'))
+    base = f"{settings.FRONTEND_BASE_URL}/blogs"
+    if scope == ALL:
+        return "Media Dunes Blog", base, qs
+    kind, _, slug = scope.partition(":")
+    model = {"category": Category, "tag": Tag}.get(kind)
+    obj = model and model.objects.filter(slug=slug).first()
+    if obj is None:
+        return None
+    qs = qs.filter(category=obj) if kind == "category" else qs.filter(tags=obj)
+    return f"Media Dunes Blog: {obj.name}", f"{base}?{kind}={slug}", qs
+
+def feed_lock_key(scope: str):
+    return f"blogs:feed:{scope}:lock"
+
+def build_feed(scope: str):
+    """
+    Render RSS and Atom bytes for one scope and store them with an ETag.
+    Normally runs off the request path; see get_feed() for a cold cache.
+    Returns False (and drops what's cached) if the scope is gone.
+    """
+    found = _scope_posts(scope)
+    if found is None:
+        cache.delete_many([feed_key(scope, fmt) for fmt in FORMATS])
+        return False
+    title, link, qs = found
+    posts = list(qs[:FEED_ITEMS])
+    for fmt, feed_cls in FORMATS.items():
+        feed = feed_cls(title=title, link=link, description=title, language=settings.LANGUAGE_CODE)
+        for post in posts:
+            url = post_url(post.slug)
+            feed.add_item(
+                title=post.title, link=url, unique_id=url, description=post.summary,
+                pubdate=post.published_at, updateddate=post.updated_at,
+                author_name=getattr(post.author, "username", None) or None,
+                categories=[t.name for t in post.tags.all()],
+            )
+        body = feed.writeString("utf-8").encode("utf-8")
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        cache.set(feed_key(scope, fmt), {"body": body, "etag": etag, "content_type": feed.content_type}, None)
+    return True
+
+def get_feed(scope: str, fmt: str):
+    """
+    The cached feed entry, rebuilt in the request on a miss (after a flush,
+    an eviction or a fresh deploy). One request per scope rebuilds; the
+    others get None for now. Raises LookupError if the scope doesn't exist.
+    """
+    entry = cache.get(feed_key(scope, fmt))
+    if entry is not None:
+        return entry
+    if not cache.add(feed_lock_key(scope), 1, 30):
+        return None
+    try:
+        if not build_feed(scope):
+            raise LookupError(scope)
+    finally:
+        cache.delete(feed_lock_key(scope))
+    return cache.get(feed_key(scope, fmt))
+
+def post_scopes(post: Post):
+    scopes = {ALL}
+    if post.category_id:
+        scopes.add(category_scope(post.category.slug))
+    scopes.update(tag_scope(t.slug) for t in post.tags.all())
+    return scopes
+
+def all_scopes():
+    scopes = [ALL]
+    scopes += [category_scope(s) for s in Category.objects.values_list("slug", flat=True)]
+    scopes += [tag_scope(s) for s in Tag.objects.values_list("slug", flat=True)]
+    return scopes
+
+def build_all_feeds(extra_scopes=()):
+    # extra_scopes: gone ones (e.g. a renamed slug) whose cached feeds should go
+    scopes = all_scopes()
+    for scope in [*scopes, *extra_scopes]:
+        build_feed(scope)
+    return len(scopes)
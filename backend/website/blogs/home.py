@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Post, Category, Tag
+from .serializers import PostListSerializer, CategoryMiniSerializer
+from .cache_keys import (
+    HOME_POSTS, HOME_TAXONOMY, home_version_key, home_versions_tag, home_payload_key, home_fragment_key,
+)
+
+LATEST_SIZE = 10
+CATEGORY_SIZE = 4
+TOP_TAGS = 20
+TRENDING_SIZE = 6
+TRENDING_DAYS = 30
+FRAGMENT_TTL = 60 * 60
+# views don't bump a generation, so trending is only as fresh as its TTL;
+# with the payload on top it can lag by up to TRENDING_TTL + PAYLOAD_TTL
+TRENDING_TTL = 5 * 60
+PAYLOAD_TTL = 5 * 60
+
+
+def _published():
+    return (Post.objects.filter(status='published')
+            .select_related('author', 'category').prefetch_related('tags'))
+
+def _posts(qs):
+    return PostListSerializer(qs, many=True).data
+
+def build_fragment(name: str):
+    if name == "categories":
+        return CategoryMiniSerializer(Category.objects.order_by("name"), many=True).data
+    if name == "latest":
+        return _posts(_published().order_by("-published_at")[:LATEST_SIZE])
+    if name == "trending":
+        since = timezone.now() - timedelta(days=TRENDING_DAYS)
+        return _posts(_published().filter(published_at__gte=since).order_by("-views_count")[:TRENDING_SIZE])
+    if name == "tags":
+        public = Q(posts__status='published')
+        tags = (Tag.objects.annotate(n=Count("posts", filter=public)).filter(n__gt=0)
+                .order_by("-n", "name")[:TOP_TAGS])
+        return [{"name": t.name, "slug": t.slug, "posts": t.n} for t in tags]
+    kind, _, slug = name.partition(":")
+    if kind == "category":
+        return _posts(_published().filter(category__slug=slug).order_by("-published_at")[:CATEGORY_SIZE])
+    raise ValueError(f"Unknown home fragment {name!r}")
+
+def _build_in_thread(name):
+    try:
+        return build_fragment(name)
+    finally:
+        # worker threads get their own connection; don't leave it open
+        connection.close()
+
+def _fill(names):
+    workers = getattr(settings, "BLOG_HOME_FILL_WORKERS", 4)
+    if workers <= 1 or len(names) <= 1:
+        return {name: build_fragment(name) for name in names}
+    with ThreadPoolExecutor(max_workers=min(workers, len(names))) as pool:
+        return dict(zip(names, pool.map(_build_in_thread, names)))
+
+def _fragments(names, tag):
+    keys = {home_fragment_key(name, tag): name for name in names}
+    found = cache.get_many(keys)
+    fragments = {keys[k]: v for k, v in found.items()}
+    missing = [name for name in names if name not in fragments]
+    if missing:
+        built = _fill(missing)
+        cache.set_many({home_fragment_key(name, tag): data for name, data in built.items()
+                        if name != "trending"}, FRAGMENT_TTL)
+        if "trending" in built:
+            cache.set(home_fragment_key("trending", tag), built["trending"], TRENDING_TTL)
+        fragments.update(built)
+    return fragments
+
+
+def home_payload():
+    """
+    Homepage payload: latest posts, latest per category, top tags and trending.
+
+    Cache reads are batched: the two generations, then the assembled payload
+    together with the category list, then every post fragment in one
+    get_many. Missing fragments are rebuilt in parallel and stored for the
+    next assembly.
+    """
+    versions = cache.get_many([home_version_key(HOME_POSTS), home_version_key(HOME_TAXONOMY)])
+    tag = home_versions_tag(versions)
+    payload_key, categories_key = home_payload_key(tag), home_fragment_key("categories", tag)
+    found = cache.get_many([payload_key, categories_key])
+    if payload_key in found:
+        return found[payload_key]
+
+    categories = found.get(categories_key)
+    if categories is None:
+        categories = build_fragment("categories")
+        cache.set(categories_key, categories, FRAGMENT_TTL)
+    names = ["latest", "tags", "trending"] + [f"category:{c['slug']}" for c in categories]
+    fragments = _fragments(names, tag)
+    payload = {
+        "latest": fragments["latest"],
+        "categories": [
+            {**c, "posts": fragments[f"category:{c['slug']}"]}
+            for c in categories if fragments[f"category:{c['slug']}"]
+        ],
+        "tags": fragments["tags"],
+        "trending": fragments["trending"],
+    }
+    cache.set(payload_key, payload, PAYLOAD_TTL)
+    return payload
@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from rest_framework.settings import api_settings
+
+from .models import Post
+from .serializers import PostListSerializer
+from .search import search_posts
+from .cache_keys import list_cache_key, list_version
+from .feeds import ALL, category_scope, tag_scope
+
+PUBLIC_FILTER = dict(status='published')
+LIST_TTL = 120  # 2 minutes
+DETAIL_TTL = 60 * 60
+ORDERINGS = ["-published_at", "published_at", "relevance", "views", "-views"]
+
+
+def published_qs():
+    return (Post.objects.filter(**PUBLIC_FILTER)
+            .select_related('author', 'category')
+            .prefetch_related('tags'))
+
+def list_params(query) -> dict:
+    """
+    Normalised list parameters from a QueryDict (or plain dict); also the
+    cache key material.
+    """
+    q = query.get("q")
+    ordering = query.get("ordering", "-published_at")
+    # tie-break by engagement if same date
+    if ordering == "relevance" and not q:
+        ordering = "-published_at"
+    if ordering not in ORDERINGS:
+        ordering = "-published_at"
+    return dict(category=query.get("category") or "", tag=query.get("tag") or "",
+                author=query.get("author") or "", q=q or "", ordering=ordering,
+                page=query.get("page", "1"), page_size=query.get("page_size", ""))
+
+def list_scope(params) -> str:
+    # the narrowest scope whose changes can alter this list
+    if params["category"]:
+        return category_scope(params["category"])
+    if params["tag"]:
+        return tag_scope(params["tag"])
+    return ALL
+
+def list_key(params) -> str:
+    return list_cache_key(params, list_version(list_scope(params)))
+
+def list_queryset(params):
+    qs = published_qs()
+    if params["category"]:
+        qs = qs.filter(category__slug=params["category"])
+    if params["tag"]:
+        qs = qs.filter(tags__slug=params["tag"])
+    if params["author"]:
+        qs = qs.filter(author__id=params["author"])
+    if params["q"]:
+        qs = search_posts(qs, params["q"])
+
+    ordering = params["ordering"]
+    if ordering == "views":
+        return qs.order_by("views_count")
+    if ordering == "-views":
+        return qs.order_by("-views_count")
+    if ordering == "relevance":
+        # handled by search_posts
+        return qs
+    return qs.order_by(ordering, "-views_count")
+
+def page_payload(page):
+    # what gets cached: plain data, the envelope is rebuilt per request
+    return {
+        "count": page.paginator.count,
+        "number": page.number,
+        "has_next": page.has_next(),
+        "results": PostListSerializer(list(page), many=True).data,
+    }
+
+def warm_first_page(params):
+    """
+    Render page 1 of a list into the cache as the view would. Returns the
+    cache key and payload.
+    """
+    params = {**params, "page": "1"}
+    payload = page_payload(Paginator(list_queryset(params), api_settings.PAGE_SIZE).page(1))
+    key = list_key(params)
+    cache.set(key, payload, LIST_TTL)
+    return key, payload
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from blogs.tasks import refresh_stale_derived_content
+
+
+class Command(BaseCommand):
+    help = "Build PostDerivedContent (search text, excerpt, toc) for every post missing it or out of date."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        chunk_size, total = max(1, opts["chunk_size"]), 0
+        while True:
+            built = refresh_stale_derived_content(limit=chunk_size)
+            total += built
+            if built:
+                self.stdout.write(f"{total} built")
+            if built < chunk_size:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Done: {total} posts rebuilt"))
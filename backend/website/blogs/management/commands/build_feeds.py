@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blogs.feeds import build_all_feeds
+
+
+class Command(BaseCommand):
+    help = "Pre-render RSS and Atom feeds for all posts, every category and every tag."
+
+    def handle(self, *args, **opts):
+        count = build_all_feeds()
+        self.stdout.write(self.style.SUCCESS(f"Rendered {count} feed scope(s)"))
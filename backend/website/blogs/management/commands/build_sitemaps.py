@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from blogs.sitemaps import build_sitemaps
+
+
+class Command(BaseCommand):
+    help = "Re-partition published posts and pre-render every sitemap shard plus the index."
+
+    def handle(self, *args, **opts):
+        manifest = build_sitemaps()
+        total = sum(shard["count"] for shard in manifest)
+        self.stdout.write(self.style.SUCCESS(f"Rendered {len(manifest)} sitemap shard(s) covering {total} posts"))
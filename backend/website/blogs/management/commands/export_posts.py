@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from blogs.models import Post
+from blogs.ndjson import export_lines
+
+
+class Command(BaseCommand):
+    help = "Stream posts as NDJSON (one JSON object per line), in the format import_posts reads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--out", default="-", help="File path, or - for stdout.")
+        parser.add_argument("--status", choices=[s for s, _ in Post.STATUS_CHOICES])
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        qs = Post.objects.filter(status=opts["status"]) if opts["status"] else Post.objects.all()
+        out = sys.stdout.buffer if opts["out"] == "-" else open(opts["out"], "wb")
+        count = 0
+        try:
+            for line in export_lines(qs, chunk_size=opts["chunk_size"]):
+                out.write(line)
+                count += 1
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        self.stderr.write(self.style.SUCCESS(f"Exported {count} posts"))
@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from blogs.ndjson import import_posts
+
+
+class Command(BaseCommand):
+    help = "Bulk-load posts from an NDJSON file (see export_posts); existing slugs are skipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, or - for stdin.")
+        parser.add_argument("--author", required=True,
+                            help="Username for posts whose author is missing or unknown.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Sanitizer process pool size; 1 runs in-process.")
+
+    def handle(self, *args, **opts):
+        author = get_user_model().objects.filter(username=opts["author"]).first()
+        if author is None:
+            raise CommandError(f"No user named {opts['author']!r}.")
+        started = time.monotonic()
+        source = sys.stdin.buffer if opts["path"] == "-" else open(opts["path"], "rb")
+        try:
+            stats = import_posts(source, author, batch_size=opts["batch_size"], workers=max(1, opts["workers"]))
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+        for err in stats["errors"]:
+            self.stderr.write(f"line {err['line']}: {err['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']}, skipped {stats['skipped']} existing, {stats['failed']} failed "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
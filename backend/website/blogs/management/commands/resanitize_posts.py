@@ -0,0 +1,93 @@
+import json
+import os
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from blogs.cache_keys import detail_cache_key
+from blogs.models import Post
+from blogs.pool import process_pool
+from blogs.sanitize import sanitize_rows
+
+
+class Command(BaseCommand):
+    help = "Re-sanitize post content and rebuild reading_time_minutes in bulk, resumably."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Process pool size; 1 runs in-process.")
+        parser.add_argument("--checkpoint", default=str(settings.BASE_DIR / ".resanitize_posts.json"))
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+
+    def handle(self, *args, **opts):
+        chunk_size, workers, checkpoint = opts["chunk_size"], max(1, opts["workers"]), opts["checkpoint"]
+        state = {"last_pk": None, "scanned": 0, "updated": 0}
+        if not opts["restart"] and os.path.exists(checkpoint):
+            with open(checkpoint) as fh:
+                state = json.load(fh)
+            self.stdout.write(f"Resuming after pk {state['last_pk']} ({state['scanned']} already scanned)")
+
+        started = time.monotonic()
+        scanned_before = state["scanned"]
+
+        def commit(rows, changed):
+            self._write(changed)
+            state["last_pk"] = str(rows[-1][0])
+            state["scanned"] += len(rows)
+            state["updated"] += len(changed)
+            with open(checkpoint, "w") as fh:
+                json.dump(state, fh)
+            rate = (state["scanned"] - scanned_before) / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f"{state['scanned']} scanned, {state['updated']} updated, {rate:.0f} posts/s")
+
+        chunks = self._chunks(state["last_pk"], chunk_size)
+        if workers == 1:
+            for rows in chunks:
+                commit(rows, sanitize_rows(rows))
+        else:
+            # workers only run bleach; the parent reads, writes and keeps a bounded
+            # number of chunks in flight, committing them in pk order
+            with process_pool(workers) as pool:
+                pending = deque()
+                for rows in chunks:
+                    pending.append((rows, pool.submit(sanitize_rows, rows)))
+                    if len(pending) >= workers * 2:
+                        rows_done, fut = pending.popleft()
+                        commit(rows_done, fut.result())
+                while pending:
+                    rows_done, fut = pending.popleft()
+                    commit(rows_done, fut.result())
+
+        elapsed = time.monotonic() - started
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {state['scanned']} posts scanned, {state['updated']} updated in {elapsed:.1f}s "
+            f"({(state['scanned'] - scanned_before) / max(elapsed, 1e-6):.0f} posts/s)"
+        ))
+
+    def _chunks(self, last_pk, chunk_size):
+        qs = Post.objects.order_by("pk").values_list(
+            "pk", "slug", "content", "reading_time_minutes", "content_hash"
+        )
+        while True:
+            page = qs.filter(pk__gt=last_pk) if last_pk else qs
+            rows = list(page[:chunk_size])
+            if not rows:
+                return
+            yield rows
+            last_pk = rows[-1][0]
+
+    def _write(self, changed):
+        if not changed:
+            return
+        # bulk_update skips signals and auto_now: this is not an editorial change
+        Post.objects.bulk_update(
+            [Post(pk=pk, content=c, reading_time_minutes=m, content_hash=h) for pk, _, c, m, h in changed],
+            ["content", "reading_time_minutes", "content_hash"],
+        )
+        cache.delete_many([detail_cache_key(slug) for _, slug, *_ in changed])
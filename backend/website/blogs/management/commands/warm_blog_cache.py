@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from blogs.warmup import warm_cache
+
+
+class Command(BaseCommand):
+    help = "Warm blog detail, list and homepage caches, e.g. after a deploy or a cache flush."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=100, help="Most viewed posts to warm.")
+        parser.add_argument("--recent", type=int, default=100, help="Most recently published posts to warm.")
+        parser.add_argument("--concurrency", type=int, default=4)
+
+    def handle(self, *args, **opts):
+        stats = warm_cache(top=opts["top"], recent=opts["recent"], concurrency=max(1, opts["concurrency"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {stats['keys']} keys ({stats['bytes'] / 1024:.1f} KiB) in {stats['seconds']:.1f}s"
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_comments_count(apps, schema_editor):
+    Post = apps.get_model('blogs', 'Post')
+    Comment = apps.get_model('blogs', 'Comment')
+    approved = (Comment.objects.filter(post=OuterRef('pk'), is_approved=True)
+                .order_by().values('post').annotate(n=Count('pk')).values('n'))
+    Post.objects.update(comments_count=Coalesce(Subquery(approved), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comments_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:04
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0003_post_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostDerivedContent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('plain_text', models.TextField(blank=True)),
+                ('excerpt', models.TextField(blank=True)),
+                ('toc', models.JSONField(blank=True, default=list)),
+                ('word_count', models.PositiveIntegerField(default=0)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='derived', to='blogs.post')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:12
+
+from django.db import migrations, models
+
+
+def seed_changelog(apps, schema_editor):
+    # an initial upsert for everything public, so a client syncing from 0 gets a full snapshot
+    ChangeLog = apps.get_model('blogs', 'ChangeLog')
+    Post = apps.get_model('blogs', 'Post')
+    Category = apps.get_model('blogs', 'Category')
+    Tag = apps.get_model('blogs', 'Tag')
+    sources = [
+        ('category', Category.objects.all()),
+        ('tag', Tag.objects.all()),
+        ('post', Post.objects.filter(status='published')),
+    ]
+    for kind, qs in sources:
+        ChangeLog.objects.bulk_create(
+            (ChangeLog(kind=kind, op='upsert', object_id=pk, slug=slug)
+             for pk, slug in qs.order_by('created_at').values_list('pk', 'slug').iterator()),
+            batch_size=1000,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0004_postderivedcontent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('category', 'Category'), ('tag', 'Tag')], max_length=10)),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('object_id', models.UUIDField()),
+                ('slug', models.SlugField(db_index=False, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(seed_changelog, migrations.RunPython.noop),
+    ]
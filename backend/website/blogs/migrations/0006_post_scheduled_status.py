@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:15
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def split_scheduled(apps, schema_editor):
+    Post = apps.get_model('blogs', 'Post')
+    published = Post.objects.filter(status='published')
+    published.filter(published_at__gt=timezone.now()).update(status='scheduled')
+    # left behind by the old make_published action, which didn't set a date
+    published.filter(published_at__isnull=True).update(published_at=F('updated_at'))
+
+
+def merge_scheduled(apps, schema_editor):
+    Post = apps.get_model('blogs', 'Post')
+    Post.objects.filter(status='scheduled').update(status='published')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0005_changelog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('scheduled', 'Scheduled'), ('published', 'Published'), ('archived', 'Archived')], default='draft', max_length=10),
+        ),
+        migrations.RunPython(split_scheduled, merge_scheduled),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:09
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def number_existing(apps, schema_editor):
+    # clients' id cursors carry over unchanged
+    ChangeLog = apps.get_model('blogs', 'ChangeLog')
+    ChangeLog.objects.update(seq=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0006_post_scheduled_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(number_existing, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ import uuid
 from django.db import models
 from django.db.models import F, Sum
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator
 
@@ -66,6 +67,7 @@ class Post(BaseModel):
     """
     STATUS_CHOICES = [
         ('draft', 'Draft'),
+        ('scheduled', 'Scheduled'),
         ('published', 'Published'),
         ('archived', 'Archived'),
     ]
@@ -74,6 +76,7 @@ class Post(BaseModel):
     slug = models.SlugField(unique=True, max_length=255, db_index=True)
     summary = models.TextField()
     content = models.TextField()  # WYSIWYG content, will be sanitized on save
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)  # sha256 of sanitized content
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
     published_at = models.DateTimeField(null=True, blank=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_posts')
@@ -89,13 +92,35 @@ class Post(BaseModel):
         default=0, validators=[MinValueValidator(0)]
     )
     views_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)  # approved only, see blogs.moderation
     allow_comments = models.BooleanField(default=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        if self.normalize_publish_state() and kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "status", "published_at"}
         super().save(*args, **kwargs)
 
+    def normalize_publish_state(self, now=None):
+        """
+        Keep status and published_at consistent so public queries can filter on
+        status alone: a published post has a published_at in the past, a future
+        one waits as 'scheduled' for blogs.tasks.publish_due_posts.
+        Returns True if anything changed.
+        """
+        now = now or timezone.now()
+        before = (self.status, self.published_at)
+        if self.status == 'published' and self.published_at is None:
+            self.published_at = now
+        elif self.status == 'published' and self.published_at > now:
+            self.status = 'scheduled'
+        elif self.status == 'scheduled' and self.published_at is None:
+            self.status = 'draft'
+        elif self.status == 'scheduled' and self.published_at <= now:
+            self.status = 'published'
+        return (self.status, self.published_at) != before
+
     def __str__(self):
         return self.title
 
@@ -114,6 +139,55 @@ class Post(BaseModel):
         ]
 
 
+class PostDerivedContent(BaseModel):
+    """
+    Artifacts computed from a post's sanitized HTML by a background task.
+    Valid only while `content_hash` matches the post's.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='derived')
+    content_hash = models.CharField(max_length=64, db_index=True)
+    plain_text = models.TextField(blank=True)
+    excerpt = models.TextField(blank=True)
+    toc = models.JSONField(default=list, blank=True)
+    word_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Derived content for {self.post_id}"
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of public content changes, read by the delta sync endpoint.
+    `seq` is the client's cursor, numbered after commit (see
+    blogs.changes.sequence_pending); deletes and unpublishes are recorded as
+    tombstones.
+    """
+    KIND_CHOICES = [
+        ('post', 'Post'),
+        ('category', 'Category'),
+        ('tag', 'Tag'),
+    ]
+    OP_CHOICES = [
+        ('upsert', 'Upsert'),
+        ('delete', 'Delete'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    object_id = models.UUIDField()
+    slug = models.SlugField(max_length=255, db_index=False)  # kept so tombstones can name what went away
+    # unlike id, only ever handed out to committed rows, so it grows in commit order
+    seq = models.BigIntegerField(null=True, blank=True, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.pk} {self.op} {self.kind} {self.slug}"
+
+
 class Comment(BaseModel):
     """
     Model for blog post comments.
@@ -0,0 +1,94 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Post, Comment
+from .cache_keys import bump_comments_version
+from .purge import queue_purge
+from .surrogate import comments_key
+
+CHUNK_SIZE = 500
+
+
+def refresh_comment_counts(post_ids):
+    """
+    Recompute Post.comments_count for the given posts in a single grouped UPDATE.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    approved = (Comment.objects.filter(post=OuterRef("pk"), is_approved=True)
+                .order_by().values("post").annotate(n=Count("pk")).values("n"))
+    return (Post.objects.filter(pk__in=post_ids)
+            .update(comments_count=Coalesce(Subquery(approved), Value(0))))
+
+def invalidate_comment_caches(post_ids):
+    # once per affected post, however many of its comments changed
+    slugs = list(Post.objects.filter(pk__in=list(post_ids)).values_list("slug", flat=True))
+    for slug in slugs:
+        bump_comments_version(slug)
+    queue_purge(comments_key(slug) for slug in slugs)
+
+
+_local = threading.local()
+
+@contextmanager
+def batched_comment_refresh():
+    """
+    Inside, the Comment save/delete receivers only note the post; counts are
+    refreshed once per post on the way out and caches after the enclosing
+    transaction commits, so a concurrent read can't re-cache the old pages.
+    """
+    outer = getattr(_local, "post_ids", None)
+    _local.post_ids = post_ids = set() if outer is None else outer
+    try:
+        yield
+    finally:
+        if outer is None:
+            _local.post_ids = None
+            refresh_comment_counts(post_ids)
+            transaction.on_commit(lambda: invalidate_comment_caches(post_ids))
+
+def deferred_comment_refresh(post_id):
+    # True if batched_comment_refresh() is collecting for this thread
+    post_ids = getattr(_local, "post_ids", None)
+    if post_ids is None:
+        return False
+    post_ids.add(post_id)
+    return True
+
+
+def moderate_comments(comment_ids, approve=True, chunk_size=CHUNK_SIZE):
+    """
+    Approve (or reject, i.e. hide) comments in chunks.
+
+    Each chunk is its own short transaction: flip `is_approved` with one
+    UPDATE, recount the touched posts with one grouped UPDATE and, after
+    commit, bump each touched post's comment-page version once. Works on ids
+    so callers can pass `queryset.values_list("pk", flat=True)` without
+    materialising rows. Returns the number of comments that changed state.
+    """
+    changed = 0
+    chunk = []
+    for pk in comment_ids.iterator() if hasattr(comment_ids, "iterator") else comment_ids:
+        chunk.append(pk)
+        if len(chunk) >= chunk_size:
+            changed += _moderate_chunk(chunk, approve)
+            chunk = []
+    if chunk:
+        changed += _moderate_chunk(chunk, approve)
+    return changed
+
+def _moderate_chunk(ids, approve):
+    with transaction.atomic():
+        todo = Comment.objects.filter(pk__in=ids).exclude(is_approved=approve)
+        post_ids = set(todo.values_list("post_id", flat=True))
+        if not post_ids:
+            return 0
+        changed = todo.update(is_approved=approve)
+        refresh_comment_counts(post_ids)
+        transaction.on_commit(lambda: invalidate_comment_caches(post_ids))
+    return changed
@@ -0,0 +1,256 @@
+import json
+from collections import deque
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+from .models import Post, Category, Tag
+from .cache_keys import bump_home_version, HOME_TAXONOMY
+from .changes import record, UPSERT
+from .purge import queue_purge
+from .feeds import ALL, category_scope, tag_scope
+from .pool import process_pool
+from .sanitize import sanitize_contents
+from .surrogate import CATEGORY_LIST, TAG_LIST
+from .tasks import refresh_stale_derived_content
+from .transitions import after_bulk_change
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+MAX_ERRORS = 100
+STATUSES = {value for value, _ in Post.STATUS_CHOICES}
+TEXT_FIELDS = ("summary", "featured_image", "canonical_url", "meta_title", "meta_description")
+
+
+# --- Export ---
+
+def post_record(post: Post) -> dict:
+    return {
+        "id": str(post.pk),
+        "title": post.title,
+        "slug": post.slug,
+        "summary": post.summary,
+        "content": post.content,
+        "status": post.status,
+        "published_at": post.published_at,
+        "author": getattr(post.author, "username", None),
+        "category": {"name": post.category.name, "slug": post.category.slug} if post.category else None,
+        "tags": [{"name": t.name, "slug": t.slug} for t in post.tags.all()],
+        "featured_image": post.featured_image,
+        "canonical_url": post.canonical_url,
+        "meta_title": post.meta_title,
+        "meta_description": post.meta_description,
+        "allow_comments": post.allow_comments,
+    }
+
+def export_lines(qs=None, chunk_size=BATCH_SIZE):
+    """
+    Yield one encoded NDJSON line per post. Rows are streamed with
+    iterator(chunk_size), tags prefetched per chunk, so memory stays flat.
+    """
+    qs = Post.objects.all() if qs is None else qs
+    qs = qs.select_related("author", "category").prefetch_related("tags").order_by("pk")
+    for post in qs.iterator(chunk_size=chunk_size):
+        yield (json.dumps(post_record(post), cls=DjangoJSONEncoder) + "\n").encode("utf-8")
+
+
+# --- Import ---
+
+def _string(rec, field, model=Post, required=False):
+    value = rec.get(field)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"{field} is required")
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    max_length = model._meta.get_field(field).max_length
+    if max_length and len(value) > max_length:
+        raise ValueError(f"{field} is too long")
+    return value
+
+def _term(model, value):
+    # {"name", "slug"} or a bare name -> (name, slug), checked against the model
+    if isinstance(value, str):
+        value = {"name": value}
+    if not isinstance(value, dict):
+        raise ValueError(f"{model._meta.model_name} must be an object or a name")
+    name = _string(value, "name", model) or _string(value, "slug", model)
+    slug = _string(value, "slug", model) or slugify(name or "")
+    if not name or not slug:
+        raise ValueError(f"{model._meta.model_name} needs a name or slug")
+    _string({"slug": slug}, "slug", model)
+    return name, slug
+
+def _validate(rec):
+    if not isinstance(rec, dict):
+        raise ValueError("a JSON object with a title is required")
+    _string(rec, "title", required=True)
+    rec["slug"] = _string(rec, "slug") or slugify(rec["title"])
+    _string(rec, "slug", required=True)
+    _string(rec, "content")
+    if not isinstance(rec.get("author") or "", str):
+        raise ValueError("author must be a username")
+    for field in TEXT_FIELDS:
+        _string(rec, field)
+    rec["status"] = _string(rec, "status") or "draft"
+    if rec["status"] not in STATUSES:
+        raise ValueError(f"unknown status {rec['status']!r}")
+    if rec.get("published_at"):
+        if not isinstance(rec["published_at"], str):
+            raise ValueError("published_at must be an ISO 8601 string")
+        rec["published_at"] = parse_datetime(rec["published_at"])
+        if rec["published_at"] is None:
+            raise ValueError("published_at is not an ISO 8601 datetime")
+        if timezone.is_naive(rec["published_at"]):
+            rec["published_at"] = timezone.make_aware(rec["published_at"])
+    else:
+        rec["published_at"] = None
+    if not isinstance(rec.get("allow_comments", True), bool):
+        raise ValueError("allow_comments must be a boolean")
+    # normalised to (name, slug) here so _insert only sees checked values
+    rec["category"] = _term(Category, rec["category"]) if rec.get("category") else None
+    tags = rec.get("tags") or []
+    if not isinstance(tags, list):
+        raise ValueError("tags must be a list")
+    rec["tags"] = [_term(Tag, t) for t in tags]
+    return rec
+
+def _parse(lines, stats):
+    for lineno, line in enumerate(lines, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line.strip():
+                continue
+            rec = _validate(json.loads(line))
+        except (ValueError, TypeError) as exc:  # UnicodeDecodeError is a ValueError
+            _error(stats, lineno, exc)
+            continue
+        yield lineno, rec
+
+def _error(stats, lineno, exc):
+    stats["failed"] += 1
+    if len(stats["errors"]) < MAX_ERRORS:
+        stats["errors"].append({"line": lineno, "error": str(exc)})
+
+def _batches(lines, batch_size, stats):
+    batch = []
+    for item in _parse(lines, stats):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _ensure(model, kind, terms, effects):
+    """
+    slug -> instance for every (name, slug), creating the missing ones with one
+    bulk_create. A name already taken under another slug is left unresolved.
+    """
+    terms = {slug: name for name, slug in terms if slug}
+    found = model.objects.in_bulk(list(terms), field_name="slug")
+    missing = [slug for slug in terms if slug not in found]
+    if missing:
+        model.objects.bulk_create([model(name=terms[s], slug=s) for s in missing], ignore_conflicts=True)
+        found = model.objects.in_bulk(list(terms), field_name="slug")
+        created = [(found[s].pk, s) for s in missing if s in found]
+        record(kind, UPSERT, created)
+        effects["taxonomy"] |= bool(created)
+    return found
+
+def import_posts(lines, default_author, batch_size=BATCH_SIZE, workers=1):
+    """
+    Bulk-load posts from NDJSON lines (the export_lines format).
+
+    Lines are parsed and sanitized in batches; with workers > 1 sanitizing
+    runs in a process pool with a bounded number of batches in flight while
+    the parent inserts finished ones in order. Each batch is one
+    transaction: categories and tags are created in bulk, posts with
+    bulk_create, tag links with one bulk_create on the through table.
+    Existing slugs are skipped, bad lines are reported and skipped.
+
+    Returns {"created", "skipped", "failed", "errors"}.
+    """
+    stats = {"created": 0, "skipped": 0, "failed": 0, "errors": []}
+    effects = {"scopes": set(), "slugs": [], "ids": [], "etas": [], "taxonomy": False}
+    batches = _batches(lines, batch_size, stats)
+    if workers <= 1:
+        for batch in batches:
+            _insert(batch, sanitize_contents([rec.get("content") or "" for _, rec in batch]),
+                    default_author, stats, effects)
+    else:
+        with process_pool(workers) as pool:
+            pending = deque()
+            for batch in batches:
+                contents = [rec.get("content") or "" for _, rec in batch]
+                pending.append((batch, pool.submit(sanitize_contents, contents)))
+                if len(pending) >= workers * 2:
+                    done, fut = pending.popleft()
+                    _insert(done, fut.result(), default_author, stats, effects)
+            while pending:
+                done, fut = pending.popleft()
+                _insert(done, fut.result(), default_author, stats, effects)
+
+    if effects["taxonomy"]:
+        queue_purge([CATEGORY_LIST, TAG_LIST])
+        bump_home_version(HOME_TAXONOMY)
+    if stats["created"]:
+        refresh_stale_derived_content.delay(limit=stats["created"])
+        # imported rows are all created now, so they land in the newest sitemap shard
+        after_bulk_change(
+            post_ids=effects["ids"], slugs=effects["slugs"], scopes=effects["scopes"],
+            created_ats=[timezone.now()] if effects["ids"] else (),
+            public_ids=effects["ids"], etas=effects["etas"], prewarm=False,
+        )
+    return stats
+
+def _insert(batch, cleaned, default_author, stats, effects):
+    slugs = [rec["slug"] for _, rec in batch]
+    with transaction.atomic():
+        taken = set(Post.objects.filter(slug__in=slugs).values_list("slug", flat=True))
+        categories = _ensure(Category, "category",
+                             [rec["category"] for _, rec in batch if rec["category"]], effects)
+        tags = _ensure(Tag, "tag", [t for _, rec in batch for t in rec["tags"]], effects)
+        usernames = {rec["author"] for _, rec in batch if rec.get("author")}
+        authors = User.objects.in_bulk(list(usernames), field_name="username") if usernames else {}
+
+        posts, links = [], []
+        for (lineno, rec), (content, minutes, digest) in zip(batch, cleaned):
+            if rec["slug"] in taken:
+                stats["skipped"] += 1
+                continue
+            taken.add(rec["slug"])
+            category = categories.get(rec["category"][1]) if rec["category"] else None
+            post = Post(
+                title=rec["title"], slug=rec["slug"], content=content, reading_time_minutes=minutes,
+                content_hash=digest, status=rec["status"], published_at=rec.get("published_at"),
+                author=authors.get(rec.get("author"), default_author), category=category,
+                allow_comments=rec.get("allow_comments", True),
+                **{f: rec[f] for f in TEXT_FIELDS if rec.get(f) is not None},
+            )
+            # bulk_create skips Post.save()
+            post.normalize_publish_state()
+            post_tags = [tags[slug] for slug in {slug for _, slug in rec["tags"]} if slug in tags]
+            links += [Post.tags.through(post_id=post.pk, tag_id=tag.pk) for tag in post_tags]
+            posts.append(post)
+
+            if post.status == "published":
+                effects["ids"].append(post.pk)
+                effects["slugs"].append(post.slug)
+                effects["scopes"] |= {ALL, *(tag_scope(t.slug) for t in post_tags)}
+                if category:
+                    effects["scopes"].add(category_scope(category.slug))
+            elif post.status == "scheduled":
+                effects["etas"].append(post.published_at)
+
+        Post.objects.bulk_create(posts)
+        Post.tags.through.objects.bulk_create(links)
+        record("post", UPSERT, [(p.pk, p.slug) for p in posts if p.status == "published"])
+    stats["created"] += len(posts)
@@ -0,0 +1,16 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+def process_pool(workers):
+    """
+    Process pool for the bulk commands. Always spawn, so every platform
+    behaves like Windows and macOS (and forkserver, the Linux default from
+    3.14), with Django set up in each worker before it unpickles a task.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker)
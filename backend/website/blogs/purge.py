@@ -0,0 +1,87 @@
+import json
+import logging
+import threading
+import urllib.request
+import weakref
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# most CDNs cap the number of keys per purge request
+MAX_KEYS_PER_REQUEST = 256
+
+
+class BasePurgeBackend:
+    def __init__(self, **options):
+        self.options = options
+
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class NullPurgeBackend(BasePurgeBackend):
+    def purge(self, keys):
+        logger.debug("surrogate purge (noop): %s", " ".join(keys))
+
+
+class HTTPPurgeBackend(BasePurgeBackend):
+    """
+    POSTs keys to `URL`, both as a space separated Surrogate-Key header
+    (Fastly style) and as a JSON body, with an optional bearer `TOKEN`.
+    """
+    def purge(self, keys):
+        headers = {"Content-Type": "application/json", "Surrogate-Key": " ".join(keys)}
+        if self.options.get("TOKEN"):
+            headers["Authorization"] = f"Bearer {self.options['TOKEN']}"
+        req = urllib.request.Request(
+            self.options["URL"], data=json.dumps({"surrogate_keys": list(keys)}).encode(),
+            headers=headers, method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.options.get("TIMEOUT", 5)) as res:
+            res.read()
+
+
+def get_backend():
+    path = getattr(settings, "BLOG_PURGE_BACKEND", "blogs.purge.NullPurgeBackend")
+    return import_string(path)(**getattr(settings, "BLOG_PURGE_OPTIONS", {}))
+
+def purge_now(keys):
+    keys = sorted(set(keys))
+    backend = get_backend()
+    for i in range(0, len(keys), MAX_KEYS_PER_REQUEST):
+        backend.purge(keys[i:i + MAX_KEYS_PER_REQUEST])
+    return len(keys)
+
+
+# Keys queued by signals are collected per transaction and dispatched once,
+# after commit, as a single task. The batch is only referenced from the
+# transaction's on_commit callbacks, so a rollback (which discards them)
+# also retires the batch; _local keeps a weak reference to find it again.
+_local = threading.local()
+
+
+class _Batch:
+    def __init__(self):
+        self.keys = set()
+        self.sent = False
+
+    def flush(self):
+        if self.sent or not self.keys:
+            return
+        self.sent = True
+        from .tasks import purge_surrogate_keys
+        purge_surrogate_keys.delay(sorted(self.keys))
+
+
+def queue_purge(keys):
+    ref = getattr(_local, "batch", None)
+    batch = ref() if ref else None
+    if batch is None or batch.sent:
+        batch = _Batch()
+        _local.batch = weakref.ref(batch)
+    batch.keys.update(keys)
+    # registered per call: a savepoint rollback drops only its own callbacks
+    transaction.on_commit(batch.flush)
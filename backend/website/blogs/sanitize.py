@@ -0,0 +1,84 @@
+import hashlib
+import math
+import threading
+
+import bleach
+from bleach.html5lib_shim import Filter, HTML_TAGS_BLOCK_LEVEL
+
+ALLOWED_TAGS = set(bleach.sanitizer.ALLOWED_TAGS).union({
+    "p","br","strong","em","ul","ol","li","blockquote","code","pre",
+    "h2","h3","h4","h5","h6","img","a","figure","figcaption"
+})
+
+ALLOWED_ATTRS = {
+    "*": ["class", "id"],
+    "a": ["href", "title", "rel", "target"],
+    "img": ["src", "alt", "width", "height", "loading"]
+}
+
+COMMENT_TAGS = {"strong", "em", "code", "br", "p"}
+
+WORDS_PER_MINUTE = 200
+
+# bleach.Cleaner keeps parser state, so each thread builds its own once
+_local = threading.local()
+
+
+class WordCountFilter(Filter):
+    """
+    Counts words in the sanitized text stream as it is serialized, so the
+    reading time falls out of the same parse as the cleaning.
+    """
+    def __iter__(self):
+        text = []
+        for token in super().__iter__():
+            if token["type"] in ("Characters", "SpaceCharacters"):
+                text.append(token["data"])
+            elif token["type"] == "StartTag" and token["name"] in HTML_TAGS_BLOCK_LEVEL:
+                # bleach turns a stripped block-level tag into a newline
+                text.append("\n")
+            yield token
+        _local.words = len("".join(text).split())
+
+
+def _cleaners():
+    if not hasattr(_local, "post"):
+        _local.post = bleach.Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS, strip=True,
+                                     filters=[WordCountFilter])
+        _local.comment = bleach.Cleaner(tags=COMMENT_TAGS, attributes={}, strip=True)
+    return _local
+
+def content_hash(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+def reading_time(words: int) -> int:
+    # simple reading time: ~200 wpm on stripped text
+    return max(1, math.ceil(words / WORDS_PER_MINUTE))
+
+def sanitize_post(html: str):
+    """
+    Returns (clean_html, reading_time_minutes, content_hash) for post content.
+    """
+    clean = _cleaners().post.clean(html)
+    return clean, reading_time(_local.words), content_hash(clean)
+
+def sanitize_comment(html: str) -> str:
+    return _cleaners().comment.clean(html)
+
+def sanitize_rows(rows):
+    """
+    Worker side: rows are (pk, slug, content, reading_time, content_hash)
+    tuples. Returns only the rows whose derived values actually change.
+    """
+    changed = []
+    for pk, slug, content, minutes, digest in rows:
+        if not content:
+            continue
+        clean, new_minutes, new_digest = sanitize_post(content)
+        if (clean, new_minutes, new_digest) != (content, minutes, digest):
+            changed.append((pk, slug, clean, new_minutes, new_digest))
+    return changed
+
+def sanitize_contents(contents):
+    # worker side of blogs.ndjson.import_posts
+    return [sanitize_post(html) if html else ("", 0, "") for html in contents]
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Post
+
+PUBLISH_BATCH = 200
+# exact-time timers only for posts due this soon; the 60s beat covers the rest
+EXACT_PUBLISH_HORIZON = timedelta(hours=1)
+
+
+def queue_exact_publish(eta):
+    """
+    Run publish_due_posts at `eta` if that's within EXACT_PUBLISH_HORIZON,
+    so far-future posts don't pile up ETA messages on the broker (one per
+    save). Returns whether a timer was queued.
+    """
+    if eta is None or eta - timezone.now() > EXACT_PUBLISH_HORIZON:
+        return False
+    from .tasks import publish_due_posts
+    publish_due_posts.apply_async(eta=eta)
+    return True
+
+
+def publish_due(limit=PUBLISH_BATCH):
+    """
+    Flip due 'scheduled' posts to 'published'. Each post is saved on its own,
+    row locked, so every post_save receiver (caches, feeds, sitemaps, change
+    log) runs as for an editor's save, and concurrent runs don't double up.
+    """
+    due = list(Post.objects.filter(status="scheduled", published_at__lte=timezone.now())
+               .order_by("published_at").values_list("pk", flat=True)[:limit])
+    published = 0
+    for pk in due:
+        with transaction.atomic():
+            post = (Post.objects.select_for_update(skip_locked=True)
+                    .filter(pk=pk, status="scheduled").first())
+            if post is None:
+                continue
+            post.status = "published"
+            post.save(update_fields=["status", "updated_at"])
+            published += 1
+    return published
@@ -1,4 +1,5 @@
 from django.db.models import Q
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
 POSTGRES = settings.DATABASES['default']['ENGINE'].endswith('postgresql')
@@ -7,17 +8,20 @@ def search_posts(qs, query: str):
     if not query:
         return qs
     if POSTGRES:
-        # Weighted FTS: title (A) > summary (B) > content (C)
+        # Weighted FTS: title (A) > summary (B) > body text (C)
         from django.contrib.postgres.search import SearchVector, SearchRank, SearchQuery
         vector = (
             SearchVector('title', weight='A') +
             SearchVector('summary', weight='B') +
-            SearchVector('content', weight='C')
+            # raw content only until refresh_stale_derived_content has built the row
+            SearchVector(Coalesce('derived__plain_text', 'content'), weight='C')
         )
         search_query = SearchQuery(query)
         qs = qs.annotate(rank=SearchRank(vector, search_query)).filter(rank__gt=0.0).order_by('-rank', '-published_at')
         return qs
-    # Fallback: icontains
+    # Fallback: icontains. Body text comes from PostDerivedContent so markup never matches,
+    # except for posts whose derived row hasn't been built yet.
     return qs.filter(
-        Q(title__icontains=query) | Q(summary__icontains=query) | Q(content__icontains=query)
+        Q(title__icontains=query) | Q(summary__icontains=query) | Q(derived__plain_text__icontains=query)
+        | Q(derived__isnull=True, content__icontains=query)
     ).order_by('-published_at')
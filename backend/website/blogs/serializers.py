@@ -1,6 +1,7 @@
 from django.utils.html import strip_tags
 from rest_framework import serializers
 from .models import Category, Tag, Post, Comment, Reaction, MediaAsset
+from .derived import is_thin
 
 class CategoryMiniSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,7 +21,8 @@ class PostListSerializer(serializers.ModelSerializer):
         model = Post
         fields = (
             "id", "title", "slug", "summary", "featured_image", "category", "tags",
-            "published_at", "reading_time_minutes", "meta_title", "meta_description", "likes_count"
+            "published_at", "reading_time_minutes", "meta_title", "meta_description", "likes_count",
+            "comments_count"
         )
 
 class PostDetailSerializer(serializers.ModelSerializer):
@@ -29,18 +31,44 @@ class PostDetailSerializer(serializers.ModelSerializer):
     author = serializers.SerializerMethodField()
     likes_count = serializers.IntegerField(read_only=True)
 
+    excerpt = serializers.SerializerMethodField()
+    toc = serializers.SerializerMethodField()
+    word_count = serializers.SerializerMethodField()
+
     def get_author(self, obj):
         if not obj.author:
             return None
         # Public-safe author payload
         return {"id": str(obj.author.id), "name": getattr(obj.author, "username", "author")}
 
+    def _derived(self, obj):
+        # precomputed by blogs.tasks.build_post_derived; ignored once content moves on
+        derived = getattr(obj, "derived", None) if obj.pk else None
+        if derived is None or derived.content_hash != obj.content_hash:
+            return None
+        return derived
+
+    def get_excerpt(self, obj):
+        derived = self._derived(obj)
+        if derived is None or not is_thin(obj.summary):
+            return obj.summary
+        return derived.excerpt
+
+    def get_toc(self, obj):
+        derived = self._derived(obj)
+        return derived.toc if derived else []
+
+    def get_word_count(self, obj):
+        derived = self._derived(obj)
+        return derived.word_count if derived else None
+
     class Meta:
         model = Post
         fields = (
             "id", "title", "slug", "content", "author", "category", "tags",
             "published_at", "meta_title", "meta_description", "canonical_url",
-            "views_count", "likes_count", "featured_image", "reading_time_minutes"
+            "views_count", "likes_count", "comments_count", "featured_image", "reading_time_minutes",
+            "excerpt", "toc", "word_count"
         )
 
 class CommentPublicSerializer(serializers.ModelSerializer):
@@ -55,11 +83,29 @@ class CommentPublicSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ("id", "author_display", "content", "created_at")
 
+class CommentThreadSerializer(CommentPublicSerializer):
+    replies = serializers.SerializerMethodField()
+
+    def get_replies(self, obj):
+        # children are attached in memory by blogs.threads; never hits the db
+        return CommentThreadSerializer(getattr(obj, "thread_replies", []), many=True).data
+
+    class Meta(CommentPublicSerializer.Meta):
+        fields = CommentPublicSerializer.Meta.fields + ("replies",)
+
 class CommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ("author_name", "content")
 
+class CommentModerationSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=10000)
+    action = serializers.ChoiceField(choices=["approve", "reject"])
+
+class PostBulkTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=10000)
+    status = serializers.ChoiceField(choices=["published", "draft", "archived"])
+
 class ReactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reaction
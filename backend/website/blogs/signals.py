@@ -1,34 +1,299 @@
-import math
-import bleach
-from django.db.models.signals import pre_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Post, Comment
+from .models import Post, Comment, Category, Tag
+from .moderation import refresh_comment_counts, invalidate_comment_caches, deferred_comment_refresh
+from .tasks import (
+    build_post_derived, refresh_sitemap_shard, refresh_feeds, refresh_all_feeds, export_static_pages,
+)
+from .scheduling import queue_exact_publish
+from .feeds import ALL, category_scope, tag_scope, post_scopes
+from .static_export import export_dir
+from .purge import queue_purge
+from .cache_keys import bump_home_version, invalidate_post_caches, HOME_POSTS, HOME_TAXONOMY
+from .changes import record, record_posts, UPSERT, DELETE
+from .surrogate import post_key, category_key, tag_key, comments_key, POST_LIST, CATEGORY_LIST, TAG_LIST
+from .sanitize import ALLOWED_TAGS, ALLOWED_ATTRS, content_hash, sanitize_post, sanitize_comment  # noqa: F401
 
-# ALLOWED_TAGS = bleach.sanitizer.ALLOWED_TAGS + [
-#     "p","br","strong","em","ul","ol","li","blockquote","code","pre","h2","h3","h4","h5","h6","img","a","figure","figcaption"
-# ]
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance: Post, raw=False, **kwargs):
+    # one lookup per admin save so post_save receivers can see what changed
+    instance._previous = None
+    if raw or instance._state.adding:
+        return
+    instance._previous = (Post.objects.filter(pk=instance.pk)
+                          .values("status", "slug", "category__slug").first())
 
-ALLOWED_TAGS = set(bleach.sanitizer.ALLOWED_TAGS).union({
-    "p","br","strong","em","ul","ol","li","blockquote","code","pre",
-    "h2","h3","h4","h5","h6","img","a","figure","figcaption"
-})
+@receiver(pre_save, sender=Post)
+def clean_post_html(sender, instance: Post, update_fields=None, **kwargs):
+    if update_fields is not None and "content" not in update_fields:
+        return
+    if not instance.content:
+        return
+    # content_hash is taken over sanitized output, so a match means there is nothing to do
+    if instance.content_hash and instance.content_hash == content_hash(instance.content):
+        return
+    instance.content, instance.reading_time_minutes, instance.content_hash = sanitize_post(instance.content)
+    instance._content_changed = True
 
-ALLOWED_ATTRS = {
-    "*": ["class", "id"],
-    "a": ["href", "title", "rel", "target"],
-    "img": ["src", "alt", "width", "height", "loading"]
-}
+@receiver(post_save, sender=Post)
+def schedule_post_derived(sender, instance: Post, **kwargs):
+    if not getattr(instance, "_content_changed", False):
+        return
+    instance._content_changed = False
+    pk = str(instance.pk)
+    transaction.on_commit(lambda: build_post_derived.delay(pk))
 
-@receiver(pre_save, sender=Post)
-def clean_post_html(sender, instance: Post, **kwargs):
-    if instance.content:
-        instance.content = bleach.clean(instance.content, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS, strip=True)
-        # simple reading time: ~200 wpm on stripped text
-        plain = bleach.clean(instance.content, tags=[], strip=True)
-        words = len(plain.split())
-        instance.reading_time_minutes = max(1, math.ceil(words/200))
+@receiver(post_save, sender=Post)
+def schedule_publish(sender, instance: Post, **kwargs):
+    # exact-time publish when due soon; the beat run of the same task does the rest
+    if instance.status != "scheduled":
+        return
+    eta = instance.published_at
+    transaction.on_commit(lambda: queue_exact_publish(eta))
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def schedule_sitemap_refresh(sender, instance: Post, **kwargs):
+    # only the shard holding this post's created_at range is re-rendered
+    created_at = instance.created_at.isoformat()
+    transaction.on_commit(lambda: refresh_sitemap_shard.delay(created_at))
 
 @receiver(pre_save, sender=Comment)
 def clean_comment_html(sender, instance: Comment, **kwargs):
     if instance.content:
-        instance.content = bleach.clean(instance.content, tags=["strong","em","code","br","p"], attributes={}, strip=True)
+        instance.content = sanitize_comment(instance.content)
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance: Comment, created=False, **kwargs):
+    # a new pending comment isn't visible yet; everything else may change a page
+    if created and not instance.is_approved:
+        return
+    if deferred_comment_refresh(instance.post_id):
+        return
+    refresh_comment_counts([instance.post_id])
+    invalidate_comment_caches([instance.post_id])
+
+def _refresh_scopes(post_id=None, scopes=(), removed_slugs=(), member_scopes=()):
+    """
+    Queue, after commit, everything rendered per listing scope: feeds and,
+    when enabled, static pages. The post's own current scopes are added by the tasks.
+    """
+    pk, scopes = (str(post_id) if post_id else None), list(scopes)
+    removed_slugs, member_scopes = list(removed_slugs), list(member_scopes)
+
+    def enqueue():
+        refresh_feeds.delay(pk, scopes + member_scopes)
+        if export_dir():
+            export_static_pages.delay([pk] if pk else [], removed_slugs, scopes, member_scopes)
+    transaction.on_commit(enqueue)
+
+@receiver(post_save, sender=Post)
+def schedule_scope_refresh(sender, instance: Post, **kwargs):
+    previous = getattr(instance, "_previous", None) or {}
+    if instance.status != "published" and previous.get("status") != "published":
+        return
+    scopes, removed = [ALL], []
+    if previous.get("category__slug"):
+        scopes.append(category_scope(previous["category__slug"]))
+    if previous.get("slug") and (previous["slug"] != instance.slug or instance.status != "published"):
+        removed.append(previous["slug"])
+    _refresh_scopes(instance.pk, scopes, removed)
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def schedule_scope_refresh_for_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and not reverse:
+        instance._cleared_tag_scopes = [tag_scope(s) for s in instance.tags.values_list("slug", flat=True)]
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # tag.posts.add(...): the tag's pages plus the posts that moved
+        _refresh_scopes(None, [ALL], member_scopes=[tag_scope(instance.slug)])
+        return
+    if instance.status != "published":
+        return
+    if action == "post_clear":
+        scopes = getattr(instance, "_cleared_tag_scopes", [])
+    else:
+        scopes = [tag_scope(s) for s in Tag.objects.filter(pk__in=pk_set).values_list("slug", flat=True)]
+    _refresh_scopes(instance.pk, scopes)
+
+@receiver(pre_delete, sender=Post)
+def schedule_scope_refresh_on_delete(sender, instance: Post, **kwargs):
+    if instance.status != "published":
+        return
+    _refresh_scopes(None, post_scopes(instance), removed_slugs=[instance.slug])
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Tag)
+def remember_previous_term(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if not raw and not instance._state.adding:
+        instance._previous = sender.objects.filter(pk=instance.pk).values("name", "slug").first()
+
+def _refresh_term(instance, scope_of):
+    # names are rendered into every member post and listing, and into feed
+    # items of any scope those posts appear in, so a rename rebuilds all feeds
+    previous = getattr(instance, "_previous", None) or {}
+    old_scopes = [scope_of(previous["slug"])] if previous.get("slug", instance.slug) != instance.slug else []
+    _refresh_scopes(None, [ALL], member_scopes=[scope_of(instance.slug)])
+    if previous and (previous["name"], previous["slug"]) != (instance.name, instance.slug):
+        transaction.on_commit(lambda: refresh_all_feeds.delay(old_scopes))
+
+@receiver(post_save, sender=Category)
+def schedule_category_refresh(sender, instance: Category, created=False, **kwargs):
+    if not created:
+        _refresh_term(instance, category_scope)
+
+@receiver(post_save, sender=Tag)
+def schedule_tag_refresh(sender, instance: Tag, created=False, **kwargs):
+    if not created:
+        _refresh_term(instance, tag_scope)
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_responses(sender, instance: Post, signal, **kwargs):
+    previous = getattr(instance, "_previous", None) or {}
+    if instance.status != "published" and previous.get("status") != "published":
+        return
+    keys = [post_key(instance.pk), POST_LIST]
+    if signal is post_delete:
+        keys.append(comments_key(instance.slug))
+    else:
+        # the thread stays cached under the slug it was served at
+        old_slug = previous.get("slug") or instance.slug
+        if instance.status != "published" or old_slug != instance.slug:
+            keys.append(comments_key(old_slug))
+    queue_purge(keys)
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def purge_post_responses_for_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        queue_purge([tag_key(instance.slug), POST_LIST] + [post_key(pk) for pk in pk_set or ()])
+    elif instance.status == "published":
+        queue_purge([post_key(instance.pk), POST_LIST])
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category_responses(sender, instance: Category, **kwargs):
+    # category-<slug> also tags every post response embedding the category
+    queue_purge([category_key(instance.slug), CATEGORY_LIST, POST_LIST])
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_tag_responses(sender, instance: Tag, **kwargs):
+    queue_purge([tag_key(instance.slug), TAG_LIST, POST_LIST])
+
+# --- Delta sync change log (blogs.changes) ---
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def log_post_change(sender, instance: Post, signal, **kwargs):
+    previous = getattr(instance, "_previous", None) or {}
+    if signal is post_delete:
+        if instance.status == "published":
+            record("post", DELETE, [(instance.pk, instance.slug)])
+    elif instance.status == "published":
+        record("post", UPSERT, [(instance.pk, instance.slug)])
+    elif previous.get("status") == "published":
+        # unpublished: clients drop it by id
+        record("post", DELETE, [(instance.pk, instance.slug)])
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def log_post_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        instance._cleared_post_ids = list(instance.posts.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        if instance.status == "published":
+            record("post", UPSERT, [(instance.pk, instance.slug)])
+        return
+    ids = getattr(instance, "_cleared_post_ids", []) if action == "post_clear" else pk_set
+    record_posts(Post.objects.filter(pk__in=ids))
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def log_taxonomy_change(sender, instance, created=False, **kwargs):
+    kind = "category" if sender is Category else "tag"
+    record(kind, UPSERT, [(instance.pk, instance.slug)])
+    if not created:
+        # member posts embed the name and slug
+        record_posts(instance.posts.all())
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def log_taxonomy_delete(sender, instance, **kwargs):
+    kind = "category" if sender is Category else "tag"
+    record_posts(instance.posts.all())
+    record(kind, DELETE, [(instance.pk, instance.slug)])
+
+# --- Homepage fragment generations (blogs.home) ---
+
+def _bump_home(*names):
+    # after commit, so a concurrent rebuild can't cache pre-commit rows under the new generation
+    transaction.on_commit(lambda: [bump_home_version(name) for name in names])
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_home_for_post(sender, instance: Post, **kwargs):
+    previous = getattr(instance, "_previous", None) or {}
+    if instance.status == "published" or previous.get("status") == "published":
+        _bump_home(HOME_POSTS)
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def bump_home_for_tags(sender, instance, action, reverse, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and (reverse or instance.status == "published"):
+        _bump_home(HOME_POSTS)
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_home_for_taxonomy(sender, instance, **kwargs):
+    # posts embed category and tag names, so both generations move
+    _bump_home(HOME_POSTS, HOME_TAXONOMY)
+
+# --- Detail and list response caches ---
+
+def _invalidate_after_commit(slugs, scopes):
+    slugs, scopes = list(slugs), list(scopes)
+    transaction.on_commit(lambda: invalidate_post_caches(slugs, scopes))
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_responses(sender, instance: Post, **kwargs):
+    previous = getattr(instance, "_previous", None) or {}
+    if instance.status != "published" and previous.get("status") != "published":
+        return
+    scopes = post_scopes(instance)
+    if previous.get("category__slug"):
+        scopes.add(category_scope(previous["category__slug"]))
+    _invalidate_after_commit({instance.slug, previous.get("slug") or instance.slug}, scopes)
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_post_responses_for_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        slugs = Post.objects.filter(pk__in=pk_set or (), status="published").values_list("slug", flat=True)
+        _invalidate_after_commit(slugs, [ALL, tag_scope(instance.slug)])
+    elif instance.status == "published":
+        removed = getattr(instance, "_cleared_tag_scopes", []) if action == "post_clear" else []
+        _invalidate_after_commit([instance.slug], post_scopes(instance) | set(removed) | {
+            tag_scope(s) for s in Tag.objects.filter(pk__in=pk_set or ()).values_list("slug", flat=True)})
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_taxonomy_responses(sender, instance, **kwargs):
+    # member post payloads embed the name
+    scope = category_scope(instance.slug) if sender is Category else tag_scope(instance.slug)
+    slugs = instance.posts.filter(status="published").values_list("slug", flat=True)
+    _invalidate_after_commit(slugs, [ALL, scope])
@@ -1,13 +1,164 @@
+import os
+from xml.sax.saxutils import escape
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
-from django.utils import timezone
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
 from .models import Post
 
+MANIFEST_KEY = "blogs:sitemap:manifest"
+INDEX_KEY = "blogs:sitemap:index"
+XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _shard_size():
+    return getattr(settings, "BLOG_SITEMAP_SHARD_SIZE", 50000)
+
+def _sitemap_dir():
+    # optional directory nginx can serve directly; the cache is always written
+    return getattr(settings, "BLOG_SITEMAP_DIR", None)
+
+def _base_url():
+    # where the shards are served: this backend, not the frontend
+    return getattr(settings, "BLOG_SITEMAP_BASE_URL", "http://localhost:8000").rstrip("/")
+
+def post_url(slug):
+    return f"{settings.FRONTEND_BASE_URL}/blogs/{slug}"
+
+def shard_key(n):
+    return f"blogs:sitemap:shard:{n}"
+
+def shard_filename(n):
+    return "sitemap.xml" if n is None else f"sitemap-{n}.xml"
+
+
 class PostSitemap(Sitemap):
     changefreq = "daily"
     priority = 0.6
 
     def items(self):
-        return Post.objects.filter(status='published', published_at__lte=timezone.now())
+        return (Post.objects.filter(status='published')
+                .order_by('created_at', 'id').values('slug', 'updated_at'))
+
+    def location(self, item):
+        return post_url(item['slug'])
+
+    def lastmod(self, item):
+        return item['updated_at']
+
+
+# --- Precomputed shards ---
+# Posts are partitioned by created_at, which never changes, so a post always
+# lands in the same shard. The manifest stores each shard's lower bound; a
+# shard covers [lo, next shard's lo).
+
+def _rows(lo=None, hi=None):
+    qs = PostSitemap().items().values_list('created_at', 'slug', 'updated_at')
+    if lo:
+        qs = qs.filter(created_at__gte=parse_datetime(lo))
+    if hi:
+        qs = qs.filter(created_at__lt=parse_datetime(hi))
+    return qs.iterator(chunk_size=2000)
+
+def _render_urlset(rows):
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n']
+    for _, slug, updated_at in rows:
+        parts.append(
+            f"<url><loc>{escape(post_url(slug))}</loc><lastmod>{updated_at.date().isoformat()}</lastmod>"
+            f"<changefreq>{PostSitemap.changefreq}</changefreq><priority>{PostSitemap.priority}</priority></url>\n"
+        )
+    parts.append("</urlset>\n")
+    return "".join(parts).encode("utf-8")
+
+def _render_index(manifest):
+    base_url = _base_url()
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{XMLNS}">\n']
+    for n, shard in enumerate(manifest, start=1):
+        lastmod = f"<lastmod>{shard['lastmod'][:10]}</lastmod>" if shard["lastmod"] else ""
+        parts.append(f"<sitemap><loc>{escape(base_url)}/{shard_filename(n)}</loc>{lastmod}</sitemap>\n")
+    parts.append("</sitemapindex>\n")
+    return "".join(parts).encode("utf-8")
+
+def _store(n, body):
+    cache.set(INDEX_KEY if n is None else shard_key(n), body, None)
+    directory = _sitemap_dir()
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, shard_filename(n))
+        with open(path + ".tmp", "wb") as fh:
+            fh.write(body)
+        os.replace(path + ".tmp", path)
+
+def _write_shard(n, rows, lo):
+    _store(n, _render_urlset(rows))
+    lastmod = max((r[2] for r in rows), default=None)
+    return {"lo": lo, "count": len(rows), "lastmod": lastmod.isoformat() if lastmod else None}
+
+def _write_manifest(manifest):
+    cache.set(MANIFEST_KEY, manifest, None)
+    _store(None, _render_index(manifest))
+
+
+def build_sitemaps():
+    """
+    Full rebuild: re-partition every published post into shards of
+    BLOG_SITEMAP_SHARD_SIZE and render all shards plus the index.
+    """
+    manifest, buf = [], []
+
+    def flush():
+        # the first shard is open-ended downwards
+        lo = buf[0][0].isoformat() if manifest else None
+        manifest.append(_write_shard(len(manifest) + 1, buf, lo))
+
+    for row in _rows():
+        buf.append(row)
+        if len(buf) == _shard_size():
+            flush()
+            buf = []
+    if buf or not manifest:
+        flush()
+    for stale in range(len(manifest) + 1, len(cache.get(MANIFEST_KEY) or []) + 1):
+        cache.delete(shard_key(stale))
+    _write_manifest(manifest)
+    return manifest
+
+def refresh_sitemap_for(created_at):
+    """
+    Re-render only the shard whose range contains `created_at`. Falls back
+    to a full rebuild when there is no manifest yet or the shard outgrew
+    its size budget.
+    """
+    return refresh_sitemaps_for([created_at])
+
+def refresh_sitemaps_for(created_ats):
+    # bulk variant: each affected shard is rendered once
+    manifest = cache.get(MANIFEST_KEY)
+    if not manifest:
+        return build_sitemaps()
+    bounds = [parse_datetime(s["lo"]) if s["lo"] else None for s in manifest]
+    touched = set()
+    for created_at in created_ats:
+        if isinstance(created_at, str):
+            created_at = parse_datetime(created_at)
+        touched.add(max((i for i, lo in enumerate(bounds) if lo is None or lo <= created_at), default=0))
+    for idx in sorted(touched):
+        hi = manifest[idx + 1]["lo"] if idx + 1 < len(manifest) else None
+        rows = list(_rows(manifest[idx]["lo"], hi))
+        if len(rows) > _shard_size():
+            return build_sitemaps()
+        manifest[idx] = _write_shard(idx + 1, rows, manifest[idx]["lo"])
+    _write_manifest(manifest)
+    return manifest
 
-    def lastmod(self, obj):
-        return obj.updated_at
+def get_sitemap(n=None):
+    """
+    Pre-rendered index (n=None) or shard bytes; builds everything once if cold.
+    """
+    key = INDEX_KEY if n is None else shard_key(n)
+    body = cache.get(key)
+    if body is None and cache.get(MANIFEST_KEY) is None:
+        build_sitemaps()
+        body = cache.get(key)
+    return body
@@ -0,0 +1,171 @@
+import json
+import os
+from collections import deque
+
+from django.conf import settings
+from django.utils.html import escape
+from rest_framework.renderers import JSONRenderer
+
+from .models import Post, Category, Tag
+from .pool import process_pool
+from .feeds import ALL, category_scope, tag_scope, post_scopes
+from .serializers import PostDetailSerializer, PostListSerializer
+
+INDEX_SIZE = 50
+
+
+def export_dir():
+    # unset disables static export entirely
+    return getattr(settings, "BLOG_STATIC_EXPORT_DIR", None)
+
+def _published():
+    return (Post.objects.filter(status='published')
+            .select_related('author', 'category', 'derived').prefetch_related('tags'))
+
+def _plain(data):
+    # ReturnDict/OrderedDict/UUID -> plain json types, cheap to pickle to workers
+    return json.loads(JSONRenderer().render(data))
+
+def _scope_path(scope):
+    if scope == ALL:
+        return "index"
+    kind, _, slug = scope.partition(":")
+    return os.path.join(kind, slug)
+
+
+# --- Pure writers: no ORM, run in a process pool (Django is set up there) ---
+
+def _write(path, body: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as fh:
+        fh.write(body)
+    os.replace(path + ".tmp", path)
+
+def _page(title, description, body):
+    return (
+        '<!doctype html>\n<html lang="en"><head><meta charset="utf-8">'
+        f"<title>{escape(title)}</title>"
+        f'<meta name="description" content="{escape(description)}">'
+        f"</head><body>{body}</body></html>\n"
+    ).encode("utf-8")
+
+def write_post(out, data):
+    base = os.path.join(out, "posts", data["slug"])
+    _write(base + ".json", json.dumps(data).encode("utf-8"))
+    # content is already sanitized on save
+    body = f"<article><h1>{escape(data['title'])}</h1>{data['content']}</article>"
+    _write(base + ".html", _page(data["meta_title"] or data["title"], data["meta_description"] or "", body))
+
+def write_posts(out, items):
+    for data in items:
+        write_post(out, data)
+    return len(items)
+
+def write_index(out, scope, title, items):
+    base = os.path.join(out, _scope_path(scope))
+    _write(base + ".json", json.dumps({"title": title, "results": items}).encode("utf-8"))
+    links = "".join(
+        f'<li><a href="/posts/{escape(p["slug"])}.html">{escape(p["title"])}</a></li>' for p in items
+    )
+    _write(base + ".html", _page(title, title, f"<h1>{escape(title)}</h1><ul>{links}</ul>"))
+
+def remove_post(out, slug):
+    for ext in (".json", ".html"):
+        path = os.path.join(out, "posts", slug + ext)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# --- Database side ---
+
+def _scope_posts(scope):
+    qs = _published().order_by('-published_at')
+    if scope == ALL:
+        return "Blog", qs
+    kind, _, slug = scope.partition(":")
+    obj = {"category": Category, "tag": Tag}[kind].objects.filter(slug=slug).first()
+    if obj is None:
+        return None
+    return obj.name, (qs.filter(category=obj) if kind == "category" else qs.filter(tags=obj))
+
+def export_index(out, scope):
+    found = _scope_posts(scope)
+    base = os.path.join(out, _scope_path(scope))
+    if found is None:
+        for ext in (".json", ".html"):
+            if os.path.exists(base + ext):
+                os.remove(base + ext)
+        return
+    title, qs = found
+    write_index(out, scope, title, _plain(PostListSerializer(qs[:INDEX_SIZE], many=True).data))
+
+def export_changes(post_ids=(), removed_slugs=(), scopes=(), member_scopes=()):
+    """
+    Incremental export: re-render the given posts (plus every post in
+    member_scopes, e.g. after a category rename), drop files for removed
+    slugs, then re-render the index page of every touched scope.
+    """
+    out = export_dir()
+    if not out:
+        return 0
+    scopes = set(scopes) | set(member_scopes)
+    querysets = [_published().filter(pk__in=list(post_ids))] if post_ids else []
+    for scope in member_scopes:
+        found = _scope_posts(scope)
+        if found:
+            querysets.append(found[1])
+    for slug in removed_slugs:
+        remove_post(out, slug)
+    written = 0
+    for qs in querysets:
+        for post in qs.iterator(chunk_size=200):
+            write_post(out, _plain(PostDetailSerializer(post).data))
+            scopes |= post_scopes(post)
+            written += 1
+    for scope in scopes:
+        export_index(out, scope)
+    return written
+
+def export_all(workers=1, chunk_size=200, out=None):
+    """
+    Full rebuild. The parent streams and serializes posts in chunks; rendering
+    and file writes run in a process pool. Files of posts that are no longer
+    published are pruned afterwards.
+    """
+    out = out or export_dir()
+    exported, written = set(), 0
+    chunks = _chunks(chunk_size, exported)
+    if workers > 1:
+        with process_pool(workers) as pool:
+            pending = deque()
+            for items in chunks:
+                pending.append(pool.submit(write_posts, out, items))
+                if len(pending) >= workers * 2:
+                    written += pending.popleft().result()
+            written += sum(f.result() for f in pending)
+    else:
+        written = sum(write_posts(out, items) for items in chunks)
+
+    posts_dir = os.path.join(out, "posts")
+    for name in os.listdir(posts_dir) if os.path.isdir(posts_dir) else []:
+        slug, ext = os.path.splitext(name)
+        if ext in (".json", ".html") and slug not in exported:
+            os.remove(os.path.join(posts_dir, name))
+
+    scopes = [ALL]
+    scopes += [category_scope(s) for s in Category.objects.values_list("slug", flat=True)]
+    scopes += [tag_scope(s) for s in Tag.objects.values_list("slug", flat=True)]
+    for scope in scopes:
+        export_index(out, scope)
+    return written, len(scopes)
+
+def _chunks(chunk_size, exported):
+    qs = _published().order_by('pk')
+    last = None
+    while True:
+        page = list((qs.filter(pk__gt=last) if last else qs)[:chunk_size])
+        if not page:
+            return
+        last = page[-1].pk
+        exported.update(p.slug for p in page)
+        yield _plain(PostDetailSerializer(page, many=True).data)
@@ -0,0 +1,51 @@
+from django.conf import settings
+
+# Surrogate keys name what a cached response depends on, so the CDN can purge
+# exactly the responses affected by a change.
+POST_LIST = "post-list"
+CATEGORY_LIST = "category-list"
+TAG_LIST = "tag-list"
+
+
+def post_key(pk):
+    return f"post-{pk}"
+
+def category_key(slug):
+    return f"category-{slug}"
+
+def tag_key(slug):
+    return f"tag-{slug}"
+
+def comments_key(slug):
+    return f"comments-{slug}"
+
+def post_payload_keys(item: dict):
+    """
+    Keys for one serialized post (PostListSerializer/PostDetailSerializer data).
+    """
+    keys = {post_key(item["id"])}
+    if item.get("category"):
+        keys.add(category_key(item["category"]["slug"]))
+    keys.update(tag_key(t["slug"]) for t in item.get("tags") or [])
+    return keys
+
+
+class SurrogateKeyMixin:
+    """
+    Adds Cache-Control and Surrogate-Key headers to successful GET responses.
+    Views override `surrogate_keys(data)`; an empty set leaves the response untagged.
+    """
+    browser_max_age = 60
+
+    def surrogate_keys(self, data):
+        return set()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ("GET", "HEAD") and response.status_code == 200:
+            keys = self.surrogate_keys(response.data)
+            if keys:
+                edge = getattr(settings, "BLOG_EDGE_MAX_AGE", 6 * 3600)
+                response["Cache-Control"] = f"public, max-age={self.browser_max_age}, s-maxage={edge}"
+                response["Surrogate-Key"] = " ".join(sorted(keys))
+        return response
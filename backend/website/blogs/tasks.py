@@ -1,8 +1,13 @@
+import logging
+
 from celery import shared_task
 from django.core.cache import cache
 from django.db.models import F
-from .models import Post
+from .models import Post, PostDerivedContent
 from .cache_keys import detail_cache_key
+from .derived import derive_content
+
+logger = logging.getLogger(__name__)
 
 @shared_task(ignore_result=True)
 def increment_views(slug: str):
@@ -12,3 +17,85 @@ def increment_views(slug: str):
     except Exception:
         # swallow errors; analytics should not break requests
         pass
+
+@shared_task(ignore_result=True)
+def build_post_derived(post_id):
+    post = Post.objects.filter(pk=post_id).values("slug", "content", "content_hash").first()
+    if not post:
+        return
+    current = PostDerivedContent.objects.filter(post_id=post_id).values_list("content_hash", flat=True).first()
+    if current and current == post["content_hash"]:
+        return
+    PostDerivedContent.objects.update_or_create(
+        post_id=post_id,
+        defaults=dict(content_hash=post["content_hash"], **derive_content(post["content"])),
+    )
+    cache.delete(detail_cache_key(post["slug"]))
+
+@shared_task(ignore_result=True)
+def refresh_stale_derived_content(limit=1000):
+    # catches rows written without signals (bulk_update, raw imports)
+    stale = list(Post.objects.exclude(derived__content_hash=F("content_hash"))
+                 .values_list("pk", flat=True)[:limit])
+    for pk in stale:
+        build_post_derived(pk)
+    return len(stale)
+
+@shared_task(ignore_result=True)
+def refresh_sitemap_shard(created_at: str):
+    from .sitemaps import refresh_sitemap_for
+    refresh_sitemap_for(created_at)
+
+@shared_task(ignore_result=True)
+def refresh_sitemap_shards(created_ats):
+    from .sitemaps import refresh_sitemaps_for
+    refresh_sitemaps_for(created_ats)
+
+@shared_task(ignore_result=True)
+def refresh_feeds(post_id=None, scopes=()):
+    from .feeds import build_feed, post_scopes
+    scopes = set(scopes)
+    post = Post.objects.filter(pk=post_id).select_related("category").first() if post_id else None
+    if post is not None:
+        scopes |= post_scopes(post)
+    for scope in scopes:
+        build_feed(scope)
+
+@shared_task(ignore_result=True)
+def refresh_all_feeds(extra_scopes=()):
+    # periodic safety net, and renames: names show up in feeds beyond their own scope
+    from .feeds import build_all_feeds
+    return build_all_feeds(extra_scopes)
+
+@shared_task(ignore_result=True)
+def export_static_pages(post_ids=(), removed_slugs=(), scopes=(), member_scopes=()):
+    from .static_export import export_changes
+    export_changes(post_ids, removed_slugs, scopes, member_scopes)
+
+@shared_task(ignore_result=True)
+def publish_due_posts():
+    # runs from beat every minute and, per post, at its published_at (eta)
+    from .scheduling import publish_due, PUBLISH_BATCH
+    if publish_due() >= PUBLISH_BATCH:
+        publish_due_posts.delay()
+
+@shared_task(ignore_result=True)
+def warm_posts(post_ids):
+    from .warmup import warm_posts as warm
+    warm(post_ids)
+
+@shared_task
+def warm_blog_cache(top=100, recent=100, concurrency=4):
+    # queue after a deploy or a cache flush
+    from .warmup import warm_cache
+    stats = warm_cache(top=top, recent=recent, concurrency=concurrency)
+    logger.info("Warmed %(keys)s blog cache keys (%(bytes)s bytes) in %(seconds)ss", stats)
+    return stats
+
+@shared_task(bind=True, ignore_result=True, max_retries=5, default_retry_delay=10)
+def purge_surrogate_keys(self, keys):
+    from .purge import purge_now
+    try:
+        purge_now(keys)
+    except Exception as exc:
+        raise self.retry(exc=exc)
@@ -1,7 +1,26 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache
+from django.db import transaction
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from blogs.models import Post, Category
+from rest_framework.test import APIClient
+from blogs.models import Post, Category, Comment, Tag
+from blogs.moderation import moderate_comments
+from blogs.tasks import build_post_derived, refresh_feeds
+from blogs.sitemaps import build_sitemaps, refresh_sitemap_for, shard_key
+from blogs.static_export import export_changes
+from blogs.purge import queue_purge
+from blogs.scheduling import publish_due
+from blogs.cache_keys import detail_cache_key
 
 User = get_user_model()
 
@@ -30,3 +49,615 @@ class BlogPublicApiTests(TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertIn("content", res.data)
         self.assertNotIn("<script", res.data["content"])
+
+
+class CommentThreadApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="reader", email="reader@example.com")
+        self.post = Post.objects.create(
+            title="Threads", slug="threads", summary="s", content="<p>c</p>",
+            status="published", published_at=timezone.now(), author=self.user,
+        )
+        self.url = "/api/blogs/threads/comments/"
+
+    def test_replies_nested_and_cursor_pages(self):
+        roots = [Comment.objects.create(post=self.post, content=f"root {i}", is_approved=True) for i in range(3)]
+        Comment.objects.create(post=self.post, parent=roots[0], author=self.user, content="reply", is_approved=True)
+        Comment.objects.create(post=self.post, parent=roots[0], content="pending", is_approved=False)
+        Comment.objects.create(post=self.post, parent=roots[2], content="other page", is_approved=True)
+        from blogs.threads import comment_thread_page
+        # roots, then one query per level, each scoped to the level above
+        with self.assertNumQueries(3) as ctx:
+            comment_thread_page(self.post.pk, page_size=2)
+        self.assertTrue(all('"parent_id" IN' in q["sql"] for q in ctx.captured_queries[1:]))
+
+        res = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([c["content"] for c in res.data["results"]], ["root 0", "root 1"])
+        replies = res.data["results"][0]["replies"]
+        self.assertEqual([(r["content"], r["author_display"]) for r in replies], [("reply", "reader")])
+
+        res = self.client.get(res.data["next"])
+        self.assertEqual([c["content"] for c in res.data["results"]], ["root 2"])
+        self.assertIsNone(res.data["next"])
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        res = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("cursor", res.data)
+
+    def test_approval_invalidates_cached_page(self):
+        pending = Comment.objects.create(post=self.post, content="later", is_approved=False)
+        self.assertEqual(self.client.get(self.url).data["results"], [])
+        pending.is_approved = True
+        pending.save()
+        self.assertEqual(len(self.client.get(self.url).data["results"]), 1)
+
+
+class CommentModerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create(username="mod", email="mod@example.com", is_staff=True)
+        self.posts = [
+            Post.objects.create(title=f"P{i}", slug=f"p{i}", summary="s", content="<p>c</p>",
+                                status="published", published_at=timezone.now(), author=self.staff)
+            for i in range(2)
+        ]
+        self.pending = [Comment.objects.create(post=self.posts[i % 2], content=f"c{i}") for i in range(5)]
+
+    def test_bulk_approve_updates_counts_and_pages(self):
+        self.assertEqual(self.client.get("/api/blogs/p0/comments/").data["results"], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            changed = moderate_comments(Comment.objects.values_list("pk", flat=True), approve=True, chunk_size=2)
+        self.assertEqual(changed, 5)
+        self.assertEqual(
+            sorted(Post.objects.values_list("slug", "comments_count")), [("p0", 3), ("p1", 2)]
+        )
+        self.assertEqual(len(self.client.get("/api/blogs/p0/comments/").data["results"]), 3)
+
+    def test_batched_refresh_bumps_caches_after_commit(self):
+        from blogs.moderation import batched_comment_refresh
+        from blogs.cache_keys import comments_version
+        moderate_comments([c.pk for c in self.pending], approve=True)
+        before = comments_version("p0")
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic(), batched_comment_refresh():
+                Comment.objects.filter(post=self.posts[0]).first().delete()
+            self.assertEqual(comments_version("p0"), before)
+            self.assertEqual(Post.objects.get(slug="p0").comments_count, 2)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(comments_version("p0"), before)
+
+    def test_staff_endpoint_rejects(self):
+        moderate_comments([c.pk for c in self.pending], approve=True)
+        api = APIClient()
+        api.force_authenticate(self.staff)
+        res = api.post("/api/admin/comments/moderate/",
+                       {"ids": [str(self.pending[0].pk)], "action": "reject"}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["changed"], 1)
+        self.assertEqual(Post.objects.get(slug="p0").comments_count, 2)
+
+
+class PostSanitizeSignalTests(TestCase):
+    def test_unchanged_content_is_not_resanitized(self):
+        user = User.objects.create(username="writer", email="writer@example.com")
+        post = Post.objects.create(title="Long", slug="long", summary="s", author=user,
+                                   content="<p>" + "word " * 450 + "<script>x</script></p>")
+        self.assertNotIn("<script", post.content)
+        self.assertEqual(post.reading_time_minutes, 3)
+        self.assertEqual(len(post.content_hash), 64)
+
+        with mock.patch("blogs.signals.sanitize_post") as sanitize:
+            post.status = "published"
+            post.save()
+            post.refresh_from_db()
+            post.save()
+        sanitize.assert_not_called()
+
+
+class ResanitizePostsCommandTests(TestCase):
+    def test_rebuilds_in_pool_and_clears_checkpoint(self):
+        user = User.objects.create(username="archivist", email="archivist@example.com")
+        for i in range(5):
+            Post.objects.create(title=f"A{i}", slug=f"a{i}", summary="s", author=user, content="<p>ok</p>")
+        # simulate rows written before a tighter allow-list / new reading-time rule
+        Post.objects.filter(slug__in=["a1", "a3"]).update(
+            content="<p>" + "w " * 401 + '<iframe src="x"></iframe></p>', reading_time_minutes=0)
+
+        checkpoint = os.path.join(tempfile.mkdtemp(), "ckpt.json")
+        out = StringIO()
+        call_command("resanitize_posts", "--workers=2", "--chunk-size=2", f"--checkpoint={checkpoint}", stdout=out)
+
+        self.assertIn("5 posts scanned, 2 updated", out.getvalue())
+        self.assertFalse(os.path.exists(checkpoint))
+        for post in Post.objects.filter(slug__in=["a1", "a3"]):
+            self.assertNotIn("<iframe", post.content)
+            self.assertEqual(post.reading_time_minutes, 3)
+
+    def test_spawned_workers_can_import_model_modules(self):
+        # what Windows, macOS and forkserver do: a fresh interpreter unpickles
+        # a function from a module that imports blogs.models
+        from blogs.pool import process_pool
+        from blogs.static_export import _scope_path
+        with process_pool(1) as pool:
+            self.assertEqual(pool.submit(_scope_path, "tag:x").result(), os.path.join("tag", "x"))
+
+
+class PostDerivedContentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="toc", email="toc@example.com")
+
+    def test_derived_artifacts_built_after_commit_and_exposed(self):
+        html = ('<h2 id="intro">Intro</h2><p>' + "alpha " * 60 + "</p>"
+                "<h3>Deep &amp; Dive</h3><p>beta</p><h3>Deep &amp; Dive</h3>")
+        with mock.patch("blogs.signals.build_post_derived") as task, \
+                self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title="Derived", slug="derived", summary="Thin", author=self.user,
+                                       content=html, status="published", published_at=timezone.now())
+        task.delay.assert_called_once_with(str(post.pk))
+
+        build_post_derived(post.pk)
+        data = self.client.get("/api/blogs/derived/").data
+        self.assertEqual(data["word_count"], 68)
+        self.assertTrue(data["excerpt"].startswith("Intro alpha") and data["excerpt"].endswith("…"))
+        self.assertEqual([t["anchor"] for t in data["toc"]], ["intro", "deep-dive", "deep-dive-2"])
+        self.assertEqual(data["toc"][1], {"level": 3, "text": "Deep & Dive", "anchor": "deep-dive"})
+
+        res = self.client.get("/api/blogs/", {"q": "beta"})
+        self.assertEqual(res.data["count"], 1)
+
+    def test_search_before_backfill_and_build_command(self):
+        from blogs.models import PostDerivedContent
+        with mock.patch("blogs.signals.build_post_derived"):
+            Post.objects.create(title="Legacy", slug="legacy", summary="Old", author=self.user,
+                                content="<p>gamma</p>", status="published", published_at=timezone.now())
+        cache.clear()
+        self.assertEqual(self.client.get("/api/blogs/", {"q": "gamma"}).data["count"], 1)
+
+        out = StringIO()
+        call_command("build_derived_content", "--chunk-size=1", stdout=out)
+        self.assertIn("1 posts rebuilt", out.getvalue())
+        self.assertEqual(PostDerivedContent.objects.get(post__slug="legacy").plain_text.strip(), "gamma")
+        cache.clear()
+        self.assertEqual(self.client.get("/api/blogs/", {"q": "gamma"}).data["count"], 1)
+
+
+@override_settings(BLOG_SITEMAP_SHARD_SIZE=2, BLOG_SITEMAP_BASE_URL="https://api.example.com/")
+class ShardedSitemapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username="seo", email="seo@example.com")
+        self.posts = [
+            Post.objects.create(title=f"S{i}", slug=f"s{i}", summary="s", content="<p>c</p>", author=user,
+                                status="published", published_at=timezone.now())
+            for i in range(5)
+        ]
+
+    def test_index_lists_shards_and_refresh_touches_one_shard(self):
+        build_sitemaps()
+        index = self.client.get("/sitemap.xml")
+        self.assertEqual(index.status_code, 200)
+        self.assertEqual(index.content.count(b"<sitemap>"), 3)
+        self.assertIn(b"<loc>https://api.example.com/sitemap-1.xml</loc>", index.content)
+        self.assertIn(b"/blogs/s2</loc>", self.client.get("/sitemap-2.xml").content)
+        self.assertEqual(self.client.get("/sitemap-9.xml").status_code, 404)
+
+        cache.set(shard_key(1), b"untouched", None)
+        moved = self.posts[3]
+        Post.objects.filter(pk=moved.pk).update(slug="s3-renamed")
+        refresh_sitemap_for(moved.created_at)
+        self.assertIn(b"/blogs/s3-renamed</loc>", self.client.get("/sitemap-2.xml").content)
+        self.assertEqual(self.client.get("/sitemap-1.xml").content, b"untouched")
+
+
+class PrecomputedFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username="feeder", email="feeder@example.com")
+        self.tag = Tag.objects.create(name="Design", slug="design")
+        self.post = Post.objects.create(title="Feed me", slug="feed-me", summary="Fresh", content="<p>c</p>",
+                                        author=user, status="published", published_at=timezone.now())
+        self.post.tags.add(self.tag)
+
+    def test_feeds_served_from_cache_with_etag(self):
+        self.assertEqual(self.client.get("/feeds/tag/missing.rss").status_code, 404)
+        refresh_feeds(self.post.pk)
+
+        with self.assertNumQueries(0):
+            rss = self.client.get("/feeds/tag/design.rss")
+            atom = self.client.get("/feeds/posts.atom")
+        self.assertEqual(rss.status_code, 200)
+        self.assertIn(b"<title>Feed me</title>", rss.content)
+        self.assertIn(b"http://www.w3.org/2005/Atom", atom.content)
+
+        again = self.client.get("/feeds/tag/design.rss", HTTP_IF_NONE_MATCH=rss["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_cold_cache_rebuilds_and_renames_refresh(self):
+        # after a flush the first request renders the feed itself
+        self.assertIn(b"<title>Feed me</title>", self.client.get("/feeds/tag/design.rss").content)
+        self.assertEqual(self.client.get("/feeds/tag/design.json").status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name, self.tag.slug = "Craft", "craft"
+            self.tag.save()
+        from blogs.feeds import feed_key
+        self.assertIsNone(cache.get(feed_key("tag:design", "rss")))
+        self.assertIn(b"<category>Craft</category>", cache.get(feed_key("all", "rss"))["body"])
+
+
+class StaticExportTests(TestCase):
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        user = User.objects.create(username="static", email="static@example.com")
+        self.cat = Category.objects.create(name="News", slug="news")
+        self.posts = [
+            Post.objects.create(title=f"N{i}", slug=f"n{i}", summary="s", content="<p>body</p>", author=user,
+                                category=self.cat, status="published", published_at=timezone.now())
+            for i in range(3)
+        ]
+
+    def path(self, *parts):
+        return os.path.join(self.out, *parts)
+
+    def test_full_rebuild_then_incremental_unpublish(self):
+        os.makedirs(self.path("posts"))
+        open(self.path("posts", "gone.html"), "w").close()
+        call_command("export_static_blog", f"--out={self.out}", "--workers=2", "--chunk-size=2", stdout=StringIO())
+
+        self.assertFalse(os.path.exists(self.path("posts", "gone.html")))
+        with open(self.path("posts", "n1.html")) as fh:
+            self.assertIn("<p>body</p>", fh.read())
+        with open(self.path("category", "news.json")) as fh:
+            self.assertEqual(len(json.load(fh)["results"]), 3)
+
+        Post.objects.filter(slug="n1").update(status="draft")
+        with override_settings(BLOG_STATIC_EXPORT_DIR=self.out):
+            export_changes(removed_slugs=["n1"], scopes=["all", "category:news"])
+        self.assertFalse(os.path.exists(self.path("posts", "n1.json")))
+        with open(self.path("index.json")) as fh:
+            self.assertEqual([p["slug"] for p in json.load(fh)["results"]], ["n2", "n0"])
+
+
+class SurrogateKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        user = User.objects.create(username="edge", email="edge@example.com")
+        self.cat = Category.objects.create(name="Edge", slug="edge")
+        self.post = Post.objects.create(title="Cached", slug="cached", summary="s", content="<p>x</p>", author=user,
+                                        category=self.cat, status="published", published_at=timezone.now())
+
+    def test_headers_on_public_responses(self):
+        res = self.client.get("/api/blogs/")
+        self.assertIn("s-maxage=", res["Cache-Control"])
+        keys = res["Surrogate-Key"].split()
+        self.assertIn("post-list", keys)
+        self.assertIn(f"post-{self.post.pk}", keys)
+        self.assertIn("category-edge", keys)
+        # served from the view cache the second time, same envelope
+        again = self.client.get("/api/blogs/")
+        self.assertEqual(again.data, res.data)
+        self.assertEqual(again["Surrogate-Key"], res["Surrogate-Key"])
+
+        detail = self.client.get("/api/blogs/cached/")
+        self.assertEqual(detail["Surrogate-Key"], f"category-edge post-{self.post.pk}")
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        user = User.objects.create(username="sync", email="sync@example.com")
+        self.cat = Category.objects.create(name="Sync", slug="sync")
+        self.post = Post.objects.create(title="Synced", slug="synced", summary="s", content="<p>x</p>", author=user,
+                                        category=self.cat, status="published", published_at=timezone.now())
+
+    def changes(self, since=0):
+        res = self.client.get("/api/changes/", {"since": since})
+        self.assertEqual(res.status_code, 200)
+        return res.data
+
+    def test_since_cursor_returns_upserts_and_tombstones(self):
+        first = self.changes()
+        self.assertEqual([p["slug"] for p in first["posts"]["updated"]], ["synced"])
+        self.assertEqual([c["slug"] for c in first["categories"]["updated"]], ["sync"])
+        self.assertEqual(self.changes(first["cursor"])["posts"], {"updated": [], "deleted": []})
+
+        self.cat.name = "Synchronised"
+        self.cat.save()
+        delta = self.changes(first["cursor"])
+        self.assertEqual(delta["categories"]["updated"][0]["name"], "Synchronised")
+        self.assertEqual(delta["posts"]["updated"][0]["category"]["name"], "Synchronised")
+
+        self.post.status = "draft"
+        self.post.save()
+        tag = Tag.objects.create(name="Gone", slug="gone")
+        tag.delete()
+        delta = self.changes(delta["cursor"])
+        self.assertEqual(delta["posts"], {"updated": [], "deleted": [{"id": self.post.pk, "slug": "synced"}]})
+        self.assertEqual(delta["tags"]["deleted"][0]["slug"], "gone")
+
+    def test_late_commit_is_not_skipped(self):
+        import uuid
+        from blogs.models import ChangeLog
+        first = self.changes()
+        # an entry whose id was taken before the cursor's, committed only now
+        low = ChangeLog.objects.order_by("pk").first()
+        low.delete()
+        ChangeLog.objects.create(id=low.pk, kind="tag", op="delete", object_id=uuid.uuid4(), slug="late")
+        self.assertEqual([t["slug"] for t in self.changes(first["cursor"])["tags"]["deleted"]], ["late"])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/changes/", {"since": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/changes/", {"since": "-1"}).status_code, 400)
+
+    def test_post_slugged_changes_is_reachable(self):
+        Post.objects.create(title="Changes", slug="changes", summary="s", content="<p>x</p>",
+                            author=self.post.author, status="published", published_at=timezone.now())
+        with mock.patch("blogs.views.increment_views.delay"):
+            self.assertEqual(self.client.get("/api/blogs/changes/").data["slug"], "changes")
+
+
+@override_settings(BLOG_HOME_FILL_WORKERS=1)
+class HomePayloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create(username="home", email="home@example.com")
+        self.cat = Category.objects.create(name="Front", slug="front")
+        Category.objects.create(name="Empty", slug="empty")
+        self.tag = Tag.objects.create(name="Hot", slug="hot")
+        post = Post.objects.create(title="Front page", slug="front-page", summary="s", content="<p>x</p>",
+                                   author=self.user, category=self.cat, status="published",
+                                   published_at=timezone.now(), views_count=5)
+        post.tags.add(self.tag)
+
+    def test_assembled_from_fragments_and_regenerated_on_change(self):
+        res = self.client.get("/api/home/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([p["slug"] for p in res.data["latest"]], ["front-page"])
+        self.assertEqual([c["slug"] for c in res.data["categories"]], ["front"])
+        self.assertEqual(res.data["tags"], [{"name": "Hot", "slug": "hot", "posts": 1}])
+        self.assertEqual([p["slug"] for p in res.data["trending"]], ["front-page"])
+
+        with self.assertNumQueries(0):
+            self.client.get("/api/home/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title="Second", slug="second", summary="s", content="<p>y</p>", author=self.user,
+                                category=self.cat, status="published", published_at=timezone.now())
+        res = self.client.get("/api/home/")
+        self.assertEqual([p["slug"] for p in res.data["categories"][0]["posts"]], ["second", "front-page"])
+
+    def test_home_route_leaves_the_slug_free(self):
+        Post.objects.create(title="Home", slug="home", summary="s", content="<p>h</p>", author=self.user,
+                            status="published", published_at=timezone.now())
+        self.assertEqual(self.client.get("/api/blogs/home/").data["slug"], "home")
+        self.assertIn("latest", self.client.get("/api/home/").data)
+
+
+@override_settings(BLOG_HOME_FILL_WORKERS=1)
+class ScheduledPublishTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create(username="sched", email="sched@example.com")
+
+    def test_future_post_waits_until_due(self):
+        when = timezone.now() + timezone.timedelta(hours=1)
+        post = Post.objects.create(title="Later", slug="later", summary="s", content="<p>x</p>", author=self.user,
+                                   status="published", published_at=when)
+        self.assertEqual(post.status, "scheduled")
+        self.assertEqual(self.client.get("/api/blogs/later/").status_code, 404)
+
+        self.assertEqual(publish_due(), 0)
+        Post.objects.filter(pk=post.pk).update(published_at=timezone.now())  # time passes
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(publish_due(), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.status, "published")
+        self.assertEqual(self.client.get("/api/blogs/later/").status_code, 200)
+        self.assertEqual(self.client.get("/api/home/").data["latest"][0]["slug"], "later")
+
+    def test_exact_timer_only_for_posts_due_soon(self):
+        with mock.patch("blogs.tasks.publish_due_posts.apply_async") as apply_async:
+            for slug, delay in (("soon", timezone.timedelta(minutes=10)), ("far", timezone.timedelta(days=7))):
+                with self.captureOnCommitCallbacks(execute=True):
+                    Post.objects.create(title=slug, slug=slug, summary="s", content="<p>x</p>", author=self.user,
+                                        status="published", published_at=timezone.now() + delay)
+        self.assertEqual(apply_async.call_count, 1)
+        self.assertEqual(apply_async.call_args.kwargs["eta"], Post.objects.get(slug="soon").published_at)
+
+    def test_published_without_date_gets_one(self):
+        post = Post.objects.create(title="Now", slug="now", summary="s", content="<p>x</p>", author=self.user)
+        post.status = "published"
+        post.save(update_fields=["status"])
+        post.refresh_from_db()
+        self.assertIsNotNone(post.published_at)
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.staff = User.objects.create(username="bulk", email="bulk@example.com", is_staff=True)
+        self.news = Category.objects.create(name="News", slug="news")
+        self.other = Category.objects.create(name="Other", slug="other")
+        self.posts = [
+            Post.objects.create(title=f"B{i}", slug=f"b{i}", summary="s", content="<p>c</p>", author=self.staff,
+                                category=self.news, status="published", published_at=timezone.now())
+            for i in range(3)
+        ]
+        Post.objects.create(title="Elsewhere", slug="elsewhere", summary="s", content="<p>c</p>", author=self.staff,
+                            category=self.other, status="published", published_at=timezone.now())
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def bulk(self, status, posts):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.api.post("/api/admin/blogs/bulk/", {"ids": [str(p.pk) for p in posts], "status": status},
+                                format="json")
+        self.assertEqual(res.status_code, 200)
+        return res.data
+
+    def test_unpublish_invalidates_then_publish_prewarms(self):
+        # reads go through self.api: the global anon throttle allows only a handful of requests
+        self.assertEqual(self.api.get("/api/blogs/b0/").status_code, 200)
+        self.assertEqual(self.api.get("/api/blogs/", {"category": "news"}).data["count"], 3)
+        self.api.get("/api/blogs/", {"category": "other"})
+
+        self.assertEqual(self.bulk("archived", self.posts[:2])["changed"], 2)
+        self.assertEqual(self.api.get("/api/blogs/b0/").status_code, 404)
+        self.assertEqual(self.api.get("/api/blogs/", {"category": "news"}).data["count"], 1)
+        with self.assertNumQueries(0):
+            # untouched scope stays cached
+            self.api.get("/api/blogs/", {"category": "other"})
+
+        Post.objects.filter(pk=self.posts[0].pk).update(content="<p>raw<script>x()</script></p>", content_hash="")
+        self.assertEqual(self.bulk("published", self.posts[:2]), {"changed": 2, "published": 2, "scheduled": 0})
+        warmed = cache.get(detail_cache_key("b0"))
+        self.assertEqual(warmed["content"], "<p>rawx()</p>")
+        with self.assertNumQueries(0):
+            res = self.api.get("/api/blogs/", {"category": "news"})
+        self.assertEqual(res.data["count"], 3)
+
+
+@override_settings(BLOG_HOME_FILL_WORKERS=1)
+class WarmBlogCacheCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        user = User.objects.create(username="warm", email="warm@example.com")
+        cat = Category.objects.create(name="Warm", slug="warm")
+        for i in range(3):
+            Post.objects.create(title=f"W{i}", slug=f"w{i}", summary="s", content="<p>c</p>", author=user,
+                                category=cat, status="published", published_at=timezone.now(), views_count=i)
+
+    def test_cold_cache_is_filled(self):
+        cache.clear()
+        out = StringIO()
+        call_command("warm_blog_cache", "--top=2", "--recent=1", "--concurrency=1", stdout=out)
+        # w2 and w1 (top and recent overlap), the all/category lists, their
+        # RSS and Atom feeds and the homepage
+        self.assertIn("Warmed 9 keys", out.getvalue())
+        with self.assertNumQueries(0), mock.patch("blogs.views.increment_views.delay"):
+            self.client.get("/api/blogs/w2/")
+            self.client.get("/api/blogs/", {"category": "warm"})
+            self.client.get("/api/home/")
+            self.client.get("/feeds/category/warm.atom")
+
+
+class NdjsonTransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.staff = User.objects.create(username="porter", email="porter@example.com", is_staff=True)
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def test_import_command_then_streamed_export(self):
+        records = [
+            {"title": "First", "content": "<p>one<script>x</script></p>", "status": "published",
+             "published_at": "2024-01-01T00:00:00Z", "category": {"name": "Travel", "slug": "travel"},
+             "tags": [{"name": "Sun", "slug": "sun"}, "Sea"]},
+            {"title": "Second", "slug": "second", "content": "<p>two</p>", "tags": ["Sea"], "author": "nobody"},
+            {"title": "Dup", "slug": "second", "content": "<p>dup</p>"},
+            {"content": "no title"},
+        ]
+        path = os.path.join(tempfile.mkdtemp(), "posts.ndjson")
+        with open(path, "w") as fh:
+            fh.write("\n".join(json.dumps(r) for r in records) + "\nnot json\n")
+        out, err = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_posts", path, "--author=porter", "--batch-size=2", "--workers=2",
+                         stdout=out, stderr=err)
+        self.assertIn("Created 2, skipped 1 existing, 2 failed", out.getvalue())
+        self.assertIn("line 5:", err.getvalue())
+
+        first = Post.objects.get(slug="first")
+        self.assertEqual(first.content, "<p>onex</p>")
+        self.assertEqual(first.category.slug, "travel")
+        self.assertEqual(sorted(first.tags.values_list("slug", flat=True)), ["sea", "sun"])
+        self.assertEqual(Tag.objects.filter(slug="sea").count(), 1)
+        self.assertEqual(Post.objects.get(slug="second").author, self.staff)
+        self.assertEqual(self.api.get("/api/blogs/first/").status_code, 200)
+
+        res = self.api.get("/api/admin/blogs/export/")
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(sorted(json.loads(l)["slug"] for l in lines), ["first", "second"])
+
+    def test_import_endpoint_reads_body(self):
+        body = json.dumps({"title": "Via API", "content": "<p>api</p>", "status": "draft"}) + "\n"
+        res = self.api.post("/api/admin/blogs/import/", body, content_type="application/x-ndjson")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.data["created"], 1)
+        self.assertTrue(Post.objects.filter(slug="via-api", author=self.staff).exists())
+
+    def test_malformed_lines_are_reported_not_raised(self):
+        bad = [
+            {"title": 7}, {"title": "List status", "status": ["published"]},
+            {"title": "Numeric date", "published_at": 1700000000}, {"title": "Tag string", "tags": "sun"},
+            {"title": "Long meta", "meta_title": "x" * 256}, {"title": "Long url", "canonical_url": "u" * 501},
+            {"title": "Bad tag", "tags": [{"name": 3}]}, {"title": "Long tag", "tags": ["t" * 101]},
+        ]
+        body = b"\n".join([json.dumps(r).encode() for r in bad] + [b'{"title": "\xff"}', b'{"title": "Fine"}'])
+        res = self.api.post("/api/admin/blogs/import/", body, content_type="application/x-ndjson")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual((res.data["created"], res.data["failed"]), (1, len(bad) + 1))
+        self.assertEqual([e["line"] for e in res.data["errors"]], list(range(1, len(bad) + 2)))
+
+
+# Purges are batched per outermost transaction, which TestCase never commits.
+class SurrogatePurgeTests(TransactionTestCase):
+    def setUp(self):
+        user = User.objects.create(username="edge", email="edge@example.com")
+        self.cat = Category.objects.create(name="Edge", slug="edge")
+        self.post = Post.objects.create(title="Cached", slug="cached", summary="s", content="<p>x</p>", author=user,
+                                        category=self.cat, status="published", published_at=timezone.now())
+
+    def test_signals_batch_keys_per_transaction(self):
+        with mock.patch("blogs.tasks.purge_surrogate_keys.delay") as delay:
+            with transaction.atomic():
+                self.post.title = "Cached again"
+                self.post.save()
+                queue_purge(["extra"])
+            with transaction.atomic():
+                queue_purge(["dropped"])
+                transaction.set_rollback(True)
+        delay.assert_called_once_with(["extra", f"post-{self.post.pk}", "post-list"])
+
+    def test_removed_post_purges_its_comment_thread(self):
+        with mock.patch("blogs.tasks.purge_surrogate_keys.delay") as delay:
+            self.post.slug = "moved"
+            self.post.save()
+            self.assertIn("comments-cached", delay.call_args.args[0])
+            self.post.delete()
+            self.assertIn("comments-moved", delay.call_args.args[0])
+
+    def test_http_backend_purges(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                received.append((self.headers["Surrogate-Key"], self.headers["Authorization"]))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        options = {"URL": f"http://127.0.0.1:{server.server_port}/purge", "TOKEN": "t"}
+        with override_settings(BLOG_PURGE_BACKEND="blogs.purge.HTTPPurgeBackend", BLOG_PURGE_OPTIONS=options):
+            self.cat.name = "Edge cases"
+            self.cat.save()
+        self.assertEqual(received, [("category-edge category-list post-list", "Bearer t")])
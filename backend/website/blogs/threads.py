@@ -0,0 +1,76 @@
+import base64
+import uuid
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import Comment
+from .serializers import CommentThreadSerializer
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(comment: Comment) -> str:
+    raw = f"{comment.created_at.isoformat()}|{comment.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created, pk = raw.split("|", 1)
+        created_at = parse_datetime(created)
+        if created_at is None:
+            raise ValueError(created)
+        return created_at, uuid.UUID(pk)
+    except (ValueError, UnicodeError):
+        raise ValidationError({"cursor": "Invalid cursor"})
+
+def page_size_from(value) -> int:
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def comment_thread_page(post_id, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of approved top-level comments with their approved replies nested.
+
+    One query for the page of roots, then one per reply level, each limited
+    to the children of the level above, so the cost follows the size of the
+    page's threads rather than of the whole post.
+    """
+    approved = (Comment.objects.filter(post_id=post_id, is_approved=True)
+                .select_related("author"))
+
+    roots_qs = approved.filter(parent__isnull=True)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        roots_qs = roots_qs.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    roots = list(roots_qs.order_by("created_at", "id")[:page_size + 1])
+    has_more = len(roots) > page_size
+    roots = roots[:page_size]
+    if not roots:
+        return {"next_cursor": None, "results": []}
+
+    children = defaultdict(list)
+    level = [c.id for c in roots]
+    while level:
+        replies = list(approved.filter(parent_id__in=level).order_by("created_at", "id"))
+        for c in replies:
+            children[c.parent_id].append(c)
+        level = [c.id for c in replies]
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        node.thread_replies = children.get(node.id, [])
+        stack.extend(node.thread_replies)
+
+    return {
+        "next_cursor": encode_cursor(roots[-1]) if has_more else None,
+        "results": CommentThreadSerializer(roots, many=True).data,
+    }
@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Post
+from .cache_keys import bump_home_version, invalidate_post_caches, HOME_POSTS
+from .changes import record, UPSERT, DELETE
+from .feeds import ALL, post_scopes
+from .purge import queue_purge
+from .sanitize import content_hash, sanitize_post
+from .scheduling import queue_exact_publish
+from .static_export import export_dir
+from .surrogate import post_key, POST_LIST
+from .tasks import (
+    build_post_derived, refresh_feeds, refresh_sitemap_shards, export_static_pages, warm_posts,
+)
+
+CHUNK_SIZE = 500
+TARGETS = ("published", "draft", "archived")
+
+
+def bulk_transition(post_ids, status, chunk_size=CHUNK_SIZE):
+    """
+    Move posts to `status` in chunks, one short transaction each.
+
+    Rows are changed with a few UPDATEs instead of per-post saves, so the
+    work post_save receivers would do is done here once per chunk: change
+    log, CDN purge, detail/list cache invalidation and homepage generation,
+    then one feed, sitemap and static export refresh. Publishing sanitizes
+    content that was never cleaned, sets a missing published_at and leaves
+    future-dated posts 'scheduled'. Newly public posts are pre-warmed.
+
+    Returns {"changed", "published", "scheduled"} counts.
+    """
+    if status not in TARGETS:
+        raise ValueError(f"Unsupported status {status!r}")
+    result = {"changed": 0, "published": 0, "scheduled": 0}
+    chunk = []
+    for pk in post_ids.iterator() if hasattr(post_ids, "iterator") else post_ids:
+        chunk.append(pk)
+        if len(chunk) >= chunk_size:
+            _transition_chunk(chunk, status, result)
+            chunk = []
+    if chunk:
+        _transition_chunk(chunk, status, result)
+    return result
+
+def after_bulk_change(post_ids=(), slugs=(), scopes=(), created_ats=(), public_ids=(), removed_slugs=(), etas=(),
+                      prewarm=True):
+    """
+    After commit, do once for a batch of rows changed without signals what
+    the Post receivers do per save: CDN purge, detail/list invalidation,
+    homepage generation, feeds, sitemap shards, static export, publish
+    timers and prewarming of newly public posts.
+    """
+    slugs, scopes, removed_slugs = list(slugs), sorted(set(scopes)), list(removed_slugs)
+    created_ats = [c.isoformat() for c in created_ats]
+    public_ids = [str(pk) for pk in public_ids]
+    etas = set(etas)
+    if scopes:
+        queue_purge([post_key(pk) for pk in post_ids] + [POST_LIST])
+
+    def run():
+        if scopes:
+            invalidate_post_caches(slugs, scopes)
+            bump_home_version(HOME_POSTS)
+            refresh_feeds.delay(None, scopes)
+            refresh_sitemap_shards.delay(created_ats)
+            if export_dir():
+                export_static_pages.delay(public_ids, removed_slugs, scopes)
+        for eta in etas:
+            queue_exact_publish(eta)
+        if public_ids and prewarm:
+            warm_posts.delay(public_ids)
+    transaction.on_commit(run)
+
+def _transition_chunk(ids, status, result):
+    now = timezone.now()
+    with transaction.atomic():
+        posts = list(Post.objects.select_for_update(of=("self",)).filter(pk__in=ids).exclude(status=status)
+                     .select_related("category").prefetch_related("tags"))
+        if not posts:
+            return
+        was_public = [p for p in posts if p.status == "published"]
+        going_public, scheduled, dirty = [], [], []
+        if status == "published":
+            for p in posts:
+                if p.published_at and p.published_at > now:
+                    scheduled.append(p)
+                else:
+                    going_public.append(p)
+                if p.content and p.content_hash != content_hash(p.content):
+                    p.content, p.reading_time_minutes, p.content_hash = sanitize_post(p.content)
+                    dirty.append(p)
+            if dirty:
+                Post.objects.bulk_update(dirty, ["content", "reading_time_minutes", "content_hash"])
+            Post.objects.filter(pk__in=[p.pk for p in going_public]).update(
+                status="published", published_at=Coalesce(F("published_at"), Value(now)), updated_at=now)
+            Post.objects.filter(pk__in=[p.pk for p in scheduled]).update(status="scheduled", updated_at=now)
+        else:
+            Post.objects.filter(pk__in=[p.pk for p in posts]).update(status=status, updated_at=now)
+
+        # visibility changed for these; scheduled-from-draft posts aren't public yet
+        affected = was_public + going_public
+        record("post", UPSERT, [(p.pk, p.slug) for p in going_public])
+        record("post", DELETE, [(p.pk, p.slug) for p in was_public if status != "published"])
+
+        # derived content first: rebuilding it drops the detail payload that prewarm writes
+        for pk in [str(p.pk) for p in dirty]:
+            transaction.on_commit(lambda pk=pk: build_post_derived.delay(pk))
+        after_bulk_change(
+            post_ids=[p.pk for p in affected],
+            slugs=[p.slug for p in affected],
+            scopes={ALL}.union(*(post_scopes(p) for p in affected)) if affected else (),
+            created_ats=[p.created_at for p in affected],
+            public_ids=[p.pk for p in going_public],
+            removed_slugs=[p.slug for p in was_public if status != "published"],
+            etas=[p.published_at for p in scheduled],
+        )
+
+    result["changed"] += len(posts)
+    result["published"] += len(going_public)
+    result["scheduled"] += len(scheduled)
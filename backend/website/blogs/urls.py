@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     PublicPostViewSet, CategoryViewSet, TagViewSet,
-    CommentViewSet, ReactionViewSet, AdminPostViewSet
+    CommentViewSet, ReactionViewSet, AdminPostViewSet, AdminCommentViewSet, ChangesView, HomeView,
+    sitemap_xml, feed_xml
 )
 
 
@@ -13,10 +14,17 @@ router.register("tags", TagViewSet, basename="blog-tags")
 
 admin_router = DefaultRouter()
 admin_router.register("blogs", AdminPostViewSet, basename="admin-blogs")
+admin_router.register("comments", AdminCommentViewSet, basename="admin-comments")
 
 urlpatterns = [
+    path("api/changes/", ChangesView.as_view(), name="blog-changes"),
+    path("api/home/", HomeView.as_view(), name="blog-home"),
     path("api/", include(router.urls)),
     path("api/blogs/<slug:slug>/comments/", CommentViewSet.as_view({"get":"list","post":"create"}), name="blog-comments"),
     path("api/blogs/<slug:slug>/reactions/", ReactionViewSet.as_view({"post":"create","delete":"destroy"}), name="blog-reactions"),
     path("api/admin/", include(admin_router.urls)),
+    path("sitemap.xml", sitemap_xml, name="sitemap-index"),
+    path("sitemap-<int:section>.xml", sitemap_xml, name="sitemap-section"),
+    path("feeds/posts.<str:fmt>", feed_xml, name="blog-feed"),
+    path("feeds/<str:kind>/<slug:slug>.<str:fmt>", feed_xml, name="blog-feed-scoped"),
 ]
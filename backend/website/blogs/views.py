@@ -1,109 +1,181 @@
-from django.utils import timezone
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from django.db.models import Prefetch
 from rest_framework import viewsets, mixins, status
+from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
 
 from .models import Post, Category, Tag, Comment, Reaction
 from .serializers import (
     PostListSerializer, PostDetailSerializer, CategoryMiniSerializer, TagMiniSerializer,
-    CommentPublicSerializer, CommentCreateSerializer, ReactionSerializer
+    CommentPublicSerializer, CommentCreateSerializer, ReactionSerializer,
+    CommentModerationSerializer, PostBulkTransitionSerializer
 )
 from .permissions import IsStaffOrReadOnly
-from .search import search_posts
-from .cache_keys import list_cache_key, detail_cache_key
+from .cache_keys import detail_cache_key, comments_page_key, comments_version
+from .listing import PUBLIC_FILTER, LIST_TTL, DETAIL_TTL, published_qs, list_params, list_key, list_queryset, page_payload
+from .threads import comment_thread_page, page_size_from
 from .tasks import increment_views
+from .moderation import moderate_comments
+from .transitions import bulk_transition
+from .ndjson import export_lines, import_posts
+from .sitemaps import get_sitemap
+from .changes import changes_since, parse_since
+from .home import home_payload
+from .feeds import FORMATS, ALL, get_feed
+from .surrogate import (
+    SurrogateKeyMixin, post_payload_keys, category_key, tag_key, comments_key,
+    POST_LIST, CATEGORY_LIST, TAG_LIST,
+)
+
+def paginated_response(request, page):
+    """
+    PageNumberPagination envelope for a cached page payload, so cache hits
+    don't need a paginator.
+    """
+    url = request.build_absolute_uri()
+    number = page["number"]
+    previous = None
+    if number > 1:
+        previous = remove_query_param(url, "page") if number == 2 else replace_query_param(url, "page", number - 1)
+    return Response({
+        "count": page["count"],
+        "next": replace_query_param(url, "page", number + 1) if page["has_next"] else None,
+        "previous": previous,
+        "results": page["results"],
+    })
 
-PUBLIC_FILTER = dict(status='published')
+def sitemap_xml(request, section=None):
+    body = get_sitemap(section)
+    if body is None:
+        raise Http404("No such sitemap section")
+    return HttpResponse(body, content_type="application/xml")
 
-def published_qs():
-    return (Post.objects.filter(**PUBLIC_FILTER, published_at__lte=timezone.now())
-            .select_related('author', 'category')
-            .prefetch_related('tags'))
+def feed_xml(request, fmt, kind=None, slug=None):
+    # served from the cache; feeds are rebuilt by blogs.tasks.refresh_feeds, or here on a miss
+    scope = f"{kind}:{slug}" if kind else ALL
+    if fmt not in FORMATS or kind not in (None, "category", "tag"):
+        raise Http404("No such feed")
+    try:
+        entry = get_feed(scope, fmt)
+    except LookupError:
+        raise Http404("No such feed")
+    if entry is None:
+        # another request is rebuilding it
+        response = HttpResponse("Feed is being rebuilt", status=503, content_type="text/plain")
+        response["Retry-After"] = "5"
+        return response
+    if request.headers.get("If-None-Match") == entry["etag"]:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(entry["body"], content_type=entry["content_type"])
+    response["ETag"] = entry["etag"]
+    response["Cache-Control"] = "public, max-age=300"
+    return response
 
-class PublicPostViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+class PublicPostViewSet(SurrogateKeyMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     lookup_field = 'slug'
     permission_classes = [AllowAny]
 
-    def list(self, request, *args, **kwargs):
-        qs = published_qs()
-        category = request.GET.get("category")
-        tag = request.GET.get("tag")
-        author = request.GET.get("author")
-        q = request.GET.get("q")
-        ordering = request.GET.get("ordering", "-published_at")
-
-        if category:
-            qs = qs.filter(category__slug=category)
-        if tag:
-            qs = qs.filter(tags__slug=tag)
-        if author:
-            qs = qs.filter(author__id=author)
-
-        if q:
-            qs = search_posts(qs, q)
-
-        # tie-break by engagement if same date
-        if ordering == "relevance" and not q:
-            ordering = "-published_at"
-        if ordering not in ["-published_at", "published_at", "relevance", "views", "-views"]:
-            ordering = "-published_at"
-        if ordering == "views":
-            qs = qs.order_by("views_count")
-        elif ordering == "-views":
-            qs = qs.order_by("-views_count")
-        elif ordering == "relevance" and q:
-            # handled by search_posts
-            pass
-        else:
-            qs = qs.order_by(ordering, "-views_count")
+    def surrogate_keys(self, data):
+        if self.action == "list":
+            keys = {POST_LIST}
+            for item in data["results"]:
+                keys |= post_payload_keys(item)
+            return keys
+        if self.action == "retrieve":
+            return post_payload_keys(data)
+        return set()
 
-        params = dict(category=category or "", tag=tag or "", author=author or "", q=q or "", ordering=ordering or "", page=request.GET.get("page","1"), page_size=request.GET.get("page_size",""))
-        key = list_cache_key(params)
+    def list(self, request, *args, **kwargs):
+        params = list_params(request.GET)
+        # versioned per category/tag scope, see blogs.cache_keys.invalidate_post_caches
+        key = list_key(params)
         page = cache.get(key)
-        if not page:
-            page = self.paginate_queryset(qs)
-            cache.set(key, page, timeout=120)  # 2 minutes
-        serializer = PostListSerializer(page, many=True)
-        return self.get_paginated_response(serializer.data)
+        if page is None:
+            self.paginate_queryset(list_queryset(params))
+            page = page_payload(self.paginator.page)
+            cache.set(key, page, timeout=LIST_TTL)
+        return paginated_response(request, page)
 
     def retrieve(self, request, slug=None, *args, **kwargs):
         key = detail_cache_key(slug)
         data = cache.get(key)
         if not data:
-            obj = get_object_or_404(published_qs(), slug=slug)
+            obj = get_object_or_404(published_qs().select_related('derived'), slug=slug)
             data = PostDetailSerializer(obj).data
-            cache.set(key, data, 3600)  # 1 hour
+            cache.set(key, data, DETAIL_TTL)
         # increment views asynchronously
         increment_views.delay(slug)
         return Response(data)
 
-class CategoryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+class ChangesView(APIView):
+    # delta sync: pass the returned cursor back as ?since= until has_more is false.
+    # Routed at /api/changes/, outside the post slug space.
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(changes_since(parse_since(request.GET.get("since"))))
+
+class HomeView(SurrogateKeyMixin, APIView):
+    # routed at /api/home/, outside the post slug space like ChangesView
+    permission_classes = [AllowAny]
+
+    def surrogate_keys(self, data):
+        return {POST_LIST, CATEGORY_LIST, TAG_LIST}
+
+    def get(self, request):
+        return Response(home_payload())
+
+class CategoryViewSet(SurrogateKeyMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = Category.objects.all()
     serializer_class = CategoryMiniSerializer
     permission_classes = [AllowAny]
 
-class TagViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    def surrogate_keys(self, data):
+        return {CATEGORY_LIST} | {category_key(c["slug"]) for c in data["results"]}
+
+class TagViewSet(SurrogateKeyMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagMiniSerializer
     permission_classes = [AllowAny]
 
-class CommentViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
+    def surrogate_keys(self, data):
+        return {TAG_LIST} | {tag_key(t["slug"]) for t in data["results"]}
+
+class CommentViewSet(SurrogateKeyMixin, mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     permission_classes = [AllowAny]
     lookup_field = 'slug'
 
+    def surrogate_keys(self, data):
+        return {comments_key(self.kwargs["slug"])} if self.action == "list" else set()
+
     def get_queryset(self):
         post = get_object_or_404(published_qs(), slug=self.kwargs["slug"])
         return (Comment.objects.filter(post=post, is_approved=True)
+                .select_related("author")
                 .order_by("created_at"))
 
     def list(self, request, slug=None, *args, **kwargs):
-        qs = self.get_queryset()
-        serializer = CommentPublicSerializer(qs, many=True)
-        return Response(serializer.data)
+        cursor = request.GET.get("cursor") or ""
+        page_size = page_size_from(request.GET.get("page_size"))
+        key = comments_page_key(slug, comments_version(slug), cursor, page_size)
+        page = cache.get(key)
+        if page is None:
+            post_id = get_object_or_404(
+                Post.objects.filter(**PUBLIC_FILTER).values_list("id", flat=True),
+                slug=slug,
+            )
+            page = comment_thread_page(post_id, cursor=cursor, page_size=page_size)
+            cache.set(key, page, 600)  # 10 minutes; approvals bump the version
+        next_url = None
+        if page["next_cursor"]:
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", page["next_cursor"])
+        return Response({"next": next_url, "results": page["results"]})
 
     def create(self, request, slug=None, *args, **kwargs):
         post = get_object_or_404(published_qs(), slug=slug)
@@ -158,3 +230,36 @@ class AdminPostViewSet(viewsets.ModelViewSet):
         # minimal example analytics
         top = list(self.get_queryset().order_by("-views_count")[:10].values("title","slug","views_count"))
         return Response({"top_posts": top})
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        ser = PostBulkTransitionSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        return Response(bulk_transition(ser.validated_data["ids"], ser.validated_data["status"]))
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        qs = Post.objects.all()
+        if request.GET.get("status"):
+            qs = qs.filter(status=request.GET["status"])
+        response = StreamingHttpResponse(export_lines(qs), content_type="application/x-ndjson")
+        response["Content-Disposition"] = 'attachment; filename="posts.ndjson"'
+        return response
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_ndjson(self, request):
+        # read the raw body line by line; large archives belong to the import_posts command
+        lines = iter(request.stream.readline, b"") if request.stream else ()
+        stats = import_posts(lines, request.user)
+        return Response(stats, status=status.HTTP_201_CREATED if stats["created"] else status.HTTP_200_OK)
+
+class AdminCommentViewSet(viewsets.GenericViewSet):
+    queryset = Comment.objects.all()
+    permission_classes = [IsAdminUser]
+
+    @action(detail=False, methods=["post"], url_path="moderate")
+    def moderate(self, request):
+        ser = CommentModerationSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        changed = moderate_comments(ser.validated_data["ids"], approve=ser.validated_data["action"] == "approve")
+        return Response({"changed": changed})
@@ -0,0 +1,110 @@
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.cache import cache
+from django.db import connection
+
+from .cache_keys import detail_cache_key
+from .feeds import ALL, FORMATS, category_scope, tag_scope, post_scopes, build_feed, feed_key
+from .home import home_payload
+from .listing import PUBLIC_FILTER, DETAIL_TTL, published_qs, list_params, warm_first_page
+from .models import Post, Category, Tag
+from .serializers import PostDetailSerializer
+
+DETAIL_BATCH = 50
+
+
+def _size(data):
+    # roughly what the cache backend stores
+    return len(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+def scope_params(scope):
+    # first page of a list scope, with the view's default parameters
+    if scope == ALL:
+        return list_params({})
+    kind, _, slug = scope.partition(":")
+    return list_params({kind: slug})
+
+def warm_detail(post):
+    data = PostDetailSerializer(post).data
+    cache.set(detail_cache_key(post.slug), data, DETAIL_TTL)
+    return data
+
+def warm_details(post_ids):
+    """
+    Detail payloads for a batch of posts, one query set. Returns (keys, bytes).
+    """
+    size = 0
+    posts = published_qs().select_related('derived').filter(pk__in=list(post_ids))
+    for post in posts:
+        size += _size(warm_detail(post))
+    return len(posts), size
+
+def warm_scope(scope):
+    _, payload = warm_first_page(scope_params(scope))
+    return 1, _size(payload)
+
+def warm_feed(scope):
+    build_feed(scope)
+    return len(FORMATS), sum(_size(cache.get(feed_key(scope, fmt))) for fmt in FORMATS)
+
+def warm_home():
+    return 1, _size(home_payload())
+
+def warm_posts(post_ids):
+    """
+    Pre-render detail payloads for the given posts and the first list page of
+    every scope they appear in. Returns the number of keys written.
+    """
+    posts = list(published_qs().select_related('derived').filter(pk__in=list(post_ids)))
+    scopes = {ALL}.union(*(post_scopes(p) for p in posts))
+    for post in posts:
+        warm_detail(post)
+    for scope in scopes:
+        warm_first_page(scope_params(scope))
+    return len(posts) + len(scopes)
+
+
+def _run(job):
+    try:
+        return job()
+    finally:
+        # each worker thread has its own connection
+        connection.close()
+
+def warm_cache(top=100, recent=100, concurrency=4):
+    """
+    Refill the public read caches after a deploy or a cache flush: detail
+    payloads of the top-N posts by views plus the N most recently published,
+    the first list page and the RSS/Atom feeds overall and per category and
+    tag, and the homepage.
+    Work runs on at most `concurrency` threads so a cold warm-up doesn't
+    become its own stampede. Returns {"keys", "bytes", "seconds"}.
+    """
+    started = time.monotonic()
+    qs = Post.objects.filter(**PUBLIC_FILTER)
+    ids = list(dict.fromkeys(
+        list(qs.order_by("-views_count").values_list("pk", flat=True)[:top])
+        + list(qs.order_by("-published_at").values_list("pk", flat=True)[:recent])
+    ))
+    scopes = [ALL]
+    scopes += [category_scope(s) for s in Category.objects.values_list("slug", flat=True)]
+    scopes += [tag_scope(s) for s in Tag.objects.values_list("slug", flat=True)]
+
+    jobs = [partial(warm_details, ids[i:i + DETAIL_BATCH]) for i in range(0, len(ids), DETAIL_BATCH)]
+    jobs += [partial(warm_scope, scope) for scope in scopes]
+    jobs += [partial(warm_feed, scope) for scope in scopes]
+    jobs.append(warm_home)
+
+    if concurrency <= 1:
+        results = [job() for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_run, jobs))
+    return {
+        "keys": sum(k for k, _ in results),
+        "bytes": sum(b for _, b in results),
+        "seconds": round(time.monotonic() - started, 3),
+    }
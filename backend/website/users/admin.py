@@ -1,6 +1,9 @@
 # users/admin.py
 from django.contrib import admin
-from .models import User, Profile, Role, LoginHistory, AuditLog, EmailVerificationToken, TwoFactorDevice, BackupCode
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from .models import User, Profile, Role, LoginHistory, AuditLog, EmailVerificationToken, TwoFactorDevice, BackupCode, DataExport, OutboundEmail
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -21,18 +24,83 @@ class RoleAdmin(admin.ModelAdmin):
     search_fields = ("name",)
     filter_horizontal = ("permissions",)
 
+class EstimatedCountPaginator(Paginator):
+    """
+    On PostgreSQL an unfiltered changelist takes its total from the planner
+    estimate instead of COUNT(*) over the whole table.
+    """
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if connection.vendor == "postgresql" and query is not None and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                               [self.object_list.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > 10000:
+                return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # append-only tables that grow without bound: no full counts, exact-match
+    # searches on indexed columns, newest first on the timestamp index
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ("-timestamp",)
+    sortable_by = ()
+    raw_id_fields = ("user",)
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(LoginHistory)
-class LoginHistoryAdmin(admin.ModelAdmin):
+class LoginHistoryAdmin(LargeTableAdmin):
     list_display = ("user", "timestamp", "ip_address", "successful")
-    search_fields = ("user__email", "ip_address", "user_agent")
+    list_select_related = ("user",)
+    list_filter = ("successful",)
+    search_fields = ("=user__email", "=ip_address")
     readonly_fields = ("user", "timestamp", "ip_address", "user_agent", "successful", "metadata")
 
 @admin.register(AuditLog)
-class AuditLogAdmin(admin.ModelAdmin):
+class AuditLogAdmin(LargeTableAdmin):
     list_display = ("action", "user", "target_user", "timestamp", "ip_address")
-    search_fields = ("user__email", "target_user__email", "action")
+    list_select_related = ("user", "target_user")
+    list_filter = ("action",)
+    search_fields = ("=user__email", "=target_user__email", "=ip_address")
+    raw_id_fields = ("user", "target_user")
     readonly_fields = ("action", "user", "target_user", "timestamp", "ip_address", "details")
 
-admin.site.register(EmailVerificationToken)
+@admin.register(EmailVerificationToken)
+class EmailVerificationTokenAdmin(admin.ModelAdmin):
+    list_display = ("user", "created_at", "expires_at")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+    show_full_result_count = False
+
 admin.site.register(TwoFactorDevice)
-admin.site.register(BackupCode)
+
+@admin.register(BackupCode)
+class BackupCodeAdmin(admin.ModelAdmin):
+    list_display = ("user", "used", "created_at")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+    exclude = ("code_hash", "lookup")
+    show_full_result_count = False
+
+@admin.register(DataExport)
+class DataExportAdmin(admin.ModelAdmin):
+    list_display = ("user", "status", "rows", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+    readonly_fields = ("file", "progress", "rows", "attempts", "error", "heartbeat_at", "finished_at")
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("to_email", "kind", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status", "kind")
+    search_fields = ("to_email",)
+    exclude = ("body",)  # carries live verification and reset links
+    readonly_fields = ("dedupe_key", "attempts", "claimed_at", "last_error", "sent_at")
+    show_full_result_count = False
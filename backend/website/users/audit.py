@@ -0,0 +1,248 @@
+"""
+Audit and login-history events, written off the request path.
+
+Views call log_action() / log_login(); the configured sink (AUDIT_SINK)
+decides when rows hit the database:
+
+- SyncAuditSink writes each event straight away (tests, management commands)
+- ThreadAuditSink queues events in-process and a daemon thread writes them
+  in batches with bulk_create
+- RedisAuditSink pushes events onto a Redis list that the
+  flush_audit_events task drains in batches
+
+Both queued sinks apply back-pressure: when the backlog is full the caller
+writes synchronously instead of dropping events.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from .models import AuditLog, LoginHistory
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+MAX_PENDING = 10000
+MODELS = {"audit": AuditLog, "login": LoginHistory}
+
+
+def _client_ip(request):
+    return request.META.get("REMOTE_ADDR") if request is not None else None
+
+def log_action(action, user=None, target_user=None, request=None, details=None):
+    _emit("audit", {
+        "action": action,
+        "user_id": user.pk if user is not None else None,
+        "target_user_id": target_user.pk if target_user is not None else None,
+        "ip_address": _client_ip(request),
+        "details": details or {},
+    })
+
+def log_login(user, request, successful, reason=None):
+    _emit("login", {
+        "user_id": user.pk,
+        "ip_address": _client_ip(request),
+        "user_agent": request.META.get("HTTP_USER_AGENT", ""),
+        "successful": successful,
+    })
+    log_action("login_success" if successful else "login_failed", user=user, request=request,
+               details={"reason": reason} if reason else None)
+
+def _emit(kind, fields):
+    event = {"kind": kind, "timestamp": timezone.now(), **fields}
+    # nothing is logged for work that gets rolled back
+    transaction.on_commit(lambda: get_sink().emit(event))
+
+
+def write_events(events):
+    """
+    Insert events with one bulk_create per model. If a batch fails (say a
+    user was deleted meanwhile) rows are retried one by one so a single bad
+    event doesn't take the rest with it.
+    """
+    rows = {kind: [] for kind in MODELS}
+    for event in events:
+        fields = dict(event)
+        kind = fields.pop("kind")
+        if isinstance(fields["timestamp"], str):
+            fields["timestamp"] = parse_datetime(fields["timestamp"])
+        rows[kind].append(MODELS[kind](**fields))
+    written = 0
+    for kind, objs in rows.items():
+        if not objs:
+            continue
+        try:
+            with transaction.atomic():
+                MODELS[kind].objects.bulk_create(objs)
+            written += len(objs)
+        except Exception:
+            logger.exception("audit batch of %d %s events failed, retrying singly", len(objs), kind)
+            for obj in objs:
+                try:
+                    with transaction.atomic():
+                        obj.save(force_insert=True)
+                    written += 1
+                except Exception:
+                    logger.exception("dropping %s audit event", kind)
+    return written
+
+
+class BaseAuditSink:
+    def __init__(self, **options):
+        self.options = options
+        self.batch_size = options.get("BATCH_SIZE", BATCH_SIZE)
+        self.max_pending = options.get("MAX_PENDING", MAX_PENDING)
+
+    def emit(self, event):
+        raise NotImplementedError
+
+    def flush(self):
+        """Write everything pending; returns the number of rows written."""
+        return 0
+
+    def close(self):
+        self.flush()
+
+
+class SyncAuditSink(BaseAuditSink):
+    def emit(self, event):
+        write_events([event])
+
+
+class ThreadAuditSink(BaseAuditSink):
+    """
+    Bounded in-process queue drained by a daemon thread every
+    FLUSH_INTERVAL seconds or BATCH_SIZE events. A full queue makes emit()
+    wait up to BLOCK_TIMEOUT, then write the event itself. Pending events are
+    flushed at interpreter exit.
+    """
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.interval = options.get("FLUSH_INTERVAL", 1.0)
+        self.block_timeout = options.get("BLOCK_TIMEOUT", 0.05)
+        self.queue = queue.Queue(maxsize=self.max_pending)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.stopping = threading.Event()
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        # a forked worker inherits the queue but not the thread
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self.thread.start()
+
+    def emit(self, event):
+        self._ensure_started()
+        try:
+            self.queue.put(event, timeout=self.block_timeout)
+        except queue.Full:
+            write_events([event])
+
+    def _take(self, first=None):
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                first = self.queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            batch = self._take(first)
+            close_old_connections()
+            try:
+                write_events(batch)
+            except Exception:
+                logger.exception("audit writer failed on %d events", len(batch))
+
+    def flush(self):
+        written = 0
+        while batch := self._take():
+            written += write_events(batch)
+        return written
+
+    def close(self):
+        self.stopping.set()
+        if self.thread is not None and self.pid == os.getpid():
+            self.thread.join(timeout=self.interval + 1)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("audit flush at shutdown failed")
+
+
+class RedisAuditSink(BaseAuditSink):
+    """
+    RPUSHes JSON events onto KEY (default "users:audit:events") of the
+    django-redis connection ALIAS. Drained by flush(), run periodically by
+    users.tasks.flush_audit_events. A caller that pushes the backlog past
+    MAX_PENDING drains one batch itself.
+    """
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.key = options.get("KEY", "users:audit:events")
+        self.alias = options.get("ALIAS", "default")
+
+    def _redis(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection(self.alias)
+
+    def emit(self, event):
+        backlog = self._redis().rpush(self.key, json.dumps(event, cls=DjangoJSONEncoder))
+        if backlog > self.max_pending:
+            self._drain_batch()
+
+    def _drain_batch(self):
+        conn = self._redis()
+        raw = conn.lpop(self.key, self.batch_size)
+        if not raw:
+            return 0
+        events = [json.loads(item) for item in raw]
+        try:
+            write_events(events)
+        except Exception:
+            # database unavailable: put them back for the next run
+            conn.lpush(self.key, *reversed(raw))
+            raise
+        return len(raw)
+
+    def flush(self):
+        drained = 0
+        while n := self._drain_batch():
+            drained += n
+        return drained
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+def get_sink():
+    path = getattr(settings, "AUDIT_SINK", "users.audit.SyncAuditSink")
+    sink = _sinks.get(path)
+    if sink is None:
+        with _sinks_lock:
+            sink = _sinks.get(path)
+            if sink is None:
+                sink = _sinks[path] = import_string(path)(**getattr(settings, "AUDIT_SINK_OPTIONS", {}))
+    return sink
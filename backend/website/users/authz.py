@@ -0,0 +1,100 @@
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import User, Role
+
+AUTHZ_TTL = 15 * 60
+ADMIN_ROLES = ("staff", "admin", "moderator")
+# never cached; a User built from the context loads it on access
+EXCLUDED_FIELDS = ("password",)
+
+# Per-user contexts are keyed by two version stamps: the user's own (saves,
+# role membership) and a global one for role definitions and permissions,
+# which can touch any number of users at once.
+ROLES_VERSION_KEY = "users:authz:ver:roles"
+
+def user_version_key(user_id):
+    return f"users:authz:ver:{user_id}"
+
+def context_key(user_id, user_version, roles_version):
+    return f"users:authz:{user_id}:u{user_version}r{roles_version}"
+
+def _bump(key):
+    # old entries become unreachable and expire on their own TTL
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+def bump_user(user_id):
+    _bump(user_version_key(user_id))
+
+def bump_roles():
+    _bump(ROLES_VERSION_KEY)
+
+
+def _cached_fields():
+    return [f.attname for f in User._meta.concrete_fields if f.attname not in EXCLUDED_FIELDS]
+
+def build_context(user_id):
+    """
+    The user's row (minus the password hash), role names and the codenames
+    of every permission granted through those roles; None if there's no
+    such user.
+    """
+    row = User.objects.filter(pk=user_id).values(*_cached_fields(), "password").first()
+    if row is None:
+        return None
+    from rest_framework_simplejwt.utils import get_md5_hash_password
+    password = row.pop("password")
+    perms = (Permission.objects.filter(roles__users=user_id)
+             .values_list("content_type__app_label", "codename").distinct())
+    return {
+        "fields": row,
+        "roles": sorted(Role.objects.filter(users=user_id).values_list("name", flat=True)),
+        "permissions": sorted(f"{app}.{codename}" for app, codename in perms),
+        # what simplejwt's CHECK_REVOKE_TOKEN compares against
+        "password_fingerprint": get_md5_hash_password(password),
+    }
+
+def get_context(user_id):
+    """
+    The cached authorization context of a user: two small cache reads when
+    warm, built from the database when not.
+    """
+    ukey = user_version_key(user_id)
+    versions = cache.get_many([ukey, ROLES_VERSION_KEY])
+    key = context_key(user_id, versions.get(ukey) or 1, versions.get(ROLES_VERSION_KEY) or 1)
+    ctx = cache.get(key)
+    if ctx is None:
+        ctx = build_context(user_id)
+        if ctx is not None:
+            cache.set(key, ctx, AUTHZ_TTL)
+    return ctx
+
+def user_from_context(ctx):
+    # as if loaded with .defer("password"); saving it only writes loaded fields
+    fields = ctx["fields"]
+    user = User.from_db(DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
+    user._authz = ctx
+    return user
+
+def context_for(user):
+    ctx = getattr(user, "_authz", None)
+    if ctx is None:
+        ctx = user._authz = get_context(user.pk)
+    return ctx
+
+def has_role(user, names):
+    if not (user and user.is_authenticated):
+        return False
+    ctx = context_for(user)
+    return bool(ctx and set(ctx["roles"]) & set(names))
+
+def has_role_permission(user, perm):
+    # "app_label.codename", granted through a role
+    if not (user and user.is_authenticated):
+        return False
+    ctx = context_for(user)
+    return bool(ctx and perm in ctx["permissions"])
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+UserModel = get_user_model()
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Authenticate by email or username with one query over the two unique
+    columns. Exactly one password hash runs whether or not the account
+    exists, so a miss takes as long as a wrong password.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        ident = username or kwargs.get("email") or kwargs.get(UserModel.USERNAME_FIELD)
+        if not ident or password is None:
+            return None
+        user = self.get_user_by_ident(ident)
+        if user is None:
+            # same cost as a real check (see ModelBackend.authenticate)
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    @staticmethod
+    def get_user_by_ident(ident):
+        email = UserModel.objects.normalize_email(ident)
+        # a username may look like someone else's email; the email match wins
+        users = list(UserModel._default_manager.filter(Q(email=email) | Q(username=ident))[:2])
+        for user in users:
+            if user.email == email:
+                return user
+        return users[0] if users else None
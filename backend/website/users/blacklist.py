@@ -0,0 +1,209 @@
+"""
+Refresh-token blacklist keyed by jti, outside the database.
+
+The store is chosen with JWT_BLACKLIST_STORE / JWT_BLACKLIST_OPTIONS:
+
+- CacheBlacklistStore keeps one cache key per revoked jti (any Django cache)
+- RedisBlacklistStore keeps the same keys in Redis plus an append-only log
+  of revocations, which every process folds into an in-process Bloom filter
+  so tokens that were never revoked are cleared without a network call
+
+Entries expire together with the token they revoke.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import takewhile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+KEY_PREFIX = "users:jwt:bl"
+
+# returns 0 if the jti was already revoked, else its sequence number
+ADD_SCRIPT = """
+if not redis.call('SET', KEYS[2], 1, 'NX', 'EXAT', ARGV[1]) then
+  return 0
+end
+local seq = redis.call('INCR', KEYS[1])
+redis.call('ZADD', KEYS[3], seq, ARGV[2])
+return seq
+"""
+
+
+def _ttl(exp):
+    return max(1, int(exp - time.time()))
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings; `capacity` items at roughly
+    `error_rate` false positives. No false negatives.
+    """
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Kirsch-Mitzenmacher: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+
+class BaseBlacklistStore:
+    def __init__(self, **options):
+        self.options = options
+
+    def add(self, jti, exp):
+        """
+        Revoke `jti` until `exp` (unix time). Atomic: returns False if it was
+        already revoked, so of two concurrent revocations only one wins.
+        """
+        raise NotImplementedError
+
+    def contains(self, jti):
+        raise NotImplementedError
+
+    def purge(self):
+        """Drop bookkeeping for expired entries; returns how many went."""
+        return 0
+
+    def revoke(self, token):
+        return self.add(token["jti"], token["exp"])
+
+    def is_revoked(self, token):
+        return self.contains(token["jti"])
+
+
+class CacheBlacklistStore(BaseBlacklistStore):
+    def _key(self, jti):
+        return f"{KEY_PREFIX}:{jti}"
+
+    def add(self, jti, exp):
+        return cache.add(self._key(jti), 1, _ttl(exp))
+
+    def contains(self, jti):
+        return cache.get(self._key(jti)) is not None
+
+
+class RedisBlacklistStore(BaseBlacklistStore):
+    """
+    Revoked jtis are SET with EXAT at token expiry and appended to a sorted
+    set log scored by a revocation sequence number. Each process replays
+    the log tail into its Bloom filter at most every SYNC_INTERVAL seconds;
+    a jti the filter has never seen is accepted with no Redis call, one it
+    may have seen is confirmed with EXISTS. So a revocation made by another
+    process takes effect there within SYNC_INTERVAL (set it to 0 for none).
+
+    Options: ALIAS (django-redis connection), SYNC_INTERVAL, CAPACITY,
+    ERROR_RATE.
+    """
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.alias = options.get("ALIAS", "default")
+        self.sync_interval = options.get("SYNC_INTERVAL", 1.0)
+        self.capacity = options.get("CAPACITY", 1_000_000)
+        self.error_rate = options.get("ERROR_RATE", 0.001)
+        self.log_key = f"{KEY_PREFIX}:log"
+        self.seq_key = f"{KEY_PREFIX}:seq"
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.seen_seq = 0
+        self.synced_at = 0.0
+
+    def _redis(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection(self.alias)
+
+    def _key(self, jti):
+        return f"{KEY_PREFIX}:{jti}"
+
+    def add(self, jti, exp):
+        # one script, so no reader ever sees sequence N+1 logged before N;
+        # the log member carries the expiry so purge() can trim without lookups
+        seq = self._redis().eval(
+            ADD_SCRIPT, 3, self.seq_key, self._key(jti), self.log_key, int(exp), f"{int(exp)}:{jti}",
+        )
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+        return bool(seq)
+
+    def _sync(self):
+        now = time.monotonic()
+        if self.bloom is not None and now - self.synced_at < self.sync_interval:
+            return
+        with self.lock:
+            if self.bloom is not None and now - self.synced_at < self.sync_interval:
+                return
+            conn = self._redis()
+            if self.bloom is None or self.bloom.full:
+                # (re)build from the whole log; expired entries are skipped
+                self.bloom = BloomFilter(self.capacity, self.error_rate)
+                self.seen_seq = 0
+            entries = conn.zrangebyscore(self.log_key, f"({self.seen_seq}", "+inf", withscores=True)
+            cutoff = time.time()
+            for member, seq in entries:
+                exp, _, jti = member.decode().partition(":")
+                if int(exp) > cutoff:
+                    self.bloom.add(jti)
+                self.seen_seq = max(self.seen_seq, int(seq))
+            self.synced_at = now
+
+    def contains(self, jti):
+        self._sync()
+        if jti not in self.bloom:
+            return False
+        return bool(self._redis().exists(self._key(jti)))
+
+    def purge(self):
+        # the log is in revocation order, which for one token lifetime is expiry order
+        conn = self._redis()
+        cutoff, removed = time.time(), 0
+        while True:
+            batch = conn.zrange(self.log_key, 0, 999)
+            stale = list(takewhile(lambda m: int(m.decode().partition(":")[0]) <= cutoff, batch))
+            if stale:
+                conn.zrem(self.log_key, *stale)
+                removed += len(stale)
+            if len(stale) < 1000:
+                return removed
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store():
+    path = getattr(settings, "JWT_BLACKLIST_STORE", "users.blacklist.CacheBlacklistStore")
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = _stores[path] = import_string(path)(**getattr(settings, "JWT_BLACKLIST_OPTIONS", {}))
+    return store
+
+def exp_timestamp(value):
+    # token rows store aware datetimes
+    if isinstance(value, datetime):
+        return value.astimezone(dt_timezone.utc).timestamp()
+    return value
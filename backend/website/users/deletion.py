@@ -0,0 +1,230 @@
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .audit import log_action
+from .models import (
+    User, Profile, LoginHistory, AuditLog, EmailVerificationToken, TwoFactorDevice, BackupCode, DataExport,
+    AccountDeletion,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+POST_BATCH_SIZE = 50  # posts fire their own delete receivers (purge, feeds, change log)
+STALE_AFTER = timedelta(minutes=15)
+MAX_ATTEMPTS = 5
+ANONYMOUS_NAME = "[deleted]"
+
+
+def schedule(user, grace_days=30):
+    """
+    Deactivate the account now and queue it for purging after `grace_days`.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+        AccountDeletion.objects.update_or_create(user_id=user.pk, defaults={
+            "status": AccountDeletion.S_SCHEDULED,
+            "requested_at": timezone.now(),
+            "purge_after": timezone.now() + timedelta(days=grace_days),
+            "step": "", "progress": {}, "attempts": 0, "error": "",
+        })
+        log_action("delete_requested", user=user, details={"grace_days": grace_days})
+
+def cancel(user):
+    with transaction.atomic():
+        n = AccountDeletion.objects.filter(user_id=user.pk, status=AccountDeletion.S_SCHEDULED).update(
+            status=AccountDeletion.S_CANCELLED)
+        if n:
+            user.is_active = True
+            user.save(update_fields=["is_active"])
+    return bool(n)
+
+
+def _ids(qs, batch_size):
+    return list(qs.order_by("pk").values_list("pk", flat=True)[:batch_size])
+
+# Each step handles at most one batch in its own transaction and returns
+# how many rows it touched; 0 means the step is finished. Steps select what
+# is left each time, so a rerun after a crash just carries on.
+
+def _delete_batch(model, filters):
+    def step(user_id, batch_size):
+        with transaction.atomic():
+            ids = _ids(model.objects.filter(**filters(user_id)), batch_size)
+            if ids:
+                model.objects.filter(pk__in=ids).delete()
+        return len(ids)
+    return step
+
+def _post_comments(user_id, batch_size):
+    # everyone's comments on the user's posts; recounts and cache bumps are
+    # done once per batch instead of once per comment
+    from blogs.moderation import batched_comment_refresh
+    Comment = apps.get_model("blogs", "Comment")
+    with transaction.atomic(), batched_comment_refresh():
+        ids = _ids(Comment.objects.filter(post__author_id=user_id), batch_size)
+        if ids:
+            Comment.objects.filter(parent_id__in=ids).update(parent=None)
+            Comment.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+def _post_reactions(user_id, batch_size):
+    Reaction = apps.get_model("blogs", "Reaction")
+    return _delete_batch(Reaction, lambda uid: {"post__author_id": uid})(user_id, batch_size)
+
+def _posts(user_id, batch_size):
+    # one by one: the Post receivers do the CDN purge, cache invalidation,
+    # feeds, sitemaps and change log, batched per transaction
+    Post = apps.get_model("blogs", "Post")
+    with transaction.atomic():
+        posts = list(Post.objects.filter(author_id=user_id).order_by("pk")
+                     .select_related("category").prefetch_related("tags")[:min(batch_size, POST_BATCH_SIZE)])
+        for post in posts:
+            post.delete()
+    return len(posts)
+
+def _comments(user_id, batch_size):
+    # comments on other people's posts stay, without the author, so threads still read
+    from blogs.moderation import invalidate_comment_caches
+    Comment = apps.get_model("blogs", "Comment")
+    with transaction.atomic():
+        rows = list(Comment.objects.filter(author_id=user_id).order_by("pk").values_list("pk", "post_id")[:batch_size])
+        if not rows:
+            return 0
+        Comment.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+            author=None, author_name=ANONYMOUS_NAME, author_email_hash=None)
+        post_ids = {post_id for _, post_id in rows}
+        transaction.on_commit(lambda: invalidate_comment_caches(post_ids))
+    return len(rows)
+
+def _reactions(user_id, batch_size):
+    from blogs.cache_keys import invalidate_post_caches
+    Reaction = apps.get_model("blogs", "Reaction")
+    with transaction.atomic():
+        rows = list(Reaction.objects.filter(user_id=user_id).order_by("pk").values_list("pk", "post__slug")[:batch_size])
+        if not rows:
+            return 0
+        Reaction.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+        # detail payloads carry likes_count
+        slugs = {slug for _, slug in rows}
+        transaction.on_commit(lambda: invalidate_post_caches(slugs))
+    return len(rows)
+
+def _media(user_id, batch_size):
+    MediaAsset = apps.get_model("blogs", "MediaAsset")
+    with transaction.atomic():
+        ids = _ids(MediaAsset.objects.filter(uploader_id=user_id), batch_size)
+        MediaAsset.objects.filter(pk__in=ids).update(uploader=None)
+    return len(ids)
+
+def _audit_log(user_id, batch_size):
+    # kept for the security record, detached from the account
+    with transaction.atomic():
+        ids = _ids(AuditLog.objects.filter(Q(user_id=user_id) | Q(target_user_id=user_id)), batch_size)
+        logs = AuditLog.objects.filter(pk__in=ids)
+        logs.filter(user_id=user_id).update(user=None)
+        logs.filter(target_user_id=user_id).update(target_user=None)
+    return len(ids)
+
+def _exports(user_id, batch_size):
+    from .exports import get_storage
+    exports = list(DataExport.objects.filter(user_id=user_id)[:batch_size])
+    storage = get_storage()
+    for export in exports:
+        names = [export.file] if export.file else []
+        names += [part for _, part in (export.progress or {}).get("parts", [])]
+        for name in names:
+            storage.delete(name)
+        export.delete()
+    return len(exports)
+
+def _admin_log(user_id, batch_size):
+    if not apps.is_installed("django.contrib.admin"):
+        return 0
+    return _delete_batch(apps.get_model("admin", "LogEntry"), lambda uid: {"user_id": uid})(user_id, batch_size)
+
+def _rows_of(model, field="user_id"):
+    return _delete_batch(model, lambda uid: {field: uid})
+
+STEPS = [
+    ("post_comments", _post_comments),
+    ("post_reactions", _post_reactions),
+    ("posts", _posts),
+    ("comments", _comments),
+    ("reactions", _reactions),
+    ("media", _media),
+    ("login_history", _rows_of(LoginHistory)),
+    ("audit_log", _audit_log),
+    ("backup_codes", _rows_of(BackupCode)),
+    ("twofactor_devices", _rows_of(TwoFactorDevice)),
+    ("verification_tokens", _rows_of(EmailVerificationToken)),
+    ("exports", _exports),
+    ("admin_log", _admin_log),
+    ("profile", _rows_of(Profile)),
+]
+
+
+def claim(deletion_id):
+    now = timezone.now()
+    due = Q(status=AccountDeletion.S_SCHEDULED, purge_after__lte=now)
+    stale = Q(status=AccountDeletion.S_PURGING) & (Q(heartbeat_at__lt=now - STALE_AFTER) | Q(heartbeat_at=None))
+    # a purge that keeps killing its worker never gets to record a failure
+    AccountDeletion.objects.filter(Q(pk=deletion_id) & stale, attempts__gte=MAX_ATTEMPTS).update(
+        status=AccountDeletion.S_FAILED, error="worker stopped during the last attempt")
+    return AccountDeletion.objects.filter(Q(pk=deletion_id) & (due | stale)).update(
+        status=AccountDeletion.S_PURGING, heartbeat_at=now, attempts=F("attempts") + 1) == 1
+
+def due_deletions(limit=None):
+    now = timezone.now()
+    qs = AccountDeletion.objects.filter(
+        Q(status=AccountDeletion.S_SCHEDULED, purge_after__lte=now)
+        | Q(status=AccountDeletion.S_PURGING, heartbeat_at__lt=now - STALE_AFTER)
+    ).order_by("purge_after").values_list("pk", flat=True)
+    return list(qs[:limit] if limit else qs)
+
+def purge_account(deletion_id, batch_size=BATCH_SIZE):
+    """
+    Remove a due account step by step, one batch per short transaction,
+    recording the step and per-step counts after every batch. The User row
+    itself goes last, when nothing big is left to cascade. A failing run is
+    due again on the next sweep until MAX_ATTEMPTS, then stays failed.
+    Returns False if the deletion isn't due or another worker has it.
+    """
+    if not claim(deletion_id):
+        return False
+    deletion = AccountDeletion.objects.get(pk=deletion_id)
+    try:
+        _purge(deletion, batch_size)
+    except Exception as exc:
+        logger.exception("account purge %s failed at %s (attempt %d)", deletion_id, deletion.step, deletion.attempts)
+        status = AccountDeletion.S_FAILED if deletion.attempts >= MAX_ATTEMPTS else AccountDeletion.S_SCHEDULED
+        _heartbeat(deletion, status=status, error=f"{type(exc).__name__}: {exc}")
+        raise
+    return True
+
+def _purge(deletion, batch_size):
+    user_id = deletion.user_id
+    names = [name for name, _ in STEPS]
+    start = names.index(deletion.step) if deletion.step in names else 0
+    for name, step in STEPS[start:]:
+        while n := step(user_id, batch_size):
+            deletion.progress[name] = deletion.progress.get(name, 0) + n
+            _heartbeat(deletion, step=name)
+        _heartbeat(deletion, step=name)
+
+    with transaction.atomic():
+        User.objects.filter(pk=user_id).delete()
+        log_action("account_purged", details={"user_id": str(user_id), "rows": deletion.progress})
+    _heartbeat(deletion, step="user", status=AccountDeletion.S_DONE, finished_at=timezone.now(), error="")
+
+def _heartbeat(deletion, **fields):
+    fields["heartbeat_at"] = timezone.now()
+    for k, v in fields.items():
+        setattr(deletion, k, v)
+    AccountDeletion.objects.filter(pk=deletion.pk).update(progress=deletion.progress, **fields)
@@ -0,0 +1,180 @@
+import json
+import logging
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from itertools import islice
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import storages
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import DataExport
+
+logger = logging.getLogger(__name__)
+
+PART_ROWS = 50000  # rows per stored part, i.e. the most work a crash can lose
+CHUNK_SIZE = 2000
+STALE_AFTER = timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+
+# (archive entry, model, field pointing at the user, exported fields)
+SECTIONS = [
+    ("account", "users.User", "pk", ("id", "email", "username", "first_name", "last_name", "phone_number",
+                                    "email_verified", "phone_verified", "last_login", "created_at", "updated_at")),
+    ("profile", "users.Profile", "user", ("bio", "avatar_url", "location", "timezone", "language",
+                                         "privacy_settings", "preferences")),
+    ("posts", "blogs.Post", "author", ("id", "title", "slug", "summary", "content", "status", "published_at",
+                                      "created_at", "updated_at")),
+    ("comments", "blogs.Comment", "author", ("id", "post_id", "parent_id", "content", "is_approved", "created_at")),
+    ("reactions", "blogs.Reaction", "user", ("id", "post_id", "type", "created_at")),
+    ("media", "blogs.MediaAsset", "uploader", ("id", "file_url", "mime_type", "width", "height", "created_at")),
+    ("login_history", "users.LoginHistory", "user", ("timestamp", "ip_address", "user_agent", "successful",
+                                                    "metadata")),
+    ("audit_log", "users.AuditLog", "user", ("action", "timestamp", "ip_address", "details")),
+]
+
+
+def get_storage():
+    return storages["exports"]
+
+def part_name(export, seq):
+    return f"exports/{export.pk}/part-{seq:05d}.ndjson"
+
+def archive_name(export):
+    return f"exports/{export.pk}/export-{export.user_id}.zip"
+
+def claim(export_id):
+    """
+    Take the export for this worker: pending, or running with a heartbeat
+    older than STALE_AFTER (its worker died).
+    """
+    now = timezone.now()
+    stale = Q(status=DataExport.S_RUNNING) & (Q(heartbeat_at__lt=now - STALE_AFTER) | Q(heartbeat_at__isnull=True))
+    # an export that keeps killing its worker never gets to record a failure
+    DataExport.objects.filter(Q(pk=export_id) & stale, attempts__gte=MAX_ATTEMPTS).update(
+        status=DataExport.S_FAILED, error="worker stopped during the last attempt")
+    return DataExport.objects.filter(Q(pk=export_id) & (Q(status=DataExport.S_PENDING) | stale)).update(
+        status=DataExport.S_RUNNING, heartbeat_at=now, attempts=F("attempts") + 1) == 1
+
+def _save_progress(export, **fields):
+    fields["heartbeat_at"] = timezone.now()
+    for k, v in fields.items():
+        setattr(export, k, v)
+    DataExport.objects.filter(pk=export.pk).update(progress=export.progress, **fields)
+
+def _rows(section, user_id, after):
+    _, label, field, columns = section
+    qs = apps.get_model(label).objects.filter(**{field: user_id})
+    if after is not None:
+        qs = qs.filter(pk__gt=after)
+    # keyset order; pk rides along for the resume point and is dropped if not exported
+    return qs.order_by("pk").values_list("pk", *columns).iterator(chunk_size=CHUNK_SIZE)
+
+def _store_part(storage, name, rows, columns):
+    """
+    Write up to PART_ROWS rows to `name`, spooled through a temp file so
+    memory stays flat whatever the storage. Returns (stored name, rows, last pk).
+    """
+    count, last = 0, None
+    with tempfile.TemporaryFile() as tmp:
+        for row in islice(rows, PART_ROWS):
+            last = row[0]
+            tmp.write((json.dumps(dict(zip(columns, row[1:])), cls=DjangoJSONEncoder) + "\n").encode())
+            count += 1
+        if not count:
+            return None, 0, None
+        tmp.seek(0)
+        if storage.exists(name):
+            storage.delete(name)  # left by a crashed attempt
+        return storage.save(name, File(tmp, name=name)), count, last
+
+def run_export(export):
+    """
+    Write every section as NDJSON parts of at most PART_ROWS rows, recording
+    progress after each part, then zip the parts into one archive. A rerun
+    continues after the last recorded part.
+    """
+    storage = get_storage()
+    progress = export.progress or {}
+    progress.setdefault("section", 0)
+    progress.setdefault("after", None)
+    progress.setdefault("parts", [])
+    export.progress = progress
+
+    while progress["section"] < len(SECTIONS):
+        section = SECTIONS[progress["section"]]
+        rows = _rows(section, export.user_id, progress["after"])
+        while True:
+            stored, count, last = _store_part(storage, part_name(export, len(progress["parts"])), rows, section[3])
+            if not count:
+                break
+            progress["parts"].append([section[0], stored])
+            progress["after"] = str(last)
+            _save_progress(export, rows=export.rows + count)
+            if count < PART_ROWS:
+                break
+        progress["section"] += 1
+        progress["after"] = None
+        _save_progress(export)
+
+    _assemble(export, storage)
+
+def _assemble(export, storage):
+    with tempfile.TemporaryFile() as tmp:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            by_section = {}
+            for section, part in export.progress["parts"]:
+                by_section.setdefault(section, []).append(part)
+            for section, *_ in SECTIONS:
+                with zf.open(f"{section}.ndjson", "w", force_zip64=True) as entry:
+                    for part in by_section.get(section, ()):
+                        with storage.open(part, "rb") as fh:
+                            shutil.copyfileobj(fh, entry)
+        tmp.seek(0)
+        name = archive_name(export)
+        if storage.exists(name):
+            storage.delete(name)
+        name = storage.save(name, File(tmp, name=name))
+    # done before the parts go, so a crash in between leaves a finished export
+    # (and some litter) rather than a rerun with nothing to assemble
+    _save_progress(export, status=DataExport.S_DONE, file=name, finished_at=timezone.now())
+    for _, part in export.progress["parts"]:
+        try:
+            storage.delete(part)
+        except FileNotFoundError:
+            pass
+
+def execute(export_id):
+    """
+    Claim and run (or resume) an export. A failing run goes back to pending
+    for resume_stalled() until MAX_ATTEMPTS, then stays failed; a worker
+    that dies mid-run leaves it running until its heartbeat goes stale.
+    """
+    if not claim(export_id):
+        return False
+    export = DataExport.objects.get(pk=export_id)
+    try:
+        run_export(export)
+    except Exception as exc:
+        logger.exception("data export %s failed (attempt %d)", export_id, export.attempts)
+        status = DataExport.S_FAILED if export.attempts >= MAX_ATTEMPTS else DataExport.S_PENDING
+        _save_progress(export, status=status, error=str(exc))
+        raise
+    return True
+
+def resume_stalled():
+    """
+    Export ids to (re)start: pending ones nobody picked up and running ones
+    whose worker stopped sending heartbeats.
+    """
+    cutoff = timezone.now() - STALE_AFTER
+    return list(DataExport.objects.filter(
+        Q(status=DataExport.S_PENDING, created_at__lt=cutoff)
+        | Q(status=DataExport.S_PENDING, attempts__gt=0)
+        | Q(status=DataExport.S_RUNNING, heartbeat_at__lt=cutoff)
+    ).values_list("pk", flat=True))
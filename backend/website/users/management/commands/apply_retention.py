@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.retention import CHUNK_SIZE, TARGETS, apply_retention
+
+
+class Command(BaseCommand):
+    help = "Archive and delete login history, audit log, token, backup-code and sent email rows past their retention policy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("policies", nargs="*", help=f"Policies to apply: {', '.join(TARGETS)} (default: all).")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would go.")
+
+    def handle(self, *args, **opts):
+        unknown = set(opts["policies"]) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown policies: {', '.join(sorted(unknown))}")
+        results = apply_retention(opts["policies"] or None, max(1, opts["chunk_size"]), opts["dry_run"])
+        verb = "would remove" if opts["dry_run"] else "removed"
+        for name, count in results.items():
+            if count is None:
+                self.stderr.write(f"{name}: skipped, RETENTION_ARCHIVE_DIR is not set")
+            else:
+                self.stdout.write(f"{name}: {verb} {count}")
+        self.stdout.write(self.style.SUCCESS(f"{sum(c or 0 for c in results.values())} rows in total"))
@@ -0,0 +1,53 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import User, TwoFactorDevice
+from users.serializers import LoginSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Time login credential checks per path (email, username, wrong password, unknown account) "
+            "against a throwaway user that is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        rounds = max(1, opts["rounds"])
+        try:
+            with transaction.atomic():
+                self._run(rounds)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, rounds):
+        tag = uuid.uuid4().hex[:12]
+        password = "bench-" + tag
+        user = User.objects.create_user(email=f"bench-{tag}@example.com", username=f"bench-{tag}", password=password)
+        paths = {
+            "email": (user.email, password),
+            "username": (user.username, password),
+            "wrong password": (user.email, password + "x"),
+            "unknown account": (f"nobody-{tag}@example.com", password),
+        }
+        for name, (ident, pw) in paths.items():
+            samples = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                ser = LoginSerializer(data={"email_or_username": ident, "password": pw})
+                if ser.is_valid():
+                    # what LoginView does next
+                    list(TwoFactorDevice.objects.filter(user=ser.validated_data["user"], confirmed=True))
+                samples.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{name:<16} median {statistics.median(samples):7.1f} ms   max {max(samples):7.1f} ms"
+            )
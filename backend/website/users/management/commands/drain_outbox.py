@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from users.outbox import BATCH_SIZE, drain_all
+
+
+class Command(BaseCommand):
+    help = "Send the due messages in the email outbox, one backend connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, default=50)
+
+    def handle(self, *args, **opts):
+        stats = drain_all(max(1, opts["batch_size"]), max(1, opts["max_batches"]))
+        self.stdout.write(f"retrying {stats['retrying']}, failed {stats['failed']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"sent {stats['sent']} in {stats['seconds']:.3f}s ({stats['per_second']:.1f}/s)"))
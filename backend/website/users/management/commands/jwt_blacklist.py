@@ -0,0 +1,40 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from users.blacklist import get_store, exp_timestamp
+
+CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = ("Trim expired entries from the refresh-token blacklist store. With --import-db, copy still-valid "
+            "revocations out of simplejwt's token_blacklist tables; with --purge-db, empty those tables.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--import-db", action="store_true", help="Copy unexpired blacklisted jtis into the store.")
+        parser.add_argument("--purge-db", action="store_true", help="Delete all outstanding/blacklisted token rows.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **opts):
+        if opts["import_db"] or opts["purge_db"]:
+            if not apps.is_installed("rest_framework_simplejwt.token_blacklist"):
+                raise CommandError("rest_framework_simplejwt.token_blacklist is not installed; there are no tables.")
+            from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+            chunk_size = max(1, opts["chunk_size"])
+            if opts["import_db"]:
+                store, copied = get_store(), 0
+                rows = (BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+                        .values_list("token__jti", "token__expires_at"))
+                for jti, expires_at in rows.iterator(chunk_size=chunk_size):
+                    store.add(jti, exp_timestamp(expires_at))
+                    copied += 1
+                self.stdout.write(f"Imported {copied} revoked tokens")
+            if opts["purge_db"]:
+                deleted = 0
+                while ids := list(OutstandingToken.objects.order_by("pk").values_list("pk", flat=True)[:chunk_size]):
+                    # cascades to BlacklistedToken
+                    deleted += OutstandingToken.objects.filter(pk__in=ids).delete()[1].get(OutstandingToken._meta.label, 0)
+                self.stdout.write(f"Deleted {deleted} outstanding token rows")
+
+        self.stdout.write(self.style.SUCCESS(f"Trimmed {get_store().purge()} expired blacklist entries"))
@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import User
+from .serializers import MeSerializer
+
+ME_TTL = 15 * 60
+
+
+def me_version_key(user_id):
+    return f"users:me:ver:{user_id}"
+
+def me_key(user_id, version):
+    return f"users:me:{user_id}:v{version}"
+
+def bump_me(user_id):
+    # old entries become unreachable and expire on their own TTL
+    key = me_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+def payload_etag(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+def render_me(user):
+    data = MeSerializer(user).data
+    return {"data": data, "etag": payload_etag(data)}
+
+def me_payload(user_id):
+    """
+    {"data", "etag"} of /users/me/ for a user, cached under a version that
+    User and Profile saves bump after commit.
+    """
+    key = me_key(user_id, cache.get(me_version_key(user_id)) or 1)
+    entry = cache.get(key)
+    if entry is None:
+        entry = render_me(User.objects.select_related("profile").get(pk=user_id))
+        cache.set(key, entry, ME_TTL)
+    return entry
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupcode',
+            name='lookup',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='backupcode',
+            name='code_hash',
+            field=models.CharField(max_length=128),
+        ),
+        migrations.AddIndex(
+            model_name='backupcode',
+            index=models.Index(fields=['user', 'lookup'], name='backupcode_lookup_idx'),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# login_history and audit_log are the big, write-hot tables: on PostgreSQL
+# their indexes are built and dropped CONCURRENTLY so logins aren't blocked
+# for the length of a build. Other databases (SQLite in development and
+# tests) take the plain path. Hence atomic = False below.
+
+class AddIndexOnline(migrations.AddIndex):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            from django.contrib.postgres.operations import AddIndexConcurrently
+            op = AddIndexConcurrently(self.model_name, self.index)
+            return op.database_forwards(app_label, schema_editor, from_state, to_state)
+        return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            from django.contrib.postgres.operations import AddIndexConcurrently
+            op = AddIndexConcurrently(self.model_name, self.index)
+            return op.database_backwards(app_label, schema_editor, from_state, to_state)
+        return super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class DropFKIndexOnline(migrations.AlterField):
+    """
+    AlterField to db_index=False. On PostgreSQL the column's single-column
+    index (named by Django when the FK was created) is found by introspection
+    and dropped with DROP INDEX CONCURRENTLY, which RemoveIndexConcurrently
+    can't do for an index that isn't in Meta.indexes.
+    """
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        connection = schema_editor.connection
+        if connection.vendor != "postgresql":
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        table, column = model._meta.db_table, model._meta.get_field(self.name).column
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        for name, info in constraints.items():
+            if info["columns"] == [column] and info["index"] and not (info["unique"] or info["primary_key"]):
+                schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0003_event_timestamps'),
+    ]
+
+    operations = [
+        # build the composites before the single-column FK indexes go
+        AddIndexOnline(
+            model_name='auditlog',
+            index=models.Index(fields=['user', '-timestamp'], name='auditlog_user_ts_idx'),
+        ),
+        AddIndexOnline(
+            model_name='auditlog',
+            index=models.Index(fields=['target_user', '-timestamp'], name='auditlog_target_ts_idx'),
+        ),
+        AddIndexOnline(
+            model_name='auditlog',
+            index=models.Index(fields=['action', '-timestamp'], name='auditlog_action_ts_idx'),
+        ),
+        AddIndexOnline(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp'], name='auditlog_ts_idx'),
+        ),
+        AddIndexOnline(
+            model_name='loginhistory',
+            index=models.Index(fields=['user', '-timestamp'], name='loginhistory_user_ts_idx'),
+        ),
+        AddIndexOnline(
+            model_name='loginhistory',
+            index=models.Index(fields=['-timestamp'], name='loginhistory_ts_idx'),
+        ),
+        DropFKIndexOnline(
+            model_name='auditlog',
+            name='target_user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='subject_logs', to=settings.AUTH_USER_MODEL),
+        ),
+        DropFKIndexOnline(
+            model_name='auditlog',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='actor_logs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='emailverificationtoken',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        DropFKIndexOnline(
+            model_name='loginhistory',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='login_history', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
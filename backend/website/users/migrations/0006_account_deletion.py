@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_data_export'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action',
+            field=models.CharField(choices=[('password_change', 'Password Change'), ('password_reset', 'Password Reset'), ('email_change', 'Email Change'), ('email_verify', 'Email Verify'), ('role_assigned', 'Role Assigned'), ('role_revoked', 'Role Revoked'), ('2fa_enabled', '2FA Enabled'), ('2fa_disabled', '2FA Disabled'), ('login_failed', 'Login Failed'), ('login_success', 'Login Success'), ('export_requested', 'Export Requested'), ('delete_requested', 'Delete Requested'), ('account_purged', 'Account Purged')], max_length=64),
+        ),
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.UUIDField(unique=True)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('purging', 'Purging'), ('done', 'Done'), ('cancelled', 'Cancelled')], default='scheduled', max_length=16)),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('purge_after', models.DateTimeField()),
+                ('step', models.CharField(blank=True, default='', max_length=32)),
+                ('progress', models.JSONField(blank=True, default=dict)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'purge_after'], name='accountdeletion_due_idx')],
+            },
+        ),
+    ]
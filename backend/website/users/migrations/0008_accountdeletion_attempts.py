@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountdeletion',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='accountdeletion',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='accountdeletion',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('purging', 'Purging'), ('done', 'Done'), ('cancelled', 'Cancelled'), ('failed', 'Failed')], default='scheduled', max_length=16),
+        ),
+    ]
@@ -1,13 +1,16 @@
 # users/models.py
+import secrets
 import uuid
 from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.base_user import AbstractBaseUser
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import PermissionsMixin, Permission
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
 
 # ---- User Manager ----
 from django.contrib.auth.models import BaseUserManager
@@ -101,8 +104,9 @@ class Profile(models.Model):
 
 
 class LoginHistory(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="login_history")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # indexed through (user, -timestamp)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="login_history", db_index=False)
+    timestamp = models.DateTimeField(default=timezone.now)  # set when the event happens, not when it's written
     ip_address = models.CharField(max_length=64, null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
     successful = models.BooleanField(default=False)
@@ -110,6 +114,11 @@ class LoginHistory(models.Model):
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["user", "-timestamp"], name="loginhistory_user_ts_idx"),
+            # admin changelist and retention cutoff
+            models.Index(fields=["-timestamp"], name="loginhistory_ts_idx"),
+        ]
 
 
 class AuditLog(models.Model):
@@ -126,21 +135,31 @@ class AuditLog(models.Model):
         ("login_success", "Login Success"),
         ("export_requested", "Export Requested"),
         ("delete_requested", "Delete Requested"),
+        ("account_purged", "Account Purged"),
     ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="actor_logs")
-    target_user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="subject_logs")
+    # both indexed through their (fk, -timestamp) composites
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="actor_logs", db_index=False)
+    target_user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="subject_logs", db_index=False)
     action = models.CharField(max_length=64, choices=ACTION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)  # set when the event happens, not when it's written
     ip_address = models.CharField(max_length=64, null=True, blank=True)
     details = models.JSONField(default=dict, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-timestamp"], name="auditlog_user_ts_idx"),
+            models.Index(fields=["target_user", "-timestamp"], name="auditlog_target_ts_idx"),
+            models.Index(fields=["action", "-timestamp"], name="auditlog_action_ts_idx"),
+            models.Index(fields=["-timestamp"], name="auditlog_ts_idx"),
+        ]
+
 
 class EmailVerificationToken(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     token = models.CharField(max_length=64, unique=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
 
     @classmethod
     def create_for(cls, user, ttl_minutes=60):
@@ -169,7 +188,150 @@ class TwoFactorDevice(models.Model):
 
 
 class BackupCode(models.Model):
+    LOOKUP_SALT = "users.BackupCode.lookup"
+    LOOKUP_LENGTH = 16
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="backup_codes")
-    code_hash = models.CharField(max_length=128, db_index=True)  # store hashed code
+    # keyed HMAC of the code; legacy rows hold a PBKDF2 hash and an empty lookup
+    code_hash = models.CharField(max_length=128)
+    lookup = models.CharField(max_length=LOOKUP_LENGTH, blank=True, default="")
     used = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "lookup"], name="backupcode_lookup_idx")]
+
+    @classmethod
+    def digest(cls, user_id, code):
+        # salted_hmac keys with SECRET_KEY; binding the user keeps equal codes apart
+        return salted_hmac(cls.LOOKUP_SALT, f"{user_id}:{code.strip()}", algorithm="sha256").hexdigest()
+
+    @classmethod
+    def issue(cls, user, count=10):
+        """
+        Replace the user's codes with `count` fresh ones in one INSERT.
+        Returns the plain codes; only their digests are stored.
+        """
+        codes = [secrets.token_urlsafe(6) for _ in range(count)]
+        rows = []
+        for code in codes:
+            digest = cls.digest(user.pk, code)
+            rows.append(cls(user=user, code_hash=digest, lookup=digest[:cls.LOOKUP_LENGTH]))
+        with transaction.atomic():
+            cls.objects.filter(user=user).delete()
+            cls.objects.bulk_create(rows)
+        return codes
+
+    @classmethod
+    def consume(cls, user, code):
+        """
+        Spend a backup code: one indexed lookup and a constant-time compare.
+        Codes issued before lookups existed fall back to PBKDF2, and only
+        while the user still has some. Returns True if the code was valid
+        and unused.
+        """
+        if not code or not code.strip():
+            return False
+        digest = cls.digest(user.pk, code)
+        for row in cls.objects.filter(user=user, lookup=digest[:cls.LOOKUP_LENGTH], used=False):
+            if constant_time_compare(row.code_hash, digest):
+                return cls._spend(row)
+        for row in cls.objects.filter(user=user, lookup="", used=False):
+            if check_password(code.strip(), row.code_hash):
+                return cls._spend(row)
+        return False
+
+    @classmethod
+    def _spend(cls, row):
+        # conditional update so two logins can't spend the same code
+        return cls.objects.filter(pk=row.pk, used=False).update(used=True) == 1
+
+
+class DataExport(models.Model):
+    """
+    A personal data export (users.exports). `progress` is the resume point:
+    current section, last primary key written and the parts stored so far.
+    """
+    S_PENDING = "pending"
+    S_RUNNING = "running"
+    S_DONE = "done"
+    S_FAILED = "failed"
+    STATUS_CHOICES = [(S_PENDING, "Pending"), (S_RUNNING, "Running"), (S_DONE, "Done"), (S_FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="data_exports")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=S_PENDING, db_index=True)
+    file = models.CharField(max_length=255, blank=True, default="")  # name in the "exports" storage
+    progress = models.JSONField(default=dict, blank=True)
+    rows = models.PositiveBigIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class AccountDeletion(models.Model):
+    """
+    A requested account deletion, purged by users.deletion once
+    `purge_after` passes. Keyed by user id rather than a foreign key so the
+    record outlives the account; `step` and `progress` say how far the purge got.
+    """
+    S_SCHEDULED = "scheduled"
+    S_PURGING = "purging"
+    S_DONE = "done"
+    S_CANCELLED = "cancelled"
+    S_FAILED = "failed"
+    STATUS_CHOICES = [(S_SCHEDULED, "Scheduled"), (S_PURGING, "Purging"), (S_DONE, "Done"), (S_CANCELLED, "Cancelled"),
+                      (S_FAILED, "Failed")]
+
+    user_id = models.UUIDField(unique=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=S_SCHEDULED)
+    requested_at = models.DateTimeField(default=timezone.now)
+    purge_after = models.DateTimeField()
+    step = models.CharField(max_length=32, blank=True, default="")
+    progress = models.JSONField(default=dict, blank=True)  # rows handled per step
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "purge_after"], name="accountdeletion_due_idx")]
+
+
+class OutboundEmail(models.Model):
+    """
+    Transactional email outbox (users.outbox): rows are written with the
+    change that triggers them and sent by a drainer. At most one pending
+    message per `dedupe_key`, e.g. one verification mail per recipient.
+    """
+    S_PENDING = "pending"
+    S_SENDING = "sending"
+    S_SENT = "sent"
+    S_FAILED = "failed"
+    STATUS_CHOICES = [(S_PENDING, "Pending"), (S_SENDING, "Sending"), (S_SENT, "Sent"), (S_FAILED, "Failed")]
+
+    kind = models.CharField(max_length=32)
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True, default="")
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    dedupe_key = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=S_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx")]
+        constraints = [
+            models.UniqueConstraint(fields=["dedupe_key"], condition=models.Q(status="pending"),
+                                    name="outbox_pending_dedupe"),
+        ]
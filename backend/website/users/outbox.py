@@ -0,0 +1,142 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30  # seconds before the first retry, doubled after each failure
+BACKOFF_MAX = 60 * 60
+LEASE = timedelta(minutes=10)  # a claimed batch older than this belongs to a dead worker
+
+
+def enqueue(kind, to_email, subject, body):
+    """
+    Queue a message in the current transaction and have a worker send it
+    once that commits. While one of the same kind to the same address is
+    still pending it's replaced, so a recipient gets the latest one only.
+    """
+    msg, _ = OutboundEmail.objects.update_or_create(
+        dedupe_key=f"{kind}:{to_email.lower()}", status=OutboundEmail.S_PENDING,
+        defaults={"kind": kind, "to_email": to_email, "subject": subject, "body": body,
+                  "from_email": settings.DEFAULT_FROM_EMAIL, "next_attempt_at": timezone.now()},
+    )
+    from .tasks import drain_outbox
+    transaction.on_commit(drain_outbox.delay)
+    return msg
+
+def enqueue_verification(user, token):
+    url = f"{settings.FRONTEND_BASE_URL}/verify-email?token={token}"
+    return enqueue("verify_email", user.email, "Verify your email", f"Click to verify: {url}")
+
+def enqueue_password_reset(user, token):
+    url = f"{settings.FRONTEND_BASE_URL}/reset-password?uid={user.id}&token={token}"
+    return enqueue("password_reset", user.email, "Password reset", f"Reset link: {url}")
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)))
+
+def claim(batch_size=BATCH_SIZE):
+    """
+    Lease up to `batch_size` due messages to this worker: pending ones past
+    next_attempt_at, and sending ones whose lease ran out. Rows another
+    worker is claiming right now are skipped, not waited for.
+    """
+    now = timezone.now()
+    due = Q(status=OutboundEmail.S_PENDING, next_attempt_at__lte=now) | Q(
+        status=OutboundEmail.S_SENDING, claimed_at__lt=now - LEASE)
+    with transaction.atomic():
+        ids = list(OutboundEmail.objects.select_for_update(skip_locked=True).filter(due)
+                   .order_by("next_attempt_at").values_list("pk", flat=True)[:batch_size])
+        OutboundEmail.objects.filter(pk__in=ids).update(
+            status=OutboundEmail.S_SENDING, claimed_at=now, attempts=F("attempts") + 1)
+    return list(OutboundEmail.objects.filter(pk__in=ids).order_by("next_attempt_at"))
+
+def send_batch(messages):
+    """
+    Send through one backend connection; a failure only costs that message
+    (and a reconnect). Returns (sent, failed) with failed as (row, error).
+    """
+    sent, failed = [], []
+    connection = get_connection(fail_silently=False)
+    try:
+        for msg in messages:
+            email = EmailMessage(msg.subject, msg.body, msg.from_email or None, [msg.to_email],
+                                 connection=connection)
+            try:
+                email.send()
+            except Exception as exc:
+                failed.append((msg, exc))
+                connection.close()  # reopened by the next send
+            else:
+                sent.append(msg)
+    finally:
+        connection.close()
+    return sent, failed
+
+def drain(batch_size=BATCH_SIZE):
+    """
+    Claim and send one batch, then record the outcome in two statements.
+    Failed messages go back to pending with exponential backoff, or to
+    failed after MAX_ATTEMPTS. Bodies carry live links, so they're blanked
+    once a message is done; the rows go with the "outbox" retention policy.
+    Returns counts and throughput.
+    """
+    messages = claim(batch_size)
+    if not messages:
+        return {"sent": 0, "failed": 0, "retrying": 0, "seconds": 0.0, "per_second": 0.0}
+    started = time.monotonic()
+    sent, failed = send_batch(messages)
+    elapsed = time.monotonic() - started
+
+    now = timezone.now()
+    OutboundEmail.objects.filter(pk__in=[msg.pk for msg in sent]).update(
+        status=OutboundEmail.S_SENT, sent_at=now, last_error="", body="")
+    for msg, exc in failed:
+        msg.last_error = f"{type(exc).__name__}: {exc}"[:1000]
+        if msg.attempts >= MAX_ATTEMPTS:
+            msg.status = OutboundEmail.S_FAILED
+            msg.body = ""
+            logger.error("giving up on email %s to %s after %d attempts: %s",
+                         msg.pk, msg.to_email, msg.attempts, msg.last_error)
+        else:
+            msg.status = OutboundEmail.S_PENDING
+            msg.next_attempt_at = now + backoff(msg.attempts)
+    if failed:
+        OutboundEmail.objects.bulk_update([msg for msg, _ in failed],
+                                          ["status", "next_attempt_at", "last_error", "body"])
+
+    stats = {
+        "sent": len(sent),
+        "failed": sum(msg.status == OutboundEmail.S_FAILED for msg, _ in failed),
+        "retrying": sum(msg.status == OutboundEmail.S_PENDING for msg, _ in failed),
+        "seconds": round(elapsed, 3),
+        "per_second": round(len(sent) / elapsed, 1) if elapsed else float(len(sent)),
+    }
+    logger.info("email outbox: sent %(sent)d, retrying %(retrying)d, failed %(failed)d "
+                "in %(seconds).3fs (%(per_second).1f/s)", stats)
+    return stats
+
+def drain_all(batch_size=BATCH_SIZE, max_batches=50):
+    """
+    drain() until nothing is due (or `max_batches`); totals across batches.
+    """
+    totals = {"sent": 0, "failed": 0, "retrying": 0, "seconds": 0.0}
+    for _ in range(max_batches):
+        stats = drain(batch_size)
+        for key in totals:
+            totals[key] += stats[key]
+        if stats["sent"] + stats["failed"] + stats["retrying"] < batch_size:
+            break
+    totals["per_second"] = round(totals["sent"] / totals["seconds"], 1) if totals["seconds"] else float(totals["sent"])
+    return totals
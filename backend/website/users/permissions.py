@@ -1,7 +1,10 @@
 # users/permissions.py
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+from .authz import ADMIN_ROLES, has_role
+
 class IsAdminUserRole(BasePermission):
     def has_permission(self, request, view):
         u = request.user
-        return bool(u and u.is_authenticated and (u.is_staff or u.roles.filter(name__in=["staff","admin","moderator"]).exists()))
+        # role names come from the cached authz context, not a query
+        return bool(u and u.is_authenticated and (u.is_staff or has_role(u, ADMIN_ROLES)))
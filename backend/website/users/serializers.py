@@ -46,7 +46,8 @@ class LoginSerializer(serializers.Serializer):
     def validate(self, attrs):
         ident = attrs["email_or_username"]
         password = attrs["password"]
-        user = authenticate(email=ident, password=password) or authenticate(username=ident, password=password)
+        # one backend call: users.backends.EmailOrUsernameBackend resolves either
+        user = authenticate(self.context.get("request"), username=ident, password=password)
         if not user:
             raise serializers.ValidationError("Invalid credentials")
         attrs["user"] = user
@@ -60,13 +61,60 @@ class MeSerializer(serializers.ModelSerializer):
         fields = ["id","email","username","first_name","last_name","email_verified","phone_number","profile"]
 
     def update(self, instance, validated_data):
+        # only the columns that actually changed are written
         prof_data = validated_data.pop("profile", None)
-        for k, v in validated_data.items():
-            setattr(instance, k, v)
-        instance.save()
+        changed = [k for k, v in validated_data.items() if getattr(instance, k) != v]
+        for k in changed:
+            setattr(instance, k, validated_data[k])
+        if changed:
+            instance.save(update_fields=changed + ["updated_at"])
         if prof_data:
-            prof, _ = Profile.objects.get_or_create(user=instance)
-            for k, v in prof_data.items():
-                setattr(prof, k, v)
-            prof.save()
+            prof = Profile.objects.filter(user=instance).first()
+            if prof is None:
+                prof = Profile.objects.create(user=instance, **prof_data)
+            else:
+                changed = [k for k, v in prof_data.items() if getattr(prof, k) != v]
+                for k in changed:
+                    setattr(prof, k, prof_data[k])
+                if changed:
+                    prof.save(update_fields=changed)
+            instance.profile = prof
         return instance
+
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        """
+        simplejwt's refresh, with revocation checked against
+        users.blacklist instead of the token_blacklist tables and the user
+        read from the cached authz context.
+        """
+        from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from .authz import get_context
+        from .blacklist import get_store
+
+        try:
+            refresh = RefreshToken(attrs["refresh"])
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        store = get_store()
+        if store.is_revoked(refresh):
+            raise InvalidToken("Token is blacklisted")
+        ctx = get_context(refresh[api_settings.USER_ID_CLAIM])
+        if ctx is None or not ctx["fields"]["is_active"]:
+            raise InvalidToken("No active account found for the given token.")
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # the check above is only a fast path: revoke() is the atomic
+            # test-and-set, so of two concurrent refreshes only one rotates
+            if api_settings.BLACKLIST_AFTER_ROTATION and not store.revoke(refresh):
+                raise InvalidToken("Token is blacklisted")
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
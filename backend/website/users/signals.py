@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .authz import bump_user, bump_roles
+from .me import bump_me
+from .models import User, Role, Profile
+
+
+# Authorization contexts (users.authz) are retired after commit, so a
+# concurrent rebuild can't cache the pre-commit state under the new version.
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def retire_user_context(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: bump_user(pk))
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def retire_me_payload(sender, instance, **kwargs):
+    pk = instance.user_id if sender is Profile else instance.pk
+    transaction.on_commit(lambda: bump_me(pk))
+
+@receiver(m2m_changed, sender=User.roles.through)
+def retire_on_role_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        pk = instance.pk
+        transaction.on_commit(lambda: bump_user(pk))
+    elif pk_set:
+        # role.users.add/remove(...): the users are listed
+        ids = list(pk_set)
+        transaction.on_commit(lambda: [bump_user(pk) for pk in ids])
+    else:
+        # role.users.clear(): members unknown by now
+        transaction.on_commit(bump_roles)
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def retire_on_role_permissions(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(bump_roles)
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def retire_on_role_change(sender, **kwargs):
+    transaction.on_commit(bump_roles)
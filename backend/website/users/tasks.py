@@ -1,78 +1,84 @@
 # users/tasks.py
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
 from django.urls import reverse
-from django.contrib.auth.hashers import make_password
 import json, csv, io
 from django.utils import timezone
-from .models import User, EmailVerificationToken, BackupCode, AuditLog
+from .audit import log_action, get_sink
+from .models import User, EmailVerificationToken, BackupCode, DataExport
 
 @shared_task
 def send_email_verification(user_id, token):
-    user = User.objects.get(id=user_id)
-    url = f"{settings.FRONTEND_BASE_URL}/verify-email?token={token}"
-    send_mail(
-        "Verify your email",
-        f"Click to verify: {url}",
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        fail_silently=True,
-    )
+    # kept for callers; mail now goes through the outbox (users.outbox)
+    from .outbox import enqueue_verification
+    enqueue_verification(User.objects.get(id=user_id), token)
 
 @shared_task
 def send_password_reset(user_id, token):
-    user = User.objects.get(id=user_id)
-    url = f"{settings.FRONTEND_BASE_URL}/reset-password?uid={user.id}&token={token}"
-    send_mail(
-        "Password reset",
-        f"Reset link: {url}",
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        fail_silently=True,
-    )
+    from .outbox import enqueue_password_reset
+    enqueue_password_reset(User.objects.get(id=user_id), token)
+
+@shared_task
+def drain_outbox(batch_size=100):
+    from .outbox import drain_all
+    return drain_all(batch_size)
 
 @shared_task
 def generate_backup_codes(user_id, count=10):
-    import secrets
     user = User.objects.get(id=user_id)
-    BackupCode.objects.filter(user=user).delete()
-    codes = []
-    for _ in range(count):
-        code = secrets.token_urlsafe(6)
-        BackupCode.objects.create(user=user, code_hash=make_password(code))
-        codes.append(code)
-    AuditLog.objects.create(user=user, action="2fa_enabled", details={"backup_codes": count})
+    codes = BackupCode.issue(user, count)
+    log_action("2fa_enabled", user=user, details={"backup_codes": count})
     return codes  # return plain codes to caller (never store plaintext)
 
 @shared_task
 def export_user_data(user_id):
-    user = User.objects.get(id=user_id)
-    data = {
-        "user": {
-            "id": str(user.id),
-            "email": user.email,
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "created_at": user.created_at.isoformat(),
-        },
-        "profile": getattr(user, "profile", None) and {
-            "bio": user.profile.bio,
-            "location": user.profile.location,
-            "timezone": user.profile.timezone,
-            "language": user.profile.language,
-            "preferences": user.profile.preferences,
-            "privacy_settings": user.profile.privacy_settings,
-        },
-    }
-    # Save to storage; here we just return JSON string (replace with S3 upload)
-    return json.dumps(data)
+    # entry point kept for callers; the work happens in run_data_export
+    export = DataExport.objects.create(user_id=user_id)
+    run_data_export.delay(str(export.pk))
+    return str(export.pk)
+
+@shared_task(acks_late=True)
+def run_data_export(export_id):
+    from .exports import execute
+    return execute(export_id)
+
+@shared_task
+def resume_data_exports():
+    from .exports import resume_stalled
+    ids = resume_stalled()
+    for pk in ids:
+        run_data_export.delay(str(pk))
+    return len(ids)
 
 @shared_task
 def schedule_account_deletion(user_id, delay_days=30):
-    # In real systems, mark as pending and a periodic task purges after grace period.
-    user = User.objects.get(id=user_id)
-    user.is_active = False
-    user.save(update_fields=["is_active"])
-    AuditLog.objects.create(user=user, action="delete_requested", details={"grace_days": delay_days})
+    # deactivated now, purged by purge_deleted_accounts once the grace period is over
+    from .deletion import schedule
+    schedule(User.objects.get(id=user_id), grace_days=delay_days)
+
+@shared_task
+def purge_deleted_accounts(limit=20):
+    from .deletion import due_deletions, purge_account
+    purged = 0
+    for pk in due_deletions(limit):
+        try:
+            purged += purge_account(pk)
+        except Exception:
+            pass  # logged and recorded on the AccountDeletion; the others still run
+    return purged
+
+@shared_task
+def purge_jwt_blacklist():
+    # trims expired entries from RedisBlacklistStore's revocation log
+    from .blacklist import get_store
+    return get_store().purge()
+
+@shared_task
+def flush_audit_events():
+    # drains queued sinks (RedisAuditSink); a no-op for the others
+    return get_sink().flush()
+
+@shared_task
+def apply_retention_policies():
+    from .retention import apply_retention
+    return apply_retention()
@@ -1,4 +1,5 @@
 # users/tests.py
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from users.models import User
@@ -24,5 +25,476 @@ class AuthFlowTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tok}")
         r2 = self.client.patch("/api/v1/users/me/", {"first_name":"Shehran","profile":{"language":"en","timezone":"Asia/Karachi"}} , format="json")
         self.assertEqual(r2.status_code, 200)
-        self.assertEqual(r2.data["first_name"], "mediadunes")
+        self.assertEqual(r2.data["first_name"], "Shehran")
         self.assertEqual(r2.data["profile"]["timezone"], "Asia/Karachi")
+
+
+class BackupCodeTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="e@f.com", password="S3curePass!")
+
+    def test_issue_and_consume(self):
+        from users.models import BackupCode
+        with self.assertNumQueries(4):  # savepoint, delete, insert, release
+            codes = BackupCode.issue(self.user, 5)
+        self.assertEqual(BackupCode.objects.filter(user=self.user).count(), 5)
+        self.assertFalse(BackupCode.objects.filter(code_hash=codes[0]).exists())
+        self.assertFalse(BackupCode.consume(self.user, "nope"))
+        self.assertTrue(BackupCode.consume(self.user, codes[0]))
+        self.assertFalse(BackupCode.consume(self.user, codes[0]))
+        other = User.objects.create_user(email="g@h.com", password="S3curePass!")
+        self.assertFalse(BackupCode.consume(other, codes[1]))
+
+    def test_legacy_hash_still_accepted(self):
+        from django.contrib.auth.hashers import make_password
+        from users.models import BackupCode
+        BackupCode.objects.create(user=self.user, code_hash=make_password("old-code"))
+        self.assertTrue(BackupCode.consume(self.user, "old-code"))
+        self.assertFalse(BackupCode.consume(self.user, "old-code"))
+
+
+class EmailOrUsernameBackendTests(APITestCase):
+    def setUp(self):
+        # the global anon throttles count logins too
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_login_by_username_and_email(self):
+        User.objects.create_user(email="i@j.com", username="ij", password="S3curePass!")
+        for ident in ("i@j.com", "ij"):
+            r = self.client.post("/api/v1/auth/login/", {"email_or_username": ident, "password": "S3curePass!"})
+            self.assertEqual(r.status_code, 200, ident)
+        r = self.client.post("/api/v1/auth/login/", {"email_or_username": "ij", "password": "wrong"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_unknown_account_hashes_once(self):
+        from unittest import mock
+        from django.contrib.auth import authenticate
+        from django.contrib.auth.hashers import PBKDF2PasswordHasher
+        with mock.patch.object(PBKDF2PasswordHasher, "encode", wraps=PBKDF2PasswordHasher().encode) as enc:
+            with self.assertNumQueries(1):
+                self.assertIsNone(authenticate(None, username="ghost@x.com", password="whatever"))
+        self.assertEqual(enc.call_count, 1)
+
+
+class AuditSinkTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(email="k@l.com", password="S3curePass!")
+
+    def test_login_events_written_after_commit(self):
+        from users.models import AuditLog, LoginHistory
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post("/api/v1/auth/login/", {"email_or_username": "k@l.com", "password": "S3curePass!"})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(LoginHistory.objects.filter(user=self.user, successful=True).exists())
+        self.assertTrue(AuditLog.objects.filter(user=self.user, action="login_success").exists())
+
+    def test_thread_sink_batches_and_applies_back_pressure(self):
+        from unittest import mock
+        from django.utils import timezone
+        from users.audit import ThreadAuditSink
+        from users.models import AuditLog
+        sink = ThreadAuditSink(MAX_PENDING=3, BLOCK_TIMEOUT=0)
+        self.addCleanup(sink.stopping.set)
+        event = {"kind": "audit", "action": "email_verify", "user_id": self.user.pk, "timestamp": timezone.now()}
+        with mock.patch.object(sink, "_ensure_started"):
+            for _ in range(4):
+                sink.emit(dict(event))
+        # the queue holds three; the fourth caller wrote its own
+        self.assertEqual(AuditLog.objects.count(), 1)
+        with self.assertNumQueries(3):  # savepoint, one INSERT, release
+            self.assertEqual(sink.flush(), 3)
+        self.assertEqual(AuditLog.objects.count(), 4)
+
+
+class RetentionTests(APITestCase):
+    def test_old_rows_archived_and_deleted_in_chunks(self):
+        import gzip, json, os, tempfile
+        from datetime import timedelta
+        from django.test import override_settings
+        from django.utils import timezone
+        from users.models import LoginHistory, BackupCode
+        from users.retention import apply_retention
+        user = User.objects.create_user(email="m@n.com", password="S3curePass!")
+        old = timezone.now() - timedelta(days=400)
+        LoginHistory.objects.bulk_create([LoginHistory(user=user, timestamp=old, successful=True) for _ in range(5)])
+        LoginHistory.objects.create(user=user, successful=True)
+        BackupCode.objects.create(user=user, code_hash="x", used=True)
+        with tempfile.TemporaryDirectory() as root, override_settings(RETENTION_ARCHIVE_DIR=root):
+            self.assertEqual(apply_retention(["login_history"], dry_run=True), {"login_history": 5})
+            self.assertEqual(apply_retention(["login_history", "backup_codes"], chunk_size=2),
+                             {"login_history": 5, "backup_codes": 0})
+            with gzip.open(os.path.join(root, "login_history", old.strftime("%Y-%m") + ".ndjson.gz"), "rt") as fh:
+                archived = [json.loads(line) for line in fh]
+        self.assertEqual(len(archived), 5)
+        self.assertEqual(LoginHistory.objects.count(), 1)
+        self.assertEqual(BackupCode.objects.count(), 1)
+
+        # no archive directory: archiving policies are skipped, the rest still run
+        BackupCode.objects.update(created_at=old)
+        with override_settings(RETENTION_ARCHIVE_DIR=None):
+            self.assertEqual(apply_retention(["login_history", "backup_codes"]),
+                             {"login_history": None, "backup_codes": 1})
+
+    def test_admin_changelists(self):
+        admin = User.objects.create_superuser(email="admin@n.com", password="S3curePass!")
+        self.client.force_login(admin)
+        for model in ("loginhistory", "auditlog", "backupcode", "emailverificationtoken"):
+            r = self.client.get(f"/admin/users/{model}/?q=admin@n.com")
+            self.assertEqual(r.status_code, 200, model)
+
+
+class AuthzContextTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(email="o@p.com", password="S3curePass!")
+
+    def _authenticate(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_warm_context_needs_no_queries(self):
+        from users.authz import get_context, has_role
+        from users.models import Role
+        self._authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.roles.add(Role.objects.create(name="moderator"))
+        self.assertEqual(get_context(self.user.pk)["roles"], ["moderator"])
+        r = self.client.get("/api/v1/users/me/")
+        self.assertEqual(r.status_code, 200)
+        with self.assertNumQueries(0):
+            from users.authentication import CachedJWTAuthentication
+            from rest_framework_simplejwt.tokens import AccessToken
+            user = CachedJWTAuthentication().get_user(AccessToken.for_user(self.user))
+            self.assertTrue(has_role(user, ["moderator"]))
+
+    def test_changes_retire_the_context(self):
+        from users.authz import get_context
+        from users.models import Role
+        role = Role.objects.create(name="editor")
+        self.assertEqual(get_context(self.user.pk)["roles"], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            role.users.add(self.user)
+        self.assertEqual(get_context(self.user.pk)["roles"], ["editor"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertFalse(get_context(self.user.pk)["fields"]["is_active"])
+        self._authenticate()
+        self.assertEqual(self.client.get("/api/v1/users/me/").status_code, 401)
+
+
+class RefreshBlacklistTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(email="q@r.com", password="S3curePass!")
+
+    def test_rotation_and_logout_revoke_refresh_tokens(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        first = str(RefreshToken.for_user(self.user))
+        r = self.client.post("/api/v1/auth/refresh/", {"refresh": first})
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("access", r.data)
+        # rotated: the old token is spent
+        self.assertEqual(self.client.post("/api/v1/auth/refresh/", {"refresh": first}).status_code, 401)
+
+        second = r.data["refresh"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {r.data['access']}")
+        self.assertEqual(self.client.post("/api/v1/auth/logout/", {"refresh": second}).status_code, 204)
+        self.client.credentials()
+        self.assertEqual(self.client.post("/api/v1/auth/refresh/", {"refresh": second}).status_code, 401)
+
+    def test_concurrent_refresh_rotates_once(self):
+        from unittest import mock
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.blacklist import CacheBlacklistStore
+        token = str(RefreshToken.for_user(self.user))
+        # both requests pass the fast check, as with a lagging Bloom filter
+        with mock.patch.object(CacheBlacklistStore, "contains", return_value=False):
+            codes = [self.client.post("/api/v1/auth/refresh/", {"refresh": token}).status_code for _ in range(2)]
+        self.assertEqual(codes, [200, 401])
+
+    def test_bloom_filter(self):
+        from users.blacklist import BloomFilter
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+        self.assertTrue(bloom.full)
+
+
+class MeEndpointTests(APITestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.models import Profile
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(email="s@t.com", password="S3curePass!")
+        Profile.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_cached_payload_and_conditional_get(self):
+        r = self.client.get("/api/v1/users/me/")
+        self.assertEqual(r.status_code, 200)
+        etag = r["ETag"]
+        with self.assertNumQueries(0):
+            again = self.client.get("/api/v1/users/me/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.patch("/api/v1/users/me/", {"profile": {"bio": "hi"}}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        fresh = self.client.get("/api/v1/users/me/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.data["profile"]["bio"], "hi")
+        self.assertEqual(fresh["ETag"], r["ETag"])
+
+    def test_stale_if_match_is_rejected(self):
+        etag = self.client.get("/api/v1/users/me/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch("/api/v1/users/me/", {"first_name": "A"}, format="json", HTTP_IF_MATCH=etag)
+        r = self.client.patch("/api/v1/users/me/", {"first_name": "B"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(r.status_code, 412)
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, "A")
+
+    def test_only_changed_columns_written(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch("/api/v1/users/me/", {"first_name": "C", "last_name": ""}, format="json")
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"first_name"', updates[0])
+        self.assertNotIn('"last_name"', updates[0])
+        self.assertNotIn('"email"', updates[0])
+
+
+class DataExportTests(APITestCase):
+    def setUp(self):
+        import shutil, tempfile
+        from django.test import override_settings
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        storages = {
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            "exports": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": root}},
+        }
+        self.enterContext(override_settings(STORAGES=storages))
+        self.user = User.objects.create_user(email="u@v.com", password="S3curePass!")
+
+    def _archive(self, export):
+        import json, zipfile
+        from users.exports import get_storage
+        with get_storage().open(export.file, "rb") as fh, zipfile.ZipFile(fh) as zf:
+            return {name[:-len(".ndjson")]: [json.loads(l) for l in zf.read(name).splitlines()] for name in zf.namelist()}
+
+    def test_export_resumes_after_a_crash(self):
+        from unittest import mock
+        from blogs.models import Post
+        from users.models import DataExport, LoginHistory
+        from users import exports
+        LoginHistory.objects.bulk_create([LoginHistory(user=self.user, successful=True) for _ in range(7)])
+        Post.objects.create(title="Mine", slug="mine", summary="s", content="<p>c</p>", author=self.user)
+        export = DataExport.objects.create(user=self.user)
+
+        real_store, calls = exports._store_part, []
+        def crash_on_fourth(*args):
+            calls.append(1)
+            if len(calls) == 4:
+                raise OSError("disk went away")
+            return real_store(*args)
+
+        with mock.patch.object(exports, "PART_ROWS", 2):
+            with mock.patch.object(exports, "_store_part", crash_on_fourth), self.assertRaises(OSError), \
+                    self.assertLogs("users.exports", "ERROR"):
+                exports.execute(export.pk)
+            export.refresh_from_db()
+            self.assertEqual(export.status, DataExport.S_PENDING)
+            done_parts = len(export.progress["parts"])
+            self.assertTrue(done_parts)
+            self.assertTrue(exports.execute(export.pk))
+
+        export.refresh_from_db()
+        self.assertEqual(export.status, DataExport.S_DONE)
+        self.assertEqual(export.attempts, 2)
+        archive = self._archive(export)
+        self.assertEqual(archive["account"][0]["email"], "u@v.com")
+        self.assertNotIn("password", archive["account"][0])
+        self.assertEqual([p["slug"] for p in archive["posts"]], ["mine"])
+        self.assertEqual(len(archive["login_history"]), 7)
+        self.assertEqual(export.rows, 1 + 1 + 7)
+
+    def test_stale_export_fails_after_max_attempts(self):
+        from users.models import DataExport
+        from users import exports
+        export = DataExport.objects.create(user=self.user, status=DataExport.S_RUNNING,
+                                           attempts=exports.MAX_ATTEMPTS, heartbeat_at=None)
+        self.assertFalse(exports.execute(export.pk))
+        export.refresh_from_db()
+        self.assertEqual(export.status, DataExport.S_FAILED)
+        self.assertNotIn(export.pk, exports.resume_stalled())
+
+    def test_request_via_api(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post("/api/v1/users/me/export/")
+        self.assertEqual(r.status_code, 202)
+        listing = self.client.get("/api/v1/users/me/export/")
+        self.assertEqual(listing.data[0]["status"], "done")
+
+        res = self.client.get(listing.data[0]["download"])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "application/zip")
+        self.assertEqual(b"".join(res.streaming_content)[:2], b"PK")
+        other = User.objects.create_user(email="o@v.com", password="S3curePass!")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}")
+        self.assertEqual(self.client.get(listing.data[0]["download"]).status_code, 404)
+
+    def test_repeat_requests_reuse_or_throttle(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.models import DataExport
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        first = self.client.post("/api/v1/users/me/export/")
+        again = self.client.post("/api/v1/users/me/export/")
+        self.assertEqual((again.status_code, again.data["id"]), (202, first.data["id"]))
+        self.assertEqual(DataExport.objects.count(), 1)
+
+        from django.utils import timezone
+        DataExport.objects.update(status=DataExport.S_DONE, finished_at=timezone.now())
+        res = self.client.post("/api/v1/users/me/export/")
+        self.assertEqual(res.status_code, 429)
+        self.assertIn("Retry-After", res)
+
+
+class AccountDeletionTests(APITestCase):
+    def test_purge_in_batches(self):
+        from blogs.models import Post, Comment, Reaction
+        from users.deletion import schedule, purge_account, due_deletions
+        from users.models import AccountDeletion, AuditLog, LoginHistory, Profile
+        user = User.objects.create_user(email="w@x.com", password="S3curePass!")
+        other = User.objects.create_user(email="y@z.com", password="S3curePass!")
+        Profile.objects.create(user=user)
+        mine = Post.objects.create(title="Mine", slug="mine", summary="s", content="c", author=user)
+        theirs = Post.objects.create(title="Theirs", slug="theirs", summary="s", content="c", author=other)
+        root = Comment.objects.create(post=mine, author=other, content="hi", is_approved=True)
+        Comment.objects.create(post=mine, author=other, content="re", parent=root, is_approved=True)
+        Comment.objects.create(post=mine, author=other, content="more", is_approved=True)
+        kept = Comment.objects.create(post=theirs, author=user, author_name="W", content="nice", is_approved=True)
+        Reaction.objects.create(post=mine, user=other, type="like")
+        Reaction.objects.create(post=theirs, user=user, type="like")
+        LoginHistory.objects.bulk_create([LoginHistory(user=user) for _ in range(3)])
+        AuditLog.objects.create(user=other, target_user=user, action="role_assigned")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule(user, grace_days=0)
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
+        deletion = AccountDeletion.objects.get(user_id=user.pk)
+        self.assertEqual(due_deletions(), [deletion.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(purge_account(deletion.pk, batch_size=1))
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, AccountDeletion.S_DONE)
+        self.assertEqual(deletion.progress["post_comments"], 3)
+        self.assertEqual(deletion.progress["login_history"], 3)
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertFalse(Post.objects.filter(slug="mine").exists())
+        kept.refresh_from_db()
+        self.assertIsNone(kept.author_id)
+        self.assertEqual(kept.author_name, "[deleted]")
+        self.assertEqual(Reaction.objects.count(), 0)
+        self.assertTrue(AuditLog.objects.filter(action="role_assigned", target_user=None).exists())
+        self.assertTrue(AuditLog.objects.filter(action="account_purged").exists())
+        self.assertFalse(purge_account(deletion.pk))
+
+class EmailOutboxTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_register_queues_and_sends_once_per_recipient(self):
+        from django.core import mail
+        from users.models import OutboundEmail
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post("/api/v1/auth/register/", {"email": "m@n.com", "password": "S3curePass!"})
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("/verify-email?token=", mail.outbox[0].body)
+        sent = OutboundEmail.objects.get()
+        self.assertEqual((sent.status, sent.body), (OutboundEmail.S_SENT, ""))
+
+        # repeated requests while one is pending collapse into the latest
+        user = User.objects.get(email="m@n.com")
+        for _ in range(3):
+            self.client.post("/api/v1/auth/password-reset/", {"email": "m@n.com"})
+        self.assertEqual(OutboundEmail.objects.filter(kind="password_reset", status=OutboundEmail.S_PENDING).count(), 1)
+        self.assertEqual(OutboundEmail.objects.filter(to_email=user.email).count(), 2)
+
+    def test_batch_reuses_one_connection_and_retries_failures(self):
+        from smtplib import SMTPRecipientsRefused
+        from unittest import mock
+        from django.core import mail
+        from django.core.mail.backends.locmem import EmailBackend
+        from django.utils import timezone
+        from users import outbox
+        from users.models import OutboundEmail
+        for i in range(5):
+            outbox.enqueue("notice", f"u{i}@x.com", "Hi", "Hello")
+        outbox.enqueue("notice", "bad@x.com", "Hi", "Hello")
+
+        send = EmailBackend.send_messages
+        def flaky(backend, messages):
+            if messages[0].to == ["bad@x.com"]:
+                raise SMTPRecipientsRefused({"bad@x.com": (550, b"no such user")})
+            return send(backend, messages)
+        with mock.patch("users.outbox.get_connection", wraps=outbox.get_connection) as get_connection, \
+                mock.patch.object(EmailBackend, "send_messages", flaky):
+            stats = outbox.drain()
+        get_connection.assert_called_once()
+        self.assertEqual((stats["sent"], stats["retrying"], stats["failed"]), (5, 1, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        bad = OutboundEmail.objects.get(to_email="bad@x.com")
+        self.assertEqual((bad.status, bad.attempts), (OutboundEmail.S_PENDING, 1))
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+        self.assertIn("SMTPRecipientsRefused", bad.last_error)
+        self.assertEqual(outbox.drain()["sent"], 0)  # not due yet
+
+        OutboundEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now(), attempts=outbox.MAX_ATTEMPTS - 1)
+        with mock.patch.object(EmailBackend, "send_messages", flaky):
+            self.assertEqual(outbox.drain()["failed"], 1)
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.body), (OutboundEmail.S_FAILED, ""))
+
+        from datetime import timedelta
+        from users.retention import apply_retention
+        OutboundEmail.objects.update(created_at=timezone.now() - timedelta(days=31))
+        outbox.enqueue("notice", "late@x.com", "Hi", "Hello")
+        self.assertEqual(apply_retention(["outbox"]), {"outbox": 6})
+        self.assertEqual(list(OutboundEmail.objects.values_list("to_email", flat=True)), ["late@x.com"])
+
+    def test_failing_purge_stops_after_max_attempts(self):
+        from unittest import mock
+        from users import deletion
+        from users.models import AccountDeletion
+        user = User.objects.create_user(email="f@x.com", password="S3curePass!")
+        deletion.schedule(user, grace_days=0)
+        pk = AccountDeletion.objects.get(user_id=user.pk).pk
+        broken = [("login_history", mock.Mock(side_effect=RuntimeError("lock timeout")))]
+        with mock.patch.object(deletion, "STEPS", broken), self.assertLogs("users.deletion", "ERROR"):
+            for _ in range(deletion.MAX_ATTEMPTS):
+                with self.assertRaises(RuntimeError):
+                    deletion.purge_account(pk)
+        record = AccountDeletion.objects.get(pk=pk)
+        self.assertEqual((record.status, record.attempts), (AccountDeletion.S_FAILED, deletion.MAX_ATTEMPTS))
+        self.assertIn("lock timeout", record.error)
+        self.assertEqual(deletion.due_deletions(), [])
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
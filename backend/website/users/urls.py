@@ -2,9 +2,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    RegisterView, LoginView, LogoutView, EmailVerifyView,
+    RegisterView, LoginView, LogoutView, TokenRefreshView, EmailVerifyView,
     PasswordResetRequestView, PasswordResetConfirmView,
-    MeView, UserPublicViewSet, TwoFAView
+    MeView, MeExportView, MeExportDownloadView, UserPublicViewSet, TwoFAView
 )
 
 router = DefaultRouter()
@@ -13,11 +13,14 @@ router.register(r'users', UserPublicViewSet, basename='users-public')
 urlpatterns = [
     path("auth/register/", RegisterView.as_view()),
     path("auth/login/", LoginView.as_view()),
+    path("auth/refresh/", TokenRefreshView.as_view()),
     path("auth/logout/", LogoutView.as_view()),
     path("auth/email-verify/", EmailVerifyView.as_view()),
     path("auth/password-reset/", PasswordResetRequestView.as_view()),
     path("auth/password-reset/confirm/", PasswordResetConfirmView.as_view()),
     path("users/me/", MeView.as_view()),
     path("users/me/2fa/", TwoFAView.as_view()),
+    path("users/me/export/", MeExportView.as_view()),
+    path("users/me/export/<uuid:pk>/download/", MeExportDownloadView.as_view()),
     path("", include(router.urls)),
 ]
@@ -1,16 +1,24 @@
 # users/views.py
 import json
+from django.conf import settings
 from django.contrib.auth import login, logout
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
 from rest_framework import views, viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import Throttled
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 import pyotp
 
-from .models import User, Profile, LoginHistory, AuditLog, EmailVerificationToken, TwoFactorDevice, BackupCode
-from .serializers import RegisterSerializer, LoginSerializer, MeSerializer, UserPublicSerializer
+from .models import User, Profile, EmailVerificationToken, TwoFactorDevice, BackupCode, DataExport
+from .audit import log_action, log_login
+from .blacklist import get_store
+from .me import me_payload, render_me, payload_etag
+from .outbox import enqueue_verification, enqueue_password_reset
+from .serializers import RegisterSerializer, LoginSerializer, MeSerializer, UserPublicSerializer, TokenRefreshSerializer
 from .permissions import IsAdminUserRole
 
 def _issue_tokens(user):
@@ -23,57 +31,59 @@ class RegisterView(views.APIView):
     def post(self, request):
         ser = RegisterSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
-        user = ser.save()
-        # send verify email async
-        from .tasks import send_email_verification
-        token_obj = EmailVerificationToken.create_for(user)
-        send_email_verification.delay(user.id, token_obj.token)
+        # the mail is queued with the user and sent once this commits
+        with transaction.atomic():
+            user = ser.save()
+            token_obj = EmailVerificationToken.create_for(user)
+            enqueue_verification(user, token_obj.token)
         return Response(UserPublicSerializer(user).data, status=201)
 
 class LoginView(views.APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
-        ser = LoginSerializer(data=request.data)
+        ser = LoginSerializer(data=request.data, context={"request": request})
         ser.is_valid(raise_exception=True)
         user = ser.validated_data["user"]
 
         # If user has 2FA device, require totp_code or valid backup
-        has_2fa = TwoFactorDevice.objects.filter(user=user, confirmed=True).exists()
+        devices = list(TwoFactorDevice.objects.filter(user=user, confirmed=True))
         totp_code = request.data.get("totp_code", "")
-        if has_2fa:
+        if devices:
             valid = False
-            for dev in TwoFactorDevice.objects.filter(user=user, confirmed=True):
+            for dev in devices:
                 totp = pyotp.TOTP(dev.secret)
                 if totp.verify(totp_code, valid_window=1):
                     valid = True
                     break
             if not valid:
                 # check backup codes
-                if totp_code:
-                    from django.contrib.auth.hashers import check_password
-                    bc = BackupCode.objects.filter(user=user, used=False)
-                    for b in bc:
-                        if check_password(totp_code, b.code_hash):
-                            b.used = True
-                            b.save(update_fields=["used"])
-                            valid = True
-                            break
+                valid = BackupCode.consume(user, totp_code)
                 if not valid:
-                    LoginHistory.objects.create(user=user, successful=False, ip_address=request.META.get("REMOTE_ADDR"), user_agent=request.META.get("HTTP_USER_AGENT",""))
-                    AuditLog.objects.create(user=user, action="login_failed", ip_address=request.META.get("REMOTE_ADDR"), details={"reason": "2FA required/invalid"})
+                    log_login(user, request, successful=False, reason="2FA required/invalid")
                     return Response({"detail":"2FA code required or invalid"}, status=401)
 
         tokens = _issue_tokens(user)
-        LoginHistory.objects.create(user=user, successful=True, ip_address=request.META.get("REMOTE_ADDR"), user_agent=request.META.get("HTTP_USER_AGENT",""))
-        AuditLog.objects.create(user=user, action="login_success", ip_address=request.META.get("REMOTE_ADDR"))
+        log_login(user, request, successful=True)
         return Response({"access_token": tokens["access"], "refresh_token": tokens["refresh"], "user": UserPublicSerializer(user).data})
 
+class TokenRefreshView(views.APIView):
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get_authenticate_header(self, request):
+        # no authenticators here, but invalid tokens should still be a 401
+        return 'Bearer realm="api"'
+
+    def post(self, request):
+        ser = TokenRefreshSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        return Response(ser.validated_data)
+
 class LogoutView(views.APIView):
     def post(self, request):
         try:
-            refresh = RefreshToken(request.data.get("refresh"))
-            refresh.blacklist()
+            get_store().revoke(RefreshToken(request.data.get("refresh")))
         except Exception:
             pass
         logout(request)
@@ -94,7 +104,7 @@ class EmailVerifyView(views.APIView):
         user.email_verified = True
         user.save(update_fields=["email_verified"])
         tok.delete()
-        AuditLog.objects.create(user=user, action="email_verify", details={})
+        log_action("email_verify", user=user, request=request)
         return Response({"detail": "Email verified"})
 
 class PasswordResetRequestView(views.APIView):
@@ -103,10 +113,9 @@ class PasswordResetRequestView(views.APIView):
         email = request.data.get("email")
         user = User.objects.filter(email=email).first()
         if user:
-            from .tasks import send_password_reset
             from django.contrib.auth.tokens import default_token_generator
             token = default_token_generator.make_token(user)
-            send_password_reset.delay(user.id, token)
+            enqueue_password_reset(user, token)
         return Response({"detail":"If the email exists, a reset link was sent."})
 
 class PasswordResetConfirmView(views.APIView):
@@ -121,26 +130,81 @@ class PasswordResetConfirmView(views.APIView):
             return Response({"detail":"Invalid uid"}, status=400)
         from django.contrib.auth.tokens import default_token_generator
         if not default_token_generator.check_token(user, token):
-            AuditLog.objects.create(user=user, action="password_reset", details={"status":"failed"})
+            log_action("password_reset", user=user, request=request, details={"status":"failed"})
             return Response({"detail":"Invalid token"}, status=400)
         user.set_password(new_password)
         user.save()
-        AuditLog.objects.create(user=user, action="password_reset", details={"status":"success"})
+        log_action("password_reset", user=user, request=request, details={"status":"success"})
         return Response({"detail":"Password updated"})
 
 class MeView(views.APIView):
+    # payload cached per user (users.me); ETag for conditional GETs, If-Match for writes
     def get(self, request):
-        return Response(MeSerializer(request.user).data)
+        entry = me_payload(request.user.pk)
+        if request.headers.get("If-None-Match") == entry["etag"]:
+            response = Response(status=304)
+        else:
+            response = Response(entry["data"])
+        response["ETag"] = entry["etag"]
+        response["Cache-Control"] = "private, no-cache"
+        return response
     def put(self, request):
-        ser = MeSerializer(instance=request.user, data=request.data)
-        ser.is_valid(raise_exception=True)
-        ser.save()
-        return Response(ser.data)
+        return self._update(request, partial=False)
     def patch(self, request):
-        ser = MeSerializer(instance=request.user, data=request.data, partial=True)
+        return self._update(request, partial=True)
+
+    @transaction.atomic
+    def _update(self, request, partial):
+        # the row lock makes check-then-write atomic against other writers; only the
+        # user row, as PostgreSQL can't lock the nullable side of the profile join
+        user = User.objects.select_for_update(of=("self",)).select_related("profile").get(pk=request.user.pk)
+        if_match = request.headers.get("If-Match")
+        if if_match and if_match != "*" and if_match != render_me(user)["etag"]:
+            return Response({"detail": "The profile was changed by another request."}, status=412)
+        ser = MeSerializer(instance=user, data=request.data, partial=partial)
         ser.is_valid(raise_exception=True)
         ser.save()
-        return Response(ser.data)
+        response = Response(ser.data)
+        response["ETag"] = payload_etag(ser.data)
+        return response
+
+class MeExportView(views.APIView):
+    def get(self, request):
+        exports = DataExport.objects.filter(user=request.user)[:10]
+        return Response([
+            {"id": e.id, "status": e.status, "rows": e.rows, "created_at": e.created_at, "finished_at": e.finished_at,
+             "download": f"/api/v1/users/me/export/{e.id}/download/" if e.status == DataExport.S_DONE else None}
+            for e in exports
+        ])
+
+    @transaction.atomic
+    def post(self, request):
+        # one export in flight per user, and a cooldown after a finished one
+        from .tasks import run_data_export
+        User.objects.select_for_update().filter(pk=request.user.pk).first()
+        mine = DataExport.objects.filter(user_id=request.user.pk)
+        active = mine.filter(status__in=(DataExport.S_PENDING, DataExport.S_RUNNING)).first()
+        if active:
+            return Response({"id": active.id, "status": active.status}, status=202)
+        cooldown = getattr(settings, "USER_EXPORT_COOLDOWN", 24 * 60 * 60)
+        last = (mine.filter(status=DataExport.S_DONE).order_by("-finished_at")
+                .values_list("finished_at", flat=True).first())
+        age = (timezone.now() - last).total_seconds() if last else None
+        if age is not None and age < cooldown:
+            raise Throttled(wait=cooldown - age)
+        export = DataExport.objects.create(user_id=request.user.pk)
+        log_action("export_requested", user=request.user, request=request, details={"export": str(export.pk)})
+        transaction.on_commit(lambda: run_data_export.delay(str(export.pk)))
+        return Response({"id": export.id, "status": export.status}, status=202)
+
+class MeExportDownloadView(views.APIView):
+    def get(self, request, pk):
+        from .exports import get_storage
+        export = get_object_or_404(DataExport, pk=pk, user=request.user, status=DataExport.S_DONE)
+        response = FileResponse(get_storage().open(export.file, "rb"), as_attachment=True,
+                                filename=f"export-{export.created_at:%Y%m%d}.zip", content_type="application/zip")
+        response["Cache-Control"] = "private, no-store"
+        return response
 
 class UserPublicViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.filter(is_active=True)
@@ -163,7 +227,7 @@ class TwoFAView(views.APIView):
     @transaction.atomic
     def delete(self, request):
         TwoFactorDevice.objects.filter(user=request.user).delete()
-        AuditLog.objects.create(user=request.user, action="2fa_disabled")
+        log_action("2fa_disabled", user=request.user, request=request)
         return Response(status=204)
 
     @action(detail=False, methods=["post"])
@@ -177,6 +241,6 @@ class TwoFAView(views.APIView):
         if pyotp.TOTP(dev.secret).verify(code, valid_window=1):
             dev.confirmed = True
             dev.save(update_fields=["confirmed"])
-            AuditLog.objects.create(user=request.user, action="2fa_enabled")
+            log_action("2fa_enabled", user=request.user, request=request)
             return Response({"detail":"2FA enabled"})
         return Response({"detail":"Invalid code"}, status=400)
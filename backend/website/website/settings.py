@@ -67,6 +67,7 @@ INSTALLED_APPS = [
 ]
 
 AUTH_USER_MODEL = "users.User"
+AUTHENTICATION_BACKENDS = ["users.backends.EmailOrUsernameBackend"]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -118,7 +119,7 @@ DATABASES = {
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
@@ -146,6 +147,16 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
 }
+# revoked refresh tokens (logout, rotation) live in users.blacklist, not the token_blacklist tables
+JWT_BLACKLIST_STORE = os.getenv(
+    "JWT_BLACKLIST_STORE",
+    "users.blacklist.CacheBlacklistStore" if "test" in sys.argv else "users.blacklist.RedisBlacklistStore",
+)
+JWT_BLACKLIST_OPTIONS = {
+    "SYNC_INTERVAL": 1.0,  # seconds a revocation may take to reach other processes' Bloom filters
+    "CAPACITY": 1_000_000,
+    "ERROR_RATE": 0.001,
+}
 
 # ---------------------------------------------------------------------
 # Internationalization & Timezone
@@ -167,6 +178,26 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # safety net for scheduled posts; each one also gets an eta task when saved
+    "blogs-publish-due-posts": {"task": "blogs.tasks.publish_due_posts", "schedule": 60.0},
+    # derived content (search text, excerpts) for rows written without signals
+    # rebuilds every feed; they're otherwise refreshed per change or on a cache miss
+    "blogs-refresh-feeds": {"task": "blogs.tasks.refresh_all_feeds", "schedule": 3600.0},
+    "blogs-refresh-derived-content": {"task": "blogs.tasks.refresh_stale_derived_content", "schedule": 300.0},
+    # expired refresh-token revocations; keeps the Bloom replay log short
+    "users-purge-jwt-blacklist": {"task": "users.tasks.purge_jwt_blacklist", "schedule": 3600.0},
+    # drains RedisAuditSink; a no-op with the other sinks
+    "users-flush-audit-events": {"task": "users.tasks.flush_audit_events", "schedule": 5.0},
+    # restarts data exports whose worker died
+    "users-resume-data-exports": {"task": "users.tasks.resume_data_exports", "schedule": 300.0},
+    # accounts past their deletion grace period
+    "users-purge-deleted-accounts": {"task": "users.tasks.purge_deleted_accounts", "schedule": 3600.0},
+    # retries and anything a commit-time kick missed
+    "users-drain-outbox": {"task": "users.tasks.drain_outbox", "schedule": 30.0},
+    # users.retention policies (RETENTION_POLICIES)
+    "users-apply-retention": {"task": "users.tasks.apply_retention_policies", "schedule": 86400.0},
+}
 
 
 # ---------------------------------------------------------------------
@@ -198,6 +229,51 @@ CACHES = {
     }
 }
 
+# ---------------------------------------------------------------------
+# Blog publishing (sitemaps, static export, CDN)
+# ---------------------------------------------------------------------
+BLOG_SITEMAP_SHARD_SIZE = 50000
+BLOG_SITEMAP_DIR = os.getenv("BLOG_SITEMAP_DIR") or None
+# public origin of this backend, which serves /sitemap-N.xml (not FRONTEND_BASE_URL)
+BLOG_SITEMAP_BASE_URL = os.getenv("BLOG_SITEMAP_BASE_URL", "http://localhost:8000")
+BLOG_STATIC_EXPORT_DIR = os.getenv("BLOG_STATIC_EXPORT_DIR") or None
+BLOG_HOME_FILL_WORKERS = 4  # threads rebuilding missing homepage fragments
+BLOG_EDGE_MAX_AGE = 6 * 60 * 60  # s-maxage for responses tagged with Surrogate-Key
+BLOG_PURGE_BACKEND = os.getenv("BLOG_PURGE_BACKEND", "blogs.purge.NullPurgeBackend")
+BLOG_PURGE_OPTIONS = {
+    "URL": os.getenv("BLOG_PURGE_URL", ""),
+    "TOKEN": os.getenv("BLOG_PURGE_TOKEN", ""),
+}
+
+# ---------------------------------------------------------------------
+# Accounts
+# ---------------------------------------------------------------------
+# where audit/login-history events go: users.audit.{Sync,Thread,Redis}AuditSink
+AUDIT_SINK = os.getenv(
+    "AUDIT_SINK", "users.audit.SyncAuditSink" if "test" in sys.argv else "users.audit.ThreadAuditSink"
+)
+AUDIT_SINK_OPTIONS = {
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 1.0,  # seconds, ThreadAuditSink
+    "MAX_PENDING": 10000,  # backlog before callers write synchronously
+}
+# users.retention: per-policy {"days", "archive"} overrides of DEFAULT_POLICIES;
+# applied daily by users.tasks.apply_retention_policies (or `manage.py apply_retention`)
+RETENTION_POLICIES = {}
+# gzipped NDJSON, one file per month
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR") or str(BASE_DIR / "private" / "retention")
+
+# personal data exports (users.exports) go to the "exports" storage
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "exports": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": os.getenv("USER_EXPORT_DIR") or str(BASE_DIR / "private" / "exports")},
+    },
+}
+USER_EXPORT_COOLDOWN = 24 * 60 * 60  # seconds after a finished export before another can be requested
+
 # ---------------------------------------------------------------------
 # Logging
 # ---------------------------------------------------------------------